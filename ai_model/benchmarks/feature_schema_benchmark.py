@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import timeit
+
+import cv2
+import mediapipe as mp
+import numpy as np
+import pandas as pd
+
+AI_MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS_DIR = os.path.join(AI_MODEL_DIR, 'words')
+sys.path.append(AI_MODEL_DIR)
+sys.path.append(WORDS_DIR)
+from landmarks.conversion import holistic_to_array
+from landmarks.normalization import normalize_landmarks
+from landmarks.schema import FEATURE_SCHEMAS
+from train_classifier import build_lstm_model, LSTM_UNITS, DENSE_UNITS, DROPOUT_RATE, LEARNING_RATE, MODEL_SAVE_DIR
+
+# Words feature schemas side by side: values per frame, Holistic extraction on the
+# web client's signing videos, window normalization, and the size and predict time
+# of the classifier at the server's 30-frame window. Test accuracy comes from each
+# schema's checkpoint and processed data (train_classifier.py run with
+# WORDS_FEATURE_SCHEMA set) when both exist.
+
+VIDEO_DIR = os.getenv('FEATURE_SCHEMA_BENCH_VIDEOS', os.path.join(AI_MODEL_DIR, '..', 'frontend', 'src', 'videos'))
+# Full-schema names from train_classifier.py; FeatureSchema.path gives each schema's own.
+PROCESSED_DATA_CSV = 'wlasl_125_words_personal_final_processed_data_augmented_seq90.csv'
+MODEL_FILENAME = 'best_sign_classifier_model_125_words_seq90.keras'
+SERVING_SEQUENCE_LENGTH = 30
+SERVING_CLASSES = 40
+NUMBER = 20
+
+
+def read_frames(path):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, image = capture.read()
+        if not ok:
+            return frames
+        frames.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def time_per_call(fn, number=NUMBER):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e3
+
+
+def extract(schema, videos):
+    """Mean MediaPipe and conversion ms per frame, and one (frames, coords_per_frame) array per video."""
+    mediapipe_ms, conversion_ms, windows = [], [], []
+    for frames in videos:
+        # A fresh tracking graph per video, as landmark_extractor.py uses.
+        with mp.solutions.holistic.Holistic(static_image_mode=False, model_complexity=1) as holistic:
+            window = np.zeros((len(frames), schema.coords_per_frame), dtype=np.float32)
+            for i, frame in enumerate(frames):
+                started = time.perf_counter()
+                results = holistic.process(frame)
+                converted = time.perf_counter()
+                holistic_to_array(results, out=window[i], face_landmarks=schema.face_landmarks)
+                mediapipe_ms.append((converted - started) * 1e3)
+                conversion_ms.append((time.perf_counter() - converted) * 1e3)
+        windows.append(window)
+    return np.mean(mediapipe_ms), np.mean(conversion_ms), windows
+
+
+def test_accuracy(schema):
+    """Test accuracy of the schema's checkpoint, or None when it or its processed data is missing."""
+    from tensorflow.keras.models import load_model
+
+    csv_path = schema.path(PROCESSED_DATA_CSV)
+    model_path = os.path.join(MODEL_SAVE_DIR, schema.path(MODEL_FILENAME))
+    if not (os.path.exists(csv_path) and os.path.exists(model_path)):
+        return None
+    test_df = pd.read_csv(csv_path)
+    test_df = test_df[test_df['split'] == 'test']
+    X_test = np.stack([np.load(path) for path in test_df['processed_path']])
+    predictions = load_model(model_path).predict(X_test, verbose=0)
+    return float(np.mean(np.argmax(predictions, axis=1) == test_df['gloss_id'].to_numpy()))
+
+
+if __name__ == "__main__":
+    os.chdir(WORDS_DIR)
+    videos = [read_frames(os.path.join(VIDEO_DIR, name)) for name in sorted(os.listdir(VIDEO_DIR)) if name.endswith('.mp4')]
+    print(f"{len(videos)} videos, {sum(map(len, videos))} frames\n")
+
+    # Warm up MediaPipe's graphs so the first schema doesn't pay for loading them.
+    for schema in FEATURE_SCHEMAS.values():
+        extract(schema, videos[:1])
+
+    rows = []
+    for schema in FEATURE_SCHEMAS.values():
+        mediapipe_ms, conversion_ms, windows = extract(schema, videos)
+        window = windows[0][:SERVING_SEQUENCE_LENGTH]
+        normalization_ms = time_per_call(lambda: normalize_landmarks(window, schema.frame_parts, schema.coords_per_frame))
+        model = build_lstm_model((SERVING_SEQUENCE_LENGTH, schema.coords_per_frame), SERVING_CLASSES,
+                                 LSTM_UNITS, DENSE_UNITS, DROPOUT_RATE, LEARNING_RATE)
+        model_input = np.expand_dims(normalize_landmarks(window, schema.frame_parts, schema.coords_per_frame), 0)
+        predict_ms = time_per_call(lambda: model.predict_on_batch(model_input))
+        rows.append((schema, mediapipe_ms, conversion_ms, normalization_ms, model.count_params(), predict_ms,
+                     test_accuracy(schema)))
+
+    print(f"{'schema':<24} {'values':>6} {'mediapipe ms':>12} {'convert ms':>10} {'normalize ms':>12} "
+          f"{'params':>10} {'predict ms':>10} {'accuracy':>8}")
+    for schema, mediapipe_ms, conversion_ms, normalization_ms, params, predict_ms, accuracy in rows:
+        accuracy = 'n/a' if accuracy is None else f"{accuracy:.3f}"
+        print(f"{schema.name:<24} {schema.coords_per_frame:>6} {mediapipe_ms:>12.2f} "
+              f"{conversion_ms:>10.3f} {normalization_ms:>12.3f} {params:>10,} {predict_ms:>10.2f} {accuracy:>8}")
+    print(f"\nnormalize and predict: one {SERVING_SEQUENCE_LENGTH}-frame window, {SERVING_CLASSES} classes "
+          f"(the server's words model)")
+    print("accuracy: test split of the schema's processed data with its checkpoint; n/a when they don't exist")
@@ -0,0 +1,119 @@
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.conversion import (EXPECTED_COORDS_PER_FRAME, NUM_POSE_COORDS, NUM_HAND_COORDS,
+                                  holistic_to_array, hand_to_array, letter_features)
+
+# Compares the shared landmark conversion against the hand-written loops it replaced.
+# Uses real MediaPipe protobuf landmark lists when mediapipe is installed, otherwise
+# plain Python objects with the same attributes.
+
+REPEATS = 5
+NUMBER = 200
+
+
+def make_landmark_list(count, rng):
+    try:
+        from mediapipe.framework.formats import landmark_pb2
+        landmark_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, visibility in rng.random((count, 4)).tolist():
+            landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+        return landmark_list
+    except ImportError:
+        landmarks = [SimpleNamespace(x=x, y=y, z=z, visibility=v) for x, y, z, v in rng.random((count, 4)).astype(np.float32).tolist()]
+        return SimpleNamespace(landmark=landmarks)
+
+
+def legacy_list_comprehension(results):
+    # wordsControllerS.detectFromImageBytes / realtime_translator.py
+    frame = np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32)
+    idx = 0
+    if results.pose_landmarks:
+        flat = [c for lm in results.pose_landmarks.landmark for c in [lm.x, lm.y, lm.z, lm.visibility]]
+        frame[idx:idx + len(flat)] = flat
+    idx += NUM_POSE_COORDS
+    for part in (results.left_hand_landmarks, results.right_hand_landmarks):
+        if part:
+            flat = [c for lm in part.landmark for c in [lm.x, lm.y, lm.z]]
+            frame[idx:idx + len(flat)] = flat
+        idx += NUM_HAND_COORDS
+    if results.face_landmarks:
+        flat = [c for lm in results.face_landmarks.landmark for c in [lm.x, lm.y, lm.z]]
+        frame[idx:idx + len(flat)] = flat
+    return frame
+
+
+def legacy_extend(results):
+    # landmark_extractor.extract_landmarks_from_video / record_personal_data.extract_raw_landmarks
+    frame = np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32)
+    idx = 0
+    if results.pose_landmarks:
+        flat = []
+        for lm in results.pose_landmarks.landmark:
+            flat.extend([lm.x, lm.y, lm.z, lm.visibility])
+        frame[idx:idx + len(flat)] = flat
+    idx += NUM_POSE_COORDS
+    for part in (results.left_hand_landmarks, results.right_hand_landmarks):
+        if part:
+            flat = []
+            for lm in part.landmark:
+                flat.extend([lm.x, lm.y, lm.z])
+            frame[idx:idx + len(flat)] = flat
+        idx += NUM_HAND_COORDS
+    if results.face_landmarks:
+        flat = []
+        for lm in results.face_landmarks.landmark:
+            flat.extend([lm.x, lm.y, lm.z])
+        frame[idx:idx + len(flat)] = flat
+    return frame
+
+
+def legacy_letter_features(hand_landmarks):
+    # lettersControllerS.processSingleFrame
+    x_list, y_list, data_aux = [], [], []
+    for lm in hand_landmarks.landmark:
+        x_list.append(lm.x)
+        y_list.append(lm.y)
+    for lm in hand_landmarks.landmark:
+        data_aux.append(lm.x - min(x_list))
+        data_aux.append(lm.y - min(y_list))
+    return np.array(data_aux, dtype=np.float32)
+
+
+def time_per_call(fn):
+    return min(timeit.repeat(fn, number=NUMBER, repeat=REPEATS)) / NUMBER * 1e6
+
+
+def report(name, legacy_fns, new_fn):
+    new_us = time_per_call(new_fn)
+    for legacy_name, legacy_fn in legacy_fns:
+        legacy_us = time_per_call(legacy_fn)
+        print(f"{name:<22} {legacy_name:<22} {legacy_us:>10.1f} us {new_us:>10.1f} us {legacy_us / new_us:>8.2f}x")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    results = SimpleNamespace(
+        pose_landmarks=make_landmark_list(33, rng),
+        left_hand_landmarks=make_landmark_list(21, rng),
+        right_hand_landmarks=make_landmark_list(21, rng),
+        face_landmarks=make_landmark_list(468, rng),
+    )
+    hand = results.right_hand_landmarks
+    out = np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32)
+
+    assert np.array_equal(legacy_list_comprehension(results), holistic_to_array(results))
+    assert np.array_equal(legacy_extend(results), holistic_to_array(results))
+    assert np.array_equal(legacy_letter_features(hand), letter_features(hand_to_array(hand)))
+
+    print(f"{'conversion':<22} {'replaced code':<22} {'legacy':>13} {'shared':>13} {'speedup':>9}")
+    report('holistic frame', [('list comprehension', lambda: legacy_list_comprehension(results)),
+                              ('extend loop', lambda: legacy_extend(results))],
+           lambda: holistic_to_array(results, out=out))
+    report('letter features', [('min() inside loop', lambda: legacy_letter_features(hand))],
+           lambda: letter_features(hand_to_array(hand)))
@@ -0,0 +1,57 @@
+import os
+import sys
+import timeit
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.conversion import EXPECTED_COORDS_PER_FRAME, NUM_HAND_LANDMARKS
+from landmarks.payload import SCHEMA_HAND, SCHEMA_HOLISTIC, encode_landmark_frame, decode_landmark_frame
+
+# Server-side cost of one websocket frame: a JPEG that has to be decoded and run
+# through MediaPipe, versus a landmark payload the client already extracted.
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+NUMBER = 20
+
+
+def time_per_call(fn, number=NUMBER):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e3
+
+
+def jpeg_frame(rng):
+    image = rng.integers(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (15, 15), 0)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+
+def jpeg_path(graph, jpeg_bytes):
+    image = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+    return graph.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    jpeg_bytes = jpeg_frame(rng)
+    hand_payload = encode_landmark_frame(rng.random((NUM_HAND_LANDMARKS, 3)), SCHEMA_HAND, 7)
+    holistic_payload = encode_landmark_frame(rng.random(EXPECTED_COORDS_PER_FRAME), SCHEMA_HOLISTIC, 7)
+
+    decoded = decode_landmark_frame(holistic_payload)
+    assert decoded.frame_index == 7 and decoded.landmarks.shape == (EXPECTED_COORDS_PER_FRAME,)
+
+    hands = mp.solutions.hands.Hands(static_image_mode=True)
+    holistic = mp.solutions.holistic.Holistic(static_image_mode=True, model_complexity=1)
+
+    rows = [
+        ('letters (Hands)', len(jpeg_bytes), time_per_call(lambda: jpeg_path(hands, jpeg_bytes)),
+         len(hand_payload), time_per_call(lambda: decode_landmark_frame(hand_payload), 10000)),
+        ('words (Holistic)', len(jpeg_bytes), time_per_call(lambda: jpeg_path(holistic, jpeg_bytes)),
+         len(holistic_payload), time_per_call(lambda: decode_landmark_frame(holistic_payload), 10000)),
+    ]
+
+    print(f"{'path':<18} {'jpeg bytes':>10} {'jpeg ms':>9} {'payload bytes':>14} {'payload ms':>11} {'speedup':>9}")
+    for name, jpeg_size, jpeg_ms, payload_size, payload_ms in rows:
+        print(f"{name:<18} {jpeg_size:>10} {jpeg_ms:>9.2f} {payload_size:>14} {payload_ms:>11.4f} {jpeg_ms / payload_ms:>8.0f}x")
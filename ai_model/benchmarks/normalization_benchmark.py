@@ -0,0 +1,99 @@
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.conversion import EXPECTED_COORDS_PER_FRAME, NUM_POSE_COORDS, NUM_HAND_COORDS, NUM_FACE_COORDS
+from landmarks.normalization import normalize_landmarks
+
+# Checks the batched normalization kernel against the per-frame loop that was
+# copy-pasted across data_preprocessor.py, realtime_translator.py and
+# wordsControllerS.py, then times both on a serving window and a dataset shard.
+
+SEQUENCE_FRAMES = 90
+SHARD_SEQUENCES = 64
+
+
+def legacy_normalize_landmarks(landmarks_sequence):
+    if landmarks_sequence.size == 0:
+        return landmarks_sequence.astype(np.float32)
+    if landmarks_sequence.ndim == 1:
+        input_is_single_frame = True
+        landmarks_sequence_2d = np.expand_dims(landmarks_sequence, axis=0)
+    else:
+        input_is_single_frame = False
+        landmarks_sequence_2d = landmarks_sequence
+    normalized_sequences = []
+    for frame_landmarks in landmarks_sequence_2d:
+        if np.all(frame_landmarks == 0):
+            normalized_sequences.append(np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32))
+            continue
+        pose_coords_flat = frame_landmarks[0 : NUM_POSE_COORDS]
+        left_hand_coords_flat = frame_landmarks[NUM_POSE_COORDS : NUM_POSE_COORDS + NUM_HAND_COORDS]
+        right_hand_coords_flat = frame_landmarks[NUM_POSE_COORDS + NUM_HAND_COORDS : NUM_POSE_COORDS + 2 * NUM_HAND_COORDS]
+        face_coords_flat = frame_landmarks[NUM_POSE_COORDS + 2 * NUM_HAND_COORDS : ]
+        all_parts_data = [
+            (pose_coords_flat, 4, [0.0] * NUM_POSE_COORDS),
+            (left_hand_coords_flat, 3, [0.0] * NUM_HAND_COORDS),
+            (right_hand_coords_flat, 3, [0.0] * NUM_HAND_COORDS),
+            (face_coords_flat, 3, [0.0] * NUM_FACE_COORDS)
+        ]
+        normalized_frame_parts = []
+        for flat_lms, coords_per_lm, original_padded_list_template in all_parts_data:
+            if np.all(flat_lms == 0):
+                normalized_frame_parts.append(np.array(original_padded_list_template, dtype=np.float32))
+                continue
+            lms_array = flat_lms.reshape(-1, coords_per_lm)
+            coords_for_mean = lms_array[:, :3] if coords_per_lm == 4 else lms_array
+            if np.all(coords_for_mean == 0):
+                normalized_frame_parts.append(np.array(original_padded_list_template, dtype=np.float32))
+                continue
+            mean_coords = np.mean(coords_for_mean, axis=0)
+            translated_lms = lms_array.copy()
+            translated_lms[:, :3] -= mean_coords
+            scale_factor = np.max(np.linalg.norm(translated_lms[:, :3], axis=1))
+            if scale_factor > 1e-6:
+                translated_lms[:, :3] /= scale_factor
+            normalized_frame_parts.append(translated_lms.flatten())
+        combined_normalized_frame = np.concatenate(normalized_frame_parts).astype(np.float32)
+        normalized_sequences.append(combined_normalized_frame)
+    result_array = np.array(normalized_sequences, dtype=np.float32)
+    return result_array[0] if input_is_single_frame else result_array
+
+
+def random_sequences(rng, count, frames):
+    sequences = rng.random((count, frames, EXPECTED_COORDS_PER_FRAME), dtype=np.float32)
+    # Knock out hands, faces and whole frames the way MediaPipe misses them.
+    part_starts = [NUM_POSE_COORDS, NUM_POSE_COORDS + NUM_HAND_COORDS, NUM_POSE_COORDS + 2 * NUM_HAND_COORDS]
+    part_ends = [NUM_POSE_COORDS + NUM_HAND_COORDS, NUM_POSE_COORDS + 2 * NUM_HAND_COORDS, EXPECTED_COORDS_PER_FRAME]
+    for start, end in zip(part_starts, part_ends):
+        sequences[rng.random((count, frames)) < 0.3, start:end] = 0
+    sequences[rng.random((count, frames)) < 0.05] = 0
+    return sequences
+
+
+def time_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e3
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    shard = random_sequences(rng, SHARD_SEQUENCES, SEQUENCE_FRAMES)
+    window = shard[0]
+
+    for sequence in shard:
+        assert np.array_equal(legacy_normalize_landmarks(sequence), normalize_landmarks(sequence))
+    assert np.array_equal(legacy_normalize_landmarks(window[3]), normalize_landmarks(window[3]))
+    assert np.array_equal(np.stack([legacy_normalize_landmarks(s) for s in shard]), normalize_landmarks(shard))
+    print("Outputs are bit-identical to the per-frame implementation.")
+
+    legacy_window = time_call(lambda: legacy_normalize_landmarks(window), 20)
+    kernel_window = time_call(lambda: normalize_landmarks(window), 20)
+    legacy_shard = time_call(lambda: [legacy_normalize_landmarks(s) for s in shard], 1)
+    kernel_shard = time_call(lambda: normalize_landmarks(shard), 1)
+
+    print(f"{'input':<28} {'per-frame':>12} {'batched':>12} {'speedup':>9}")
+    print(f"{f'{SEQUENCE_FRAMES}-frame window':<28} {legacy_window:>9.2f} ms {kernel_window:>9.2f} ms {legacy_window / kernel_window:>8.1f}x")
+    print(f"{f'{SHARD_SEQUENCES} x {SEQUENCE_FRAMES} shard':<28} {legacy_shard:>9.2f} ms {kernel_shard:>9.2f} ms {legacy_shard / kernel_shard:>8.1f}x")
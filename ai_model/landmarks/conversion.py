@@ -0,0 +1,139 @@
+import itertools
+from operator import attrgetter
+
+import numpy as np
+
+
+NUM_POSE_LANDMARKS = 33
+NUM_HAND_LANDMARKS = 21
+NUM_FACE_LANDMARKS = 468
+
+NUM_POSE_COORDS = NUM_POSE_LANDMARKS * 4   # (x, y, z, visibility)
+NUM_HAND_COORDS = NUM_HAND_LANDMARKS * 3   # (x, y, z)
+NUM_FACE_COORDS = NUM_FACE_LANDMARKS * 3   # (x, y, z)
+EXPECTED_COORDS_PER_FRAME = NUM_POSE_COORDS + 2 * NUM_HAND_COORDS + NUM_FACE_COORDS
+
+POSE_SLICE = slice(0, NUM_POSE_COORDS)
+LEFT_HAND_SLICE = slice(POSE_SLICE.stop, POSE_SLICE.stop + NUM_HAND_COORDS)
+RIGHT_HAND_SLICE = slice(LEFT_HAND_SLICE.stop, LEFT_HAND_SLICE.stop + NUM_HAND_COORDS)
+FACE_SLICE = slice(RIGHT_HAND_SLICE.stop, RIGHT_HAND_SLICE.stop + NUM_FACE_COORDS)
+
+_XYZ = attrgetter('x', 'y', 'z')
+_XYZV = attrgetter('x', 'y', 'z', 'visibility')
+
+# Wire layouts of a serialized NormalizedLandmarkList: each landmark is a length-
+# delimited submessage (tag 0x0a) holding fixed32 floats x (0x0d), y (0x15), z (0x1d)
+# and, for pose, visibility (0x25) and presence (0x2d). Parsing the serialized bytes
+# with a packed dtype avoids one Python attribute lookup per coordinate.
+_WIRE_FIELDS = [('x', 0x0d), ('y', 0x15), ('z', 0x1d), ('visibility', 0x25), ('presence', 0x2d)]
+
+
+def _wire_layout(num_fields):
+    fields = [('tag', 'u1'), ('length', 'u1')]
+    for name, _ in _WIRE_FIELDS[:num_fields]:
+        fields += [(f'{name}_tag', 'u1'), (name, '<f4')]
+    layout = np.dtype(fields)
+
+    # One record's tag bytes, plus a mask selecting them, so a whole buffer can be
+    # validated with a single vectorized compare.
+    mask = np.zeros(layout.itemsize, dtype=np.uint8)
+    pattern = np.zeros(layout.itemsize, dtype=np.uint8)
+    tags = [('tag', 0x0a), ('length', layout.itemsize - 2)] + [(f'{name}_tag', tag) for name, tag in _WIRE_FIELDS[:num_fields]]
+    for name, value in tags:
+        offset = layout.fields[name][1]
+        mask[offset] = 0xff
+        pattern[offset] = value
+    return layout, mask, pattern
+
+
+_WIRE_LAYOUTS = {layout[0].itemsize: layout for layout in map(_wire_layout, (3, 4, 5))}
+
+
+def _parse_serialized(landmark_list, count):
+    serialize = getattr(landmark_list, 'SerializeToString', None)
+    if serialize is None or count == 0:
+        return None
+    buffer = serialize()
+    if len(buffer) % count:
+        return None
+    layout = _WIRE_LAYOUTS.get(len(buffer) // count)
+    if layout is None:
+        return None
+    dtype, mask, pattern = layout
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(count, dtype.itemsize)
+    if not np.array_equal(raw & mask, np.broadcast_to(pattern, raw.shape)):
+        return None
+    return raw.view(dtype).reshape(count)
+
+
+def landmarks_into(landmark_list, out, with_visibility=False):
+    """
+    Writes a MediaPipe landmark list into a preallocated float32 view of
+    n * 3 (or n * 4 with visibility) values, without building Python lists.
+    """
+    num_coords = 4 if with_visibility else 3
+    view = out.reshape(-1, num_coords)
+    records = _parse_serialized(landmark_list, view.shape[0])
+    if records is not None:
+        view[:, 0] = records['x']
+        view[:, 1] = records['y']
+        view[:, 2] = records['z']
+        if with_visibility:
+            view[:, 3] = records['visibility'] if 'visibility' in records.dtype.names else 0.0
+        return out
+
+    getter = _XYZV if with_visibility else _XYZ
+    values = itertools.chain.from_iterable(map(getter, landmark_list.landmark))
+    view.reshape(-1)[:] = np.fromiter(values, dtype=np.float32, count=view.size)
+    return out
+
+
+def hand_to_array(hand_landmarks, out=None):
+    """Converts a single hand landmark list into a (21, 3) float32 array."""
+    if out is None:
+        out = np.empty((NUM_HAND_LANDMARKS, 3), dtype=np.float32)
+    return landmarks_into(hand_landmarks, out)
+
+
+def holistic_to_array(results, out=None, face_landmarks=None):
+    """
+    Converts MediaPipe Holistic results into the flat 1662-float frame layout
+    (pose, left hand, right hand, face). Missing parts are left as zeros.
+    With face_landmarks (indices into the face mesh) only those face points follow
+    the hands, as in a landmarks.schema.FeatureSchema frame.
+    """
+    num_face = NUM_FACE_LANDMARKS if face_landmarks is None else len(face_landmarks)
+    face_slice = slice(FACE_SLICE.start, FACE_SLICE.start + num_face * 3)
+    if out is None:
+        out = np.zeros(face_slice.stop, dtype=np.float32)
+    else:
+        out[:] = 0.0
+
+    if results.pose_landmarks:
+        landmarks_into(results.pose_landmarks, out[POSE_SLICE], with_visibility=True)
+    if results.left_hand_landmarks:
+        landmarks_into(results.left_hand_landmarks, out[LEFT_HAND_SLICE])
+    if results.right_hand_landmarks:
+        landmarks_into(results.right_hand_landmarks, out[RIGHT_HAND_SLICE])
+    if results.face_landmarks and num_face:
+        if face_landmarks is None:
+            landmarks_into(results.face_landmarks, out[face_slice])
+        else:
+            # Parsing the whole mesh and indexing it keeps the fast path.
+            face = np.empty((len(results.face_landmarks.landmark), 3), dtype=np.float32)
+            out[face_slice] = landmarks_into(results.face_landmarks, face)[face_landmarks].reshape(-1)
+    return out
+
+
+def letter_features(hand_array):
+    """(21, 3) hand -> 42 interleaved x, y offsets from the hand's minimum x and y."""
+    xy = hand_array[:, :2]
+    return (xy - xy.min(axis=0)).reshape(-1)
+
+
+def sequence_features(hand_array):
+    """(21, 3) hand -> 63 values for the J/Z sequence model: x, y offsets and a zeroed z."""
+    features = np.zeros((NUM_HAND_LANDMARKS, 3), dtype=np.float32)
+    xy = hand_array[:, :2]
+    features[:, :2] = xy - xy.min(axis=0)
+    return features.reshape(-1)
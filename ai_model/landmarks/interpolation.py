@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def interpolate_missing_frames(frames, valid):
+    """
+    Fills the frames where no landmarks were detected. Interior gaps are linearly
+    interpolated between the nearest valid frames on either side; leading and trailing
+    gaps repeat the first and last valid frame.
+
+    frames is a (frames, features) array and valid a boolean mask over its first axis.
+    Runs in linear time and returns a new array of the same shape and dtype.
+    """
+    frames = np.asarray(frames)
+    valid = np.asarray(valid, dtype=bool)
+    if frames.shape[0] != valid.shape[0]:
+        raise ValueError(f"Mask has {valid.shape[0]} entries for {frames.shape[0]} frames")
+    if not np.any(valid):
+        raise ValueError("Cannot interpolate a sequence without any valid frame")
+    if np.all(valid):
+        return frames.copy()
+
+    num_frames = frames.shape[0]
+    positions = np.arange(num_frames)
+    # Index of the closest valid frame at or before / at or after every position.
+    prev_idx = np.maximum.accumulate(np.where(valid, positions, -1))
+    next_idx = np.minimum.accumulate(np.where(valid, positions, num_frames)[::-1])[::-1]
+
+    prev_idx = np.where(prev_idx < 0, next_idx, prev_idx)
+    next_idx = np.where(next_idx >= num_frames, prev_idx, next_idx)
+
+    span = next_idx - prev_idx
+    t = np.divide(positions - prev_idx, span, out=np.zeros(num_frames), where=span > 0)
+    if np.issubdtype(frames.dtype, np.floating):
+        t = t.astype(frames.dtype)
+
+    prev_frames = frames[prev_idx]
+    filled = prev_frames + (frames[next_idx] - prev_frames) * t[:, None]
+    filled[valid] = frames[valid]
+    return filled.astype(frames.dtype, copy=False)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from landmarks.conversion import (EXPECTED_COORDS_PER_FRAME, POSE_SLICE, LEFT_HAND_SLICE,
+                                  RIGHT_HAND_SLICE, FACE_SLICE)
+
+# (slice into the flat frame, values per landmark)
+FRAME_PARTS = [
+    (POSE_SLICE, 4),
+    (LEFT_HAND_SLICE, 3),
+    (RIGHT_HAND_SLICE, 3),
+    (FACE_SLICE, 3),
+]
+
+SCALE_EPSILON = 1e-6
+
+
+def normalize_landmarks(landmarks, frame_parts=FRAME_PARTS, coords_per_frame=EXPECTED_COORDS_PER_FRAME):
+    """
+    Normalizes landmarks to be translation and scale invariant, one body part at a time.
+    Accepts a single frame (coords,), a sequence (frames, coords) or a batch
+    (batch, frames, coords) and returns float32 of the same shape.
+
+    Every part is centred on the mean of its x, y, z and divided by its largest
+    distance from that mean. Parts that are all zero (not detected) stay zero.
+    """
+    landmarks = np.asarray(landmarks)
+    if landmarks.size == 0:
+        return landmarks.astype(np.float32)
+    if not np.issubdtype(landmarks.dtype, np.floating):
+        landmarks = landmarks.astype(np.float32)
+
+    leading_shape = landmarks.shape[:-1]
+    frames = landmarks.reshape(-1, landmarks.shape[-1])
+    if frames.shape[1] != coords_per_frame:
+        fitted = np.zeros((frames.shape[0], coords_per_frame), dtype=frames.dtype)
+        width = min(coords_per_frame, frames.shape[1])
+        fitted[:, :width] = frames[:, :width]
+        frames = fitted
+
+    single_frame = frames.shape[0] == 1
+    if single_frame:
+        # With one frame numpy would sum the landmark axis pairwise instead of in
+        # order; an extra all-zero frame keeps the order and is dropped below.
+        frames = np.vstack([frames, np.zeros_like(frames)])
+
+    num_frames = frames.shape[0]
+    normalized = np.zeros((num_frames, coords_per_frame), dtype=np.float32)
+
+    for part_slice, coords_per_lm in frame_parts:
+        # Coordinate-major (coords, landmarks, frames) keeps every reduction on long
+        # contiguous rows while summing in the same order as the per-frame version,
+        # so results are bit-identical to it.
+        coords = np.ascontiguousarray(frames[:, part_slice].reshape(num_frames, -1, coords_per_lm).transpose(2, 1, 0))
+        xyz = coords[:3]
+
+        detected = np.any(xyz != 0, axis=(0, 1))
+        if not np.any(detected):
+            continue
+
+        xyz -= np.mean(xyz, axis=1, keepdims=True)
+        squared_norms = xyz[0] * xyz[0] + xyz[1] * xyz[1] + xyz[2] * xyz[2]
+        scale = np.max(np.sqrt(squared_norms), axis=0)
+        xyz /= np.where(scale > SCALE_EPSILON, scale, 1).astype(xyz.dtype)
+
+        coords[:, :, ~detected] = 0
+        normalized[:, part_slice] = coords.transpose(2, 1, 0).reshape(num_frames, -1)
+
+    if single_frame:
+        normalized = normalized[:1]
+    return normalized.reshape(*leading_shape, coords_per_frame)
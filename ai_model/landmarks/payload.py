@@ -0,0 +1,101 @@
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from landmarks.conversion import (EXPECTED_COORDS_PER_FRAME, NUM_HAND_COORDS, POSE_SLICE, LEFT_HAND_SLICE,
+                                  RIGHT_HAND_SLICE, FACE_SLICE)
+
+# Binary frame sent by clients that run MediaPipe themselves:
+#   magic b'HULM' | version u8 | schema u8 | presence flags u8 | reserved u8 | frame index u32
+# followed by little-endian float32 landmarks laid out exactly like the server-side arrays.
+
+PAYLOAD_MAGIC = b'HULM'
+PAYLOAD_VERSION = 1
+HEADER_FORMAT = '<4sBBBBI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# A single hand, (21, 3) x/y/z - what the letters models consume.
+SCHEMA_HAND = 1
+# A full holistic frame, 1662 values - what the words model consumes.
+SCHEMA_HOLISTIC = 2
+
+SCHEMA_SIZES = {
+    SCHEMA_HAND: NUM_HAND_COORDS,
+    SCHEMA_HOLISTIC: EXPECTED_COORDS_PER_FRAME,
+}
+
+PRESENT_POSE = 1
+PRESENT_LEFT_HAND = 2
+PRESENT_RIGHT_HAND = 4
+PRESENT_FACE = 8
+PRESENT_HAND = PRESENT_RIGHT_HAND
+
+HOLISTIC_PARTS = [
+    (PRESENT_POSE, POSE_SLICE),
+    (PRESENT_LEFT_HAND, LEFT_HAND_SLICE),
+    (PRESENT_RIGHT_HAND, RIGHT_HAND_SLICE),
+    (PRESENT_FACE, FACE_SLICE),
+]
+
+LandmarkFrame = namedtuple('LandmarkFrame', ['schema', 'presence', 'frame_index', 'landmarks'])
+
+
+def holistic_presence(frame, parts=HOLISTIC_PARTS):
+    """
+    Presence flags for a (1662,) holistic frame, one bit per part that is not all zero.
+    Frames of another feature schema pass its presence_parts.
+    """
+    presence = 0
+    for flag, part_slice in parts:
+        if np.any(frame[part_slice]):
+            presence |= flag
+    return presence
+
+
+def encode_landmark_frame(landmarks, schema, frame_index=0, presence=None):
+    """Packs landmarks into the binary payload. Presence is derived from the data if not given."""
+    values = np.ascontiguousarray(landmarks, dtype='<f4').reshape(-1)
+    if schema not in SCHEMA_SIZES:
+        raise ValueError(f"Unknown landmark schema {schema}")
+    if values.size != SCHEMA_SIZES[schema]:
+        raise ValueError(f"Schema {schema} expects {SCHEMA_SIZES[schema]} values, got {values.size}")
+    if presence is None:
+        if schema == SCHEMA_HOLISTIC:
+            presence = holistic_presence(values)
+        else:
+            presence = PRESENT_HAND if np.any(values) else 0
+    header = struct.pack(HEADER_FORMAT, PAYLOAD_MAGIC, PAYLOAD_VERSION, schema, presence, 0, frame_index)
+    return header + values.tobytes()
+
+
+def is_landmark_payload(data):
+    return len(data) >= HEADER_SIZE and data[:4] == PAYLOAD_MAGIC
+
+
+def decode_landmark_frame(data):
+    """
+    Parses a binary payload into a LandmarkFrame. The landmarks are a read-only float32
+    view over the message bytes: (21, 3) for SCHEMA_HAND, (1662,) for SCHEMA_HOLISTIC.
+    Raises ValueError on anything malformed.
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"Landmark payload is {len(data)} bytes, shorter than its {HEADER_SIZE} byte header")
+    magic, version, schema, presence, _, frame_index = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != PAYLOAD_MAGIC:
+        raise ValueError("Not a landmark payload")
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported landmark payload version {version}")
+    if schema not in SCHEMA_SIZES:
+        raise ValueError(f"Unknown landmark schema {schema}")
+
+    expected_bytes = HEADER_SIZE + SCHEMA_SIZES[schema] * 4
+    if len(data) != expected_bytes:
+        raise ValueError(f"Schema {schema} payload should be {expected_bytes} bytes, got {len(data)}")
+
+    landmarks = np.frombuffer(data, dtype='<f4', offset=HEADER_SIZE).astype(np.float32, copy=False)
+    if not np.all(np.isfinite(landmarks)):
+        raise ValueError("Landmark payload contains non-finite values")
+    if schema == SCHEMA_HAND:
+        landmarks = landmarks.reshape(-1, 3)
+    return LandmarkFrame(schema, presence, frame_index, landmarks)
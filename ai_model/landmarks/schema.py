@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+from landmarks.conversion import (EXPECTED_COORDS_PER_FRAME, NUM_FACE_LANDMARKS, POSE_SLICE, LEFT_HAND_SLICE,
+                                  RIGHT_HAND_SLICE, FACE_SLICE)
+from landmarks.payload import PRESENT_POSE, PRESENT_LEFT_HAND, PRESENT_RIGHT_HAND, PRESENT_FACE
+
+# Feature schemas of the words pipeline. Every schema keeps pose and both hands laid
+# out as in the full 1662-float frame; they differ in which of the 468 face mesh
+# points follow the hands. Extraction, preprocessing, training and serving must use
+# the same schema (WORDS_FEATURE_SCHEMA), and so must the model they produce.
+
+# FaceMesh lip contours (mediapipe FACEMESH_LIPS) and eyebrows (FACEMESH_*_EYEBROW).
+LIP_LANDMARKS = (0, 13, 14, 17, 37, 39, 40, 61, 78, 80, 81, 82, 84, 87, 88, 91, 95, 146, 178, 181, 185, 191,
+                 267, 269, 270, 291, 308, 310, 311, 312, 314, 317, 318, 321, 324, 375, 402, 405, 409, 415)
+EYEBROW_LANDMARKS = (46, 52, 53, 55, 63, 65, 66, 70, 105, 107, 276, 282, 283, 285, 293, 295, 296, 300, 334, 336)
+
+DEFAULT_SCHEMA = 'full'
+
+
+class FeatureSchema:
+    """
+    Layout of one words frame: pose (33 x 4), left hand, right hand (21 x 3 each),
+    then the face points in face_landmarks (all 468 when None, none when empty).
+    """
+
+    def __init__(self, name, face_landmarks=None):
+        self.name = name
+        self.face_landmarks = None if face_landmarks is None else np.asarray(face_landmarks, dtype=np.intp)
+        num_face = NUM_FACE_LANDMARKS if face_landmarks is None else len(face_landmarks)
+        self.face_slice = slice(RIGHT_HAND_SLICE.stop, RIGHT_HAND_SLICE.stop + num_face * 3)
+        self.coords_per_frame = self.face_slice.stop
+
+        # (slice, values per landmark) for normalize_landmarks, and (flag, slice) for holistic_presence.
+        self.frame_parts = [(POSE_SLICE, 4), (LEFT_HAND_SLICE, 3), (RIGHT_HAND_SLICE, 3)]
+        self.presence_parts = [(PRESENT_POSE, POSE_SLICE), (PRESENT_LEFT_HAND, LEFT_HAND_SLICE),
+                               (PRESENT_RIGHT_HAND, RIGHT_HAND_SLICE)]
+        if num_face:
+            self.frame_parts.append((self.face_slice, 3))
+            self.presence_parts.append((PRESENT_FACE, self.face_slice))
+
+        # Columns of a full frame that make up this schema's frame.
+        face_columns = np.arange(FACE_SLICE.start, FACE_SLICE.stop) if self.face_landmarks is None else \
+            (FACE_SLICE.start + 3 * self.face_landmarks[:, None] + np.arange(3)).reshape(-1)
+        self.columns = np.concatenate([np.arange(RIGHT_HAND_SLICE.stop), face_columns])
+
+    def select(self, frames):
+        """Full frames (..., 1662) -> this schema's frames (..., coords_per_frame)."""
+        frames = np.asarray(frames)
+        if frames.shape[-1] != EXPECTED_COORDS_PER_FRAME:
+            raise ValueError(f"Expected frames of {EXPECTED_COORDS_PER_FRAME} values, got {frames.shape[-1]}")
+        if self.coords_per_frame == EXPECTED_COORDS_PER_FRAME:
+            return frames
+        return frames[..., self.columns]
+
+    def path(self, path):
+        """Output path for this schema: unchanged for the full schema, '<stem>_<name><ext>' otherwise."""
+        if self.name == DEFAULT_SCHEMA:
+            return path
+        stem, ext = os.path.splitext(path)
+        return f"{stem}_{self.name}{ext}"
+
+
+FEATURE_SCHEMAS = {
+    schema.name: schema for schema in (
+        FeatureSchema('full'),
+        FeatureSchema('pose_hands', face_landmarks=()),
+        # The plain 468-point mesh already has every lip and eyebrow point, so
+        # Holistic's refined face mesh is not needed (and recordings don't use it).
+        FeatureSchema('pose_hands_lips_brows', face_landmarks=sorted(LIP_LANDMARKS + EYEBROW_LANDMARKS)),
+    )
+}
+
+
+def get_schema(name=None):
+    """The schema called name, or the one WORDS_FEATURE_SCHEMA names (full by default)."""
+    name = name or os.getenv('WORDS_FEATURE_SCHEMA', DEFAULT_SCHEMA)
+    if name not in FEATURE_SCHEMAS:
+        raise ValueError(f"Unknown feature schema {name!r}; expected one of {', '.join(FEATURE_SCHEMAS)}")
+    return FEATURE_SCHEMAS[name]
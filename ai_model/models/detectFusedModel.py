@@ -0,0 +1,95 @@
+import pickle
+import numpy as np
+import tensorflow as tf
+from sklearn.preprocessing import LabelEncoder
+from tensorflow.keras.callbacks import EarlyStopping
+
+# Letters and numbers share one convolutional trunk with a head per task, so the
+# server can run a single graph and only evaluate the head a session asks for.
+
+early_stop = EarlyStopping(patience=2, restore_best_weights=True)
+
+def loadCleaned(path):
+    dataDict = pickle.load(open(path, 'rb'))
+    cleanedData = []
+    cleanedLabels = []
+    for i, item in enumerate(dataDict['data']):
+        if isinstance(item, (np.ndarray, list)) and len(item) == 42:
+            cleanedData.append(np.array(item, dtype=np.float32))
+            cleanedLabels.append(dataDict['labels'][i])
+    return np.array(cleanedData).reshape(-1, 42, 1), np.array(cleanedLabels)
+
+xLetters, yLettersRaw = loadCleaned('../processed_data/trainData.pickle')
+xLettersFine, yLettersFineRaw = loadCleaned('../processed_data/fineTuneData.pickle')
+xNumbers, yNumbersRaw = loadCleaned('../processed_data/numTrainData.pickle')
+
+dataDictTest = pickle.load(open('../processed_data/testData.pickle', 'rb'))
+xLettersTest = np.array(dataDictTest['data'], dtype=np.float32).reshape(-1, 42, 1)
+yLettersTestRaw = np.array(dataDictTest['labels'])
+
+dataDictNumTest = pickle.load(open('../processed_data/numTestData.pickle', 'rb'))
+xNumbersTest = np.array(dataDictNumTest['data'], dtype=np.float32).reshape(-1, 42, 1)
+yNumbersTestRaw = np.array(dataDictNumTest['labels'])
+
+labelEncoder = LabelEncoder()
+labelEncoder.fit(yLettersRaw)
+numLabelEncoder = LabelEncoder()
+numLabelEncoder.fit(yNumbersRaw)
+
+inputs = tf.keras.Input(shape=(42, 1))
+trunk = tf.keras.layers.Conv1D(32, kernel_size=3, activation='relu', name='trunkConv1')(inputs)
+trunk = tf.keras.layers.MaxPooling1D(pool_size=2, name='trunkPool')(trunk)
+trunk = tf.keras.layers.Conv1D(64, kernel_size=3, activation='relu', name='trunkConv2')(trunk)
+trunk = tf.keras.layers.Flatten(name='trunkFlatten')(trunk)
+
+lettersHidden = tf.keras.layers.Dense(64, activation='relu', name='lettersHidden')(trunk)
+lettersOutput = tf.keras.layers.Dense(len(labelEncoder.classes_), activation='softmax', name='letters')(lettersHidden)
+numbersHidden = tf.keras.layers.Dense(64, activation='relu', name='numbersHidden')(trunk)
+numbersOutput = tf.keras.layers.Dense(len(numLabelEncoder.classes_), activation='softmax', name='numbers')(numbersHidden)
+
+model = tf.keras.Model(inputs, [lettersOutput, numbersOutput], name='detectFusedModel')
+
+def buildTargets(xLettersPart, yLettersPart, xNumbersPart, yNumbersPart):
+    # Every sample only has a label for one head; the other head gets a dummy
+    # label with zero sample weight so it does not contribute to the loss.
+    x = np.concatenate([xLettersPart, xNumbersPart])
+    yLettersTarget = np.concatenate([labelEncoder.transform(yLettersPart), np.zeros(len(xNumbersPart), dtype=np.int64)])
+    yNumbersTarget = np.concatenate([np.zeros(len(xLettersPart), dtype=np.int64), numLabelEncoder.transform(yNumbersPart)])
+    lettersWeight = np.concatenate([np.ones(len(xLettersPart)), np.zeros(len(xNumbersPart))]).astype(np.float32)
+    numbersWeight = np.concatenate([np.zeros(len(xLettersPart)), np.ones(len(xNumbersPart))]).astype(np.float32)
+    order = np.random.permutation(len(x))
+    return (x[order],
+            {'letters': yLettersTarget[order], 'numbers': yNumbersTarget[order]},
+            {'letters': lettersWeight[order], 'numbers': numbersWeight[order]})
+
+xTrain, yTrain, weightsTrain = buildTargets(xLetters, yLettersRaw, xNumbers, yNumbersRaw)
+
+model.compile(optimizer='adam',
+              loss={'letters': 'sparse_categorical_crossentropy', 'numbers': 'sparse_categorical_crossentropy'},
+              metrics={'letters': ['accuracy'], 'numbers': ['accuracy']})
+model.fit(xTrain, yTrain, sample_weight=weightsTrain, epochs=15, batch_size=32, validation_split=0.2)
+
+#fine tune the letters head (hidden and output layer, as detectLettersModel.py does); the trunk and numbers head stay as trained
+for layer in model.layers:
+    layer.trainable = layer.name in ('lettersHidden', 'letters')
+
+xFine, yFine, weightsFine = buildTargets(xLettersFine, yLettersFineRaw, xNumbers[:0], yNumbersRaw[:0])
+model.compile(optimizer=tf.keras.optimizers.Adam(1e-5),
+              loss={'letters': 'sparse_categorical_crossentropy', 'numbers': 'sparse_categorical_crossentropy'},
+              metrics={'letters': ['accuracy'], 'numbers': ['accuracy']})
+model.fit(xFine, yFine, sample_weight=weightsFine, epochs=10, batch_size=32, validation_split=0.2, callbacks=[early_stop])
+
+lettersPredictions, _ = model.predict(xLettersTest)
+lettersAccuracy = np.mean(labelEncoder.inverse_transform(np.argmax(lettersPredictions, axis=1)) == yLettersTestRaw)
+_, numbersPredictions = model.predict(xNumbersTest)
+numbersAccuracy = np.mean(numLabelEncoder.inverse_transform(np.argmax(numbersPredictions, axis=1)) == yNumbersTestRaw)
+
+print(f"\nLetters test accuracy: {lettersAccuracy * 100:.2f}%")
+print(f"Numbers test accuracy: {numbersAccuracy * 100:.2f}%")
+
+model.save("detectFusedModel.keras")
+#own encoders, labelEncoder.pickle and numLabelEncoder.pickle belong to the separate models
+with open("detectFusedLabelEncoder.pickle", "wb") as file:
+    pickle.dump(labelEncoder, file)
+with open("detectFusedNumLabelEncoder.pickle", "wb") as file:
+    pickle.dump(numLabelEncoder, file)
@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split 
@@ -6,13 +7,20 @@ from tensorflow.keras.utils import to_categorical
 from tqdm import tqdm
 import random 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.normalization import normalize_landmarks
+from landmarks.schema import get_schema
+
 
 PROCESSED_DATA_CSV = 'wlasl_125_words_personal_processed.csv'
-EXTRACTED_LANDMARKS_DIR = 'extracted_landmarks'
-PROCESSED_SEQUENCES_DIR = 'processed_sequences'
+# Must match the schema landmark_extractor.py ran with; WORDS_FEATURE_SCHEMA overrides it.
+FEATURE_SCHEMA = get_schema()
+EXTRACTED_LANDMARKS_DIR = FEATURE_SCHEMA.path('extracted_landmarks')
+PROCESSED_SEQUENCES_DIR = FEATURE_SCHEMA.path('processed_sequences')
+FINAL_PROCESSED_DATA_CSV = FEATURE_SCHEMA.path('wlasl_125_words_personal_final_processed_data_augmented_seq90.csv')
 
 SEQUENCE_LENGTH = 90 
-EXPECTED_COORDS_PER_FRAME = 1662 
+EXPECTED_COORDS_PER_FRAME = FEATURE_SCHEMA.coords_per_frame
 
 NUM_AUGMENTATIONS_PER_TRAIN_VIDEO = 5 
 AUG_MAX_ROTATION_DEG = 10 
@@ -22,76 +30,12 @@ AUG_MAX_JITTER_AMOUNT = 0.003
 MAX_VIDEOS_FOR_TEST = None 
 
 
-def normalize_landmarks(landmarks_sequence):
-    """
-    Normalizes a sequence of landmarks (frames, coords) to be translation and scale invariant.
-    """
-    if landmarks_sequence.size == 0:
-        return landmarks_sequence.astype(np.float32)
-    if landmarks_sequence.ndim == 1:
-        input_is_single_frame = True
-        landmarks_sequence_2d = np.expand_dims(landmarks_sequence, axis=0)
-    else:
-        input_is_single_frame = False
-        landmarks_sequence_2d = landmarks_sequence
-    NUM_POSE_COORDS_SINGLE = 33 * 4
-    NUM_HAND_COORDS_SINGLE = 21 * 3
-    NUM_FACE_COORDS_SINGLE = 468 * 3
-    normalized_sequences = []
-    for frame_landmarks in landmarks_sequence_2d:
-        if np.all(frame_landmarks == 0):
-            normalized_sequences.append(np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32))
-            continue 
-        pose_coords_flat = frame_landmarks[0 : NUM_POSE_COORDS_SINGLE]
-        left_hand_coords_flat = frame_landmarks[NUM_POSE_COORDS_SINGLE : NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE]
-        right_hand_coords_flat = frame_landmarks[NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE : NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE]
-        face_coords_flat = frame_landmarks[NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE : ]
-        all_parts_data = [
-            (pose_coords_flat, 4, [0.0] * NUM_POSE_COORDS_SINGLE),
-            (left_hand_coords_flat, 3, [0.0] * NUM_HAND_COORDS_SINGLE),
-            (right_hand_coords_flat, 3, [0.0] * NUM_HAND_COORDS_SINGLE),
-            (face_coords_flat, 3, [0.0] * NUM_FACE_COORDS_SINGLE)
-        ]
-        normalized_frame_parts = []
-        for flat_lms, coords_per_lm, original_padded_list_template in all_parts_data:
-            if np.all(flat_lms == 0):
-                normalized_frame_parts.append(np.array(original_padded_list_template, dtype=np.float32))
-                continue
-            lms_array = flat_lms.reshape(-1, coords_per_lm)
-            coords_for_mean = lms_array[:, :3] if coords_per_lm == 4 else lms_array
-            if np.all(coords_for_mean == 0):
-                normalized_frame_parts.append(np.array(original_padded_list_template, dtype=np.float32))
-                continue
-            mean_coords = np.mean(coords_for_mean, axis=0)
-            translated_lms = lms_array.copy()
-            translated_lms[:, :3] -= mean_coords
-            scale_factor = np.max(np.linalg.norm(translated_lms[:, :3], axis=1))
-            if scale_factor > 1e-6:
-                translated_lms[:, :3] /= scale_factor
-            normalized_frame_parts.append(translated_lms.flatten())
-        combined_normalized_frame = np.concatenate(normalized_frame_parts).astype(np.float32)
-        if len(combined_normalized_frame) < EXPECTED_COORDS_PER_FRAME:
-            combined_normalized_frame = np.pad(combined_normalized_frame, (0, EXPECTED_COORDS_PER_FRAME - len(combined_normalized_frame)), 'constant', constant_values=0.0)
-        elif len(combined_normalized_frame) > EXPECTED_COORDS_PER_FRAME:
-            combined_normalized_frame = combined_normalized_frame[:EXPECTED_COORDS_PER_FRAME]
-        normalized_sequences.append(combined_normalized_frame)
-    result_array = np.array(normalized_sequences, dtype=np.float32)
-    if input_is_single_frame:
-        return result_array[0] 
-    else:
-        return result_array 
-
-
-def augment_sequence(sequence, max_rotation_deg, max_scale_factor, max_jitter_amount):
+def augment_sequence(sequence, max_rotation_deg, max_scale_factor, max_jitter_amount, frame_parts=FEATURE_SCHEMA.frame_parts):
     """
     Applies random geometric augmentations to a landmark sequence.
     """
     augmented_sequence = sequence.copy()
 
-    NUM_POSE_COORDS_SINGLE = 33 * 4
-    NUM_HAND_COORDS_SINGLE = 21 * 3
-    NUM_FACE_COORDS_SINGLE = 468 * 3
-
     angle_rad = np.deg2rad(np.random.uniform(-max_rotation_deg, max_rotation_deg))
     cos_val = np.cos(angle_rad)
     sin_val = np.sin(angle_rad)
@@ -100,39 +44,16 @@ def augment_sequence(sequence, max_rotation_deg, max_scale_factor, max_jitter_am
     temp_sequence = []
     for frame_lms in augmented_sequence:
         processed_parts = []
-        current_idx = 0
-
-        pose_lms = frame_lms[current_idx : current_idx + NUM_POSE_COORDS_SINGLE].reshape(-1, 4)
-        current_idx += NUM_POSE_COORDS_SINGLE
-        if pose_lms.size > 0 and not np.all(pose_lms[:,:3] == 0):
-            rotated_xy_pose = pose_lms[:, :2].dot(np.array([[cos_val, -sin_val], [sin_val, cos_val]]))
-            pose_lms[:, :2] = rotated_xy_pose
-            pose_lms[:, :3] *= scale
-        processed_parts.append(pose_lms.flatten())
-
-        left_hand_lms = frame_lms[current_idx : current_idx + NUM_HAND_COORDS_SINGLE].reshape(-1, 3)
-        current_idx += NUM_HAND_COORDS_SINGLE
-        if left_hand_lms.size > 0 and not np.all(left_hand_lms == 0):
-            rotated_xy_lh = left_hand_lms[:, :2].dot(np.array([[cos_val, -sin_val], [sin_val, cos_val]]))
-            left_hand_lms[:, :2] = rotated_xy_lh
-            left_hand_lms *= scale
-        processed_parts.append(left_hand_lms.flatten())
-
-        right_hand_lms = frame_lms[current_idx : current_idx + NUM_HAND_COORDS_SINGLE].reshape(-1, 3)
-        current_idx += NUM_HAND_COORDS_SINGLE
-        if right_hand_lms.size > 0 and not np.all(right_hand_lms == 0):
-            rotated_xy_rh = right_hand_lms[:, :2].dot(np.array([[cos_val, -sin_val], [sin_val, cos_val]]))
-            right_hand_lms[:, :2] = rotated_xy_rh
-            right_hand_lms *= scale
-        processed_parts.append(right_hand_lms.flatten())
-
-        face_lms = frame_lms[current_idx : current_idx + NUM_FACE_COORDS_SINGLE].reshape(-1, 3)
-        if face_lms.size > 0 and not np.all(face_lms == 0):
-            rotated_xy_face = face_lms[:, :2].dot(np.array([[cos_val, -sin_val], [sin_val, cos_val]]))
-            face_lms[:, :2] = rotated_xy_face
-            face_lms *= scale
-        processed_parts.append(face_lms.flatten())
-        
+        # Every part (pose, hands, face points) is rotated and scaled in place;
+        # pose visibility is left alone.
+        for part_slice, coords_per_lm in frame_parts:
+            part_lms = frame_lms[part_slice].reshape(-1, coords_per_lm)
+            if part_lms.size > 0 and not np.all(part_lms[:, :3] == 0):
+                rotated_xy = part_lms[:, :2].dot(np.array([[cos_val, -sin_val], [sin_val, cos_val]]))
+                part_lms[:, :2] = rotated_xy
+                part_lms[:, :3] *= scale
+            processed_parts.append(part_lms.flatten())
+
         temp_sequence.append(np.concatenate(processed_parts))
     
     augmented_sequence = np.array(temp_sequence, dtype=np.float32)
@@ -142,9 +63,8 @@ def augment_sequence(sequence, max_rotation_deg, max_scale_factor, max_jitter_am
     return augmented_sequence
 
 
-def _process_and_pad_sequence(raw_landmarks, output_dir, video_id, gloss, split):
-    """Helper to normalize, pad/truncate and save a single sequence."""
-    normalized_landmarks = normalize_landmarks(raw_landmarks)
+def _process_and_pad_sequence(normalized_landmarks, output_dir, video_id, gloss, split):
+    """Helper to pad/truncate and save a single normalized sequence."""
     if normalized_landmarks is None or normalized_landmarks.size == 0:
         return None
     if normalized_landmarks.shape[0] < SEQUENCE_LENGTH:
@@ -188,30 +108,36 @@ if __name__ == "__main__":
             print(f"Warning: Raw landmark file not found for {video_id}. Skipping.")
             continue
         raw_landmarks = np.load(raw_landmarks_path)
-        original_record = _process_and_pad_sequence(raw_landmarks, PROCESSED_SEQUENCES_DIR, video_id, gloss, split)
-        if original_record:
-            original_record['gloss_id'] = gloss_to_id[original_record['gloss']]
-            processed_data_records.append(original_record)
+        if raw_landmarks.size == 0:
+            continue
+        if raw_landmarks.shape[1] != EXPECTED_COORDS_PER_FRAME:
+            print(f"Warning: {raw_landmarks_path} has {raw_landmarks.shape[1]} values per frame, expected {EXPECTED_COORDS_PER_FRAME} for the {FEATURE_SCHEMA.name} schema. Skipping.")
+            continue
+        # The original and its augmentations share a length, so all of them are
+        # normalized together in one batched call.
+        variants = [raw_landmarks]
         if split == 'train':
             for aug_idx in range(NUM_AUGMENTATIONS_PER_TRAIN_VIDEO):
-                augmented_raw_landmarks = augment_sequence(
+                variants.append(augment_sequence(
                     raw_landmarks.copy(), 
                     AUG_MAX_ROTATION_DEG, 
                     AUG_MAX_SCALE_FACTOR, 
                     AUG_MAX_JITTER_AMOUNT
-                )
-                aug_video_id = f"{video_id}_aug{aug_idx}"
-                aug_record = _process_and_pad_sequence(augmented_raw_landmarks, PROCESSED_SEQUENCES_DIR, aug_video_id, gloss, split)
-                if aug_record:
-                    aug_record['gloss_id'] = gloss_to_id[aug_record['gloss']]
-                    processed_data_records.append(aug_record)
+                ))
+        normalized_variants = normalize_landmarks(np.stack(variants), FEATURE_SCHEMA.frame_parts, EXPECTED_COORDS_PER_FRAME)
+        for variant_idx, normalized_landmarks in enumerate(normalized_variants):
+            variant_video_id = video_id if variant_idx == 0 else f"{video_id}_aug{variant_idx - 1}"
+            record = _process_and_pad_sequence(normalized_landmarks, PROCESSED_SEQUENCES_DIR, variant_video_id, gloss, split)
+            if record:
+                record['gloss_id'] = gloss_to_id[record['gloss']]
+                processed_data_records.append(record)
     final_processed_df = pd.DataFrame(processed_data_records)
     print(f"\n--- Feature Engineering and Data Preparation Summary ---")
     print(f"Total processed sequences saved: {len(final_processed_df)}")
     print(f"Processed sequences saved to: {PROCESSED_SEQUENCES_DIR}")
     print(f"Final DataFrame for training/validation/test (including augmentations):\n{final_processed_df['split'].value_counts()}")
-    final_processed_df.to_csv('wlasl_125_words_personal_final_processed_data_augmented_seq90.csv', index=False)
-    print("\nFinal processed data metadata saved to 'wlasl_125_words_personal_final_processed_data_augmented_seq90.csv'")
+    final_processed_df.to_csv(FINAL_PROCESSED_DATA_CSV, index=False)
+    print(f"\nFinal processed data metadata saved to '{FINAL_PROCESSED_DATA_CSV}'")
     if not final_processed_df.empty:
         original_entries = final_processed_df[~final_processed_df['video_id'].astype(str).str.contains('_aug', na=False)]
         augmented_entries = final_processed_df[final_processed_df['video_id'].astype(str).str.contains('_aug', na=False)]
@@ -3,31 +3,34 @@ import mediapipe as mp
 import pandas as pd
 import numpy as np
 import os
+import sys
 from tqdm import tqdm 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.conversion import holistic_to_array, EXPECTED_COORDS_PER_FRAME
+from landmarks.schema import get_schema
+
 
 PROCESSED_DATA_CSV = 'wlasl_125_words_personal_processed.csv'
-# Directory to save extracted landmark data
-OUTPUT_LANDMARKS_DIR = 'extracted_landmarks'
+# Feature schema to extract (full, pose_hands or pose_hands_lips_brows); WORDS_FEATURE_SCHEMA overrides it.
+FEATURE_SCHEMA = get_schema()
+# Directory to save extracted landmark data ('extracted_landmarks_<schema>' for other schemas)
+OUTPUT_LANDMARKS_DIR = FEATURE_SCHEMA.path('extracted_landmarks')
 # Whether to visualize the landmarks during extraction
 VISUALIZE_LANDMARKS = False
 # Max videos to process for quick test 
 MAX_VIDEOS_FOR_TEST = None
 
 
-NUM_POSE_COORDS = 33 * 4   # 33 landmarks * (x, y, z, visibility)
-NUM_HAND_COORDS = 21 * 3   # 21 landmarks * (x, y, z)
-NUM_FACE_COORDS = 468 * 3 # 468 landmarks * (x, y, z)
-
-
-def extract_landmarks_from_video(video_path, mp_holistic_instance):
+def extract_landmarks_from_video(video_path, mp_holistic_instance, schema=FEATURE_SCHEMA):
     is_npy_file = video_path.lower().endswith('.npy')
 
     if is_npy_file:
         try:
             landmarks_array = np.load(video_path)
-            if landmarks_array.ndim == 2 and landmarks_array.shape[1] == (NUM_POSE_COORDS + 2*NUM_HAND_COORDS + NUM_FACE_COORDS):
-                return landmarks_array
+            # Recordings hold full frames; other schemas keep their subset of them.
+            if landmarks_array.ndim == 2 and landmarks_array.shape[1] == EXPECTED_COORDS_PER_FRAME:
+                return schema.select(landmarks_array)
             else:
                 print(f"Warning: NPY file {video_path} has unexpected shape {landmarks_array.shape}. Skipping.")
                 return None
@@ -40,7 +43,10 @@ def extract_landmarks_from_video(video_path, mp_holistic_instance):
         print(f"Error: Could not open video {video_path}")
         return None
 
-    frame_landmarks_list = []
+    # Rows are written in place; the buffer starts at the reported frame count and
+    # doubles if the container under-reports it.
+    frame_landmarks = np.zeros((max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 1), schema.coords_per_frame), dtype=np.float32)
+    num_frames = 0
 
     while cap.isOpened():
         ret, frame = cap.read()
@@ -61,44 +67,17 @@ def extract_landmarks_from_video(video_path, mp_holistic_instance):
             if cv2.waitKey(1) & 0xFF == 27:
                 break
 
-        current_frame_raw_landmarks_flat = np.zeros(NUM_POSE_COORDS + NUM_HAND_COORDS + NUM_HAND_COORDS + NUM_FACE_COORDS, dtype=np.float32)
-        current_idx = 0
-
-        if results.pose_landmarks:
-            pose_lms_flat = []
-            for landmark in results.pose_landmarks.landmark:
-                pose_lms_flat.extend([landmark.x, landmark.y, landmark.z, landmark.visibility])
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(pose_lms_flat)] = pose_lms_flat
-        current_idx += NUM_POSE_COORDS
-
-        if results.left_hand_landmarks:
-            lh_lms_flat = []
-            for landmark in results.left_hand_landmarks.landmark:
-                lh_lms_flat.extend([landmark.x, landmark.y, landmark.z])
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(lh_lms_flat)] = lh_lms_flat
-        current_idx += NUM_HAND_COORDS
-
-        if results.right_hand_landmarks:
-            rh_lms_flat = []
-            for landmark in results.right_hand_landmarks.landmark:
-                rh_lms_flat.extend([landmark.x, landmark.y, landmark.z])
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(rh_lms_flat)] = rh_lms_flat
-        current_idx += NUM_HAND_COORDS
-
-        if results.face_landmarks:
-            face_lms_flat = []
-            for landmark in results.face_landmarks.landmark:
-                face_lms_flat.extend([landmark.x, landmark.y, landmark.z])
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(face_lms_flat)] = face_lms_flat
-
-        frame_landmarks_list.append(current_frame_raw_landmarks_flat)
+        if num_frames == frame_landmarks.shape[0]:
+            frame_landmarks = np.concatenate([frame_landmarks, np.zeros_like(frame_landmarks)])
+        holistic_to_array(results, out=frame_landmarks[num_frames], face_landmarks=schema.face_landmarks)
+        num_frames += 1
 
     cap.release()
     if VISUALIZE_LANDMARKS:
         cv2.destroyAllWindows()
 
-    if frame_landmarks_list:
-        return np.array(frame_landmarks_list, dtype=np.float32)
+    if num_frames > 0:
+        return frame_landmarks[:num_frames]
     else:
         return None
 
@@ -112,6 +91,7 @@ if __name__ == "__main__":
 
     df_base = pd.read_csv(PROCESSED_DATA_CSV)
     print(f"Loaded {len(df_base)} video entries from {PROCESSED_DATA_CSV}")
+    print(f"Feature schema: {FEATURE_SCHEMA.name} ({FEATURE_SCHEMA.coords_per_frame} values per frame)")
 
     mp_holistic = mp.solutions.holistic.Holistic(
         static_image_mode=False,
@@ -169,7 +149,7 @@ if __name__ == "__main__":
             print(f"Shape of loaded landmarks (frames, total_coords): {loaded_landmarks.shape}")
             print(f"First few values of the first frame's landmarks:\n{loaded_landmarks[0, :10]}")
 
-            expected_total_coords = NUM_POSE_COORDS + NUM_HAND_COORDS + NUM_HAND_COORDS + NUM_FACE_COORDS
+            expected_total_coords = FEATURE_SCHEMA.coords_per_frame
             print(f"Expected total coordinates per frame: {expected_total_coords}")
             if loaded_landmarks.shape[1] != expected_total_coords:
                 print(f"WARNING: Loaded landmark dimension {loaded_landmarks.shape[1]} does not match expected {expected_total_coords}.")
@@ -3,19 +3,21 @@ import mediapipe as mp
 import numpy as np
 import pandas as pd
 import os
+import sys
 from tensorflow.keras.models import load_model
 import time
 
-MODEL_PATH = 'saved_models/best_sign_classifier_model_125_words_seq90.keras'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.conversion import holistic_to_array
+from landmarks.normalization import normalize_landmarks
+from landmarks.schema import get_schema
+
+FEATURE_SCHEMA = get_schema()
+MODEL_PATH = FEATURE_SCHEMA.path('saved_models/best_sign_classifier_model_125_words_seq90.keras')
 PROCESSED_DATA_CSV = 'wlasl_125_words_personal_final_processed_data_augmented_seq90.csv'
 
 SEQUENCE_LENGTH = 90
-EXPECTED_COORDS_PER_FRAME = 1662
-
-# Define the expected number of coordinates for each type of landmark
-NUM_POSE_COORDS_SINGLE = 33 * 4
-NUM_HAND_COORDS_SINGLE = 21 * 3
-NUM_FACE_COORDS_SINGLE = 468 * 3
+EXPECTED_COORDS_PER_FRAME = FEATURE_SCHEMA.coords_per_frame
 
 RECORDING_DURATION_SECONDS = 3.6
 CONFIDENCE_THRESHOLD = 0.50 # Minimum confidence for a prediction to be displayed
@@ -33,78 +35,6 @@ STATE_PREDICTING = "PREDICTING..."
 STATE_RESULT = "" 
 STATE_COOLDOWN = "COOLDOWN..."
 
-def normalize_landmarks(landmarks_sequence):
-    """
-    Normalizes a sequence of landmarks (frames, coords) to be translation and scale invariant.
-    Handles single frames (ndim=1) or multiple frames (ndim=2).
-    """
-    if landmarks_sequence.size == 0:
-        return landmarks_sequence.astype(np.float32)
-
-    if landmarks_sequence.ndim == 1:
-        input_is_single_frame = True
-        landmarks_sequence_2d = np.expand_dims(landmarks_sequence, axis=0)
-    else:
-        input_is_single_frame = False
-        landmarks_sequence_2d = landmarks_sequence
-
-    normalized_sequences = []
-    for frame_landmarks in landmarks_sequence_2d:
-        if np.all(frame_landmarks == 0):
-            normalized_sequences.append(np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32))
-            continue
-
-        pose_coords_flat = frame_landmarks[0 : NUM_POSE_COORDS_SINGLE]
-        left_hand_coords_flat = frame_landmarks[NUM_POSE_COORDS_SINGLE : NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE]
-        right_hand_coords_flat = frame_landmarks[NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE : NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE]
-        face_coords_flat = frame_landmarks[NUM_POSE_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE + NUM_HAND_COORDS_SINGLE : ]
-        
-        all_parts_data = [
-            (pose_coords_flat, 4, [0.0] * NUM_POSE_COORDS_SINGLE),
-            (left_hand_coords_flat, 3, [0.0] * NUM_HAND_COORDS_SINGLE),
-            (right_hand_coords_flat, 3, [0.0] * NUM_HAND_COORDS_SINGLE),
-            (face_coords_flat, 3, [0.0] * NUM_FACE_COORDS_SINGLE)
-        ]
-        
-        normalized_frame_parts = []
-        for flat_lms, coords_per_lm, original_padded_list_template in all_parts_data:
-            if np.all(flat_lms == 0):
-                normalized_frame_parts.append(np.array(original_padded_list_template, dtype=np.float32))
-                continue
-            
-            lms_array = flat_lms.reshape(-1, coords_per_lm)
-            coords_for_mean = lms_array[:, :3] if coords_per_lm == 4 else lms_array
-            
-            if np.all(coords_for_mean == 0):
-                 normalized_frame_parts.append(np.array(original_padded_list_template, dtype=np.float32))
-                 continue
-
-            mean_coords = np.mean(coords_for_mean, axis=0)
-            translated_lms = lms_array.copy()
-            translated_lms[:, :3] -= mean_coords
-
-            scale_factor = np.max(np.linalg.norm(translated_lms[:, :3], axis=1))
-            if scale_factor > 1e-6:
-                translated_lms[:, :3] /= scale_factor
-            
-            normalized_frame_parts.append(translated_lms.flatten())
-            
-        combined_normalized_frame = np.concatenate(normalized_frame_parts).astype(np.float32)
-        
-        if len(combined_normalized_frame) < EXPECTED_COORDS_PER_FRAME:
-            combined_normalized_frame = np.pad(combined_normalized_frame, (0, EXPECTED_COORDS_PER_FRAME - len(combined_normalized_frame)), 'constant', constant_values=0.0)
-        elif len(combined_normalized_frame) > EXPECTED_COORDS_PER_FRAME:
-            combined_normalized_frame = combined_normalized_frame[:EXPECTED_COORDS_PER_FRAME]
-
-        normalized_sequences.append(combined_normalized_frame)
-            
-    result_array = np.array(normalized_sequences, dtype=np.float32)
-    
-    if input_is_single_frame:
-        return result_array[0]
-    else:
-        return result_array
-
 def pad_or_truncate_sequence(sequence, target_length, feature_dimension):
     """Pads or truncates a sequence to a target_length."""
     if sequence.shape[0] < target_length:
@@ -202,26 +132,7 @@ if __name__ == "__main__":
         mp.solutions.drawing_utils.draw_landmarks(frame, results.right_hand_landmarks, mp.solutions.holistic.HAND_CONNECTIONS)
         mp.solutions.drawing_utils.draw_landmarks(frame, results.face_landmarks, mp.solutions.holistic.FACEMESH_CONTOURS)
 
-        current_frame_raw_landmarks_flat = np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32)
-        current_idx = 0
-        if results.pose_landmarks:
-            pose_lms_flat = [coord for landmark in results.pose_landmarks.landmark for coord in [landmark.x, landmark.y, landmark.z, landmark.visibility]]
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(pose_lms_flat)] = pose_lms_flat
-        current_idx += NUM_POSE_COORDS_SINGLE
-
-        if results.left_hand_landmarks:
-            lh_lms_flat = [coord for landmark in results.left_hand_landmarks.landmark for coord in [landmark.x, landmark.y, landmark.z]]
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(lh_lms_flat)] = lh_lms_flat
-        current_idx += NUM_HAND_COORDS_SINGLE
-
-        if results.right_hand_landmarks:
-            rh_lms_flat = [coord for landmark in results.right_hand_landmarks.landmark for coord in [landmark.x, landmark.y, landmark.z]]
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(rh_lms_flat)] = rh_lms_flat
-        current_idx += NUM_HAND_COORDS_SINGLE
-
-        if results.face_landmarks:
-            face_lms_flat = [coord for landmark in results.face_landmarks.landmark for coord in [landmark.x, landmark.y, landmark.z]]
-            current_frame_raw_landmarks_flat[current_idx : current_idx + len(face_lms_flat)] = face_lms_flat
+        current_frame_raw_landmarks_flat = holistic_to_array(results, face_landmarks=FEATURE_SCHEMA.face_landmarks)
         
         # --- NEW LOGIC FOR AUTOMATIC RECORDING & SENTENCE BUILDING ---
         if current_state == STATE_IDLE or current_state == STATE_COOLDOWN:
@@ -246,7 +157,8 @@ if __name__ == "__main__":
             if not recorded_raw_landmarks_buffer:
                 print("Warning: No frames recorded for prediction.")
             else:
-                processed_sequence = normalize_landmarks(np.array(recorded_raw_landmarks_buffer))
+                processed_sequence = normalize_landmarks(np.array(recorded_raw_landmarks_buffer),
+                                                         FEATURE_SCHEMA.frame_parts, EXPECTED_COORDS_PER_FRAME)
                 final_input_sequence = pad_or_truncate_sequence(processed_sequence, SEQUENCE_LENGTH, EXPECTED_COORDS_PER_FRAME)
                 final_input_sequence = np.expand_dims(final_input_sequence, axis=0)
                 predictions = model.predict(final_input_sequence, verbose=0)
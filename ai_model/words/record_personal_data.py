@@ -2,8 +2,12 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import os
+import sys
 import time
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.conversion import holistic_to_array
+
 # Directory to save recorded raw landmark data
 OUTPUT_RECORDINGS_DIR = 'my_recorded_signs'
 
@@ -27,39 +31,9 @@ NUM_FACE_COORDS_SINGLE = 468 * 3
 def extract_raw_landmarks(results):
     """
     Extracts raw landmark data from MediaPipe results into a flat numpy array.
-    This logic should match how you populate current_frame_raw_landmarks_flat in realtime_translator.py
+    Uses the shared landmarks.conversion layout, the same one realtime_translator.py and the server use.
     """
-    current_frame_raw_landmarks_flat = np.zeros(EXPECTED_COORDS_PER_FRAME, dtype=np.float32)
-    current_idx = 0
-
-    if results.pose_landmarks:
-        pose_lms_flat = []
-        for landmark in results.pose_landmarks.landmark:
-            pose_lms_flat.extend([landmark.x, landmark.y, landmark.z, landmark.visibility])
-        current_frame_raw_landmarks_flat[current_idx : current_idx + len(pose_lms_flat)] = pose_lms_flat
-    current_idx += NUM_POSE_COORDS_SINGLE
-
-    if results.left_hand_landmarks:
-        lh_lms_flat = []
-        for landmark in results.left_hand_landmarks.landmark:
-            lh_lms_flat.extend([landmark.x, landmark.y, landmark.z])
-        current_frame_raw_landmarks_flat[current_idx : current_idx + len(lh_lms_flat)] = lh_lms_flat
-    current_idx += NUM_HAND_COORDS_SINGLE
-
-    if results.right_hand_landmarks:
-        rh_lms_flat = []
-        for landmark in results.right_hand_landmarks.landmark:
-            rh_lms_flat.extend([landmark.x, landmark.y, landmark.z])
-        current_frame_raw_landmarks_flat[current_idx : current_idx + len(rh_lms_flat)] = rh_lms_flat
-    current_idx += NUM_HAND_COORDS_SINGLE
-
-    if results.face_landmarks:
-        face_lms_flat = []
-        for landmark in results.face_landmarks.landmark:
-            face_lms_flat.extend([landmark.x, landmark.y, landmark.z])
-        current_frame_raw_landmarks_flat[current_idx : current_idx + len(face_lms_flat)] = face_lms_flat
-    
-    return current_frame_raw_landmarks_flat
+    return holistic_to_array(results)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split 
@@ -10,13 +11,19 @@ from tensorflow.keras.utils import to_categorical
 from tensorflow.keras.regularizers import l2 
 from tqdm import tqdm 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmarks.schema import get_schema
 
-PROCESSED_DATA_CSV = 'wlasl_125_words_personal_final_processed_data_augmented_seq90.csv'
-PROCESSED_SEQUENCES_DIR = 'processed_sequences' 
+
+# Must match the schema data_preprocessor.py ran with; WORDS_FEATURE_SCHEMA overrides it.
+FEATURE_SCHEMA = get_schema()
+PROCESSED_DATA_CSV = FEATURE_SCHEMA.path('wlasl_125_words_personal_final_processed_data_augmented_seq90.csv')
+PROCESSED_SEQUENCES_DIR = FEATURE_SCHEMA.path('processed_sequences')
 MODEL_SAVE_DIR = 'saved_models' 
+MODEL_FILENAME = FEATURE_SCHEMA.path('best_sign_classifier_model_125_words_seq90.keras')
 
 SEQUENCE_LENGTH = 90
-EXPECTED_COORDS_PER_FRAME = 1662 
+EXPECTED_COORDS_PER_FRAME = FEATURE_SCHEMA.coords_per_frame
 
 # --- Model Hyperparameters ---
 # These parameters are increased significantly to handle the larger vocabulary
@@ -70,6 +77,7 @@ if __name__ == "__main__":
         exit()
     df_final = pd.read_csv(PROCESSED_DATA_CSV)
     print(f"Loaded {len(df_final)} entries from {PROCESSED_DATA_CSV}")
+    print(f"Feature schema: {FEATURE_SCHEMA.name} ({EXPECTED_COORDS_PER_FRAME} values per frame)")
     train_df = df_final[df_final['split'] == 'train']
     val_df = df_final[df_final['split'] == 'val']
     test_df = df_final[df_final['split'] == 'test']
@@ -100,7 +108,7 @@ if __name__ == "__main__":
     )
     model.summary()
     early_stopping = EarlyStopping(monitor='val_accuracy', patience=40, restore_best_weights=True)
-    checkpoint_filepath = os.path.join(MODEL_SAVE_DIR, 'best_sign_classifier_model_125_words_seq90.keras')
+    checkpoint_filepath = os.path.join(MODEL_SAVE_DIR, MODEL_FILENAME)
     model_checkpoint = ModelCheckpoint(checkpoint_filepath, monitor='val_accuracy', save_best_only=True, verbose=1)
     reduce_lr = ReduceLROnPlateau(monitor='val_accuracy', factor=0.5, patience=20, min_lr=0.00001, verbose=1)
     print(f"\nStarting model training with BATCH_SIZE={BATCH_SIZE} and EPOCHS={EPOCHS}...")
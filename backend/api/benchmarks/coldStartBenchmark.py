@@ -0,0 +1,50 @@
+import time
+
+processStarted = time.perf_counter()
+
+import os
+import sys
+
+# Cold start to first prediction: imports the app, starts the background model
+# registry the way the startup hook does, and times the first letters prediction.
+# Exits non-zero when the first prediction takes longer than COLD_START_TARGET_S.
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+
+targetSeconds = float(os.getenv('COLD_START_TARGET_S', 20))
+
+def main():
+    import numpy as np
+
+    from handsUP import app
+    from utils.modelRegistry import modelRegistry
+    from controllers.lettersControllerS import lettersBatcher
+
+    imported = time.perf_counter()
+    modelRegistry.startLoading()
+
+    lettersBatcher.submit(np.zeros((42, 1), dtype=np.float32)).result()
+    firstPrediction = time.perf_counter()
+
+    while not all(entry.future.done() for entry in modelRegistry.entries.values()):
+        time.sleep(0.05)
+    allLoaded = time.perf_counter()
+
+    print(f"{'stage':<34} {'seconds':>8}")
+    print(f"{'import app (serving possible)':<34} {imported - processStarted:>8.2f}")
+    print(f"{'first letters prediction':<34} {firstPrediction - processStarted:>8.2f}")
+    print(f"{'all models loaded and warm':<34} {allLoaded - processStarted:>8.2f}")
+    print()
+    print(f"{'model':<20} {'status':<8} {'load s':>8} {'warm s':>8}")
+    for name, model in modelRegistry.status()['models'].items():
+        print(f"{name:<20} {model['status']:<8} {model['loadSeconds'] or 0:>8.2f} {model['warmSeconds'] or 0:>8.2f}"
+              + (f"  {model['error']}" if model['error'] else ''))
+
+    coldStart = firstPrediction - processStarted
+    print(f"\nCold start to first prediction: {coldStart:.2f}s (target {targetSeconds:.0f}s)")
+    return 0 if coldStart <= targetSeconds else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
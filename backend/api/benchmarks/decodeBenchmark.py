@@ -0,0 +1,111 @@
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Per-frame decode and MediaPipe Hands time on HD webcam-sized frames: the letter
+# images from the web client are placed on a DECODE_BENCH_SIZE canvas and drift a few
+# pixels per frame, like a signing hand, then encoded as JPEG. The images are
+# drawings, so each one is used at the first scale where MediaPipe finds its hand
+# on the full frame, and skipped if there is none. Each sequence is run with a full
+# decode (the old path) and with the reduced-scale decode. Letters predicted from
+# the reduced frames' landmarks are compared with the full-frame ones.
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+
+imageDir = os.getenv('DECODE_BENCH_IMAGES', '../../frontend/public/images/game')
+canvasWidth, canvasHeight = map(int, os.getenv('DECODE_BENCH_SIZE', '1920x1080').split('x'))
+framesPerSequence = int(os.getenv('DECODE_BENCH_FRAMES', 20))
+imageHeightFractions = (0.8, 1.0, 1.2, 0.6)
+driftPixels = 6
+
+def makeSequence(cv2, image, heightFraction):
+    # The image is pasted onto a canvas of its own background colour and cropped to it.
+    scale = heightFraction * canvasHeight / image.shape[0]
+    picture = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    picture = picture[:canvasHeight, :canvasWidth - framesPerSequence * driftPixels]
+    frames = []
+    for i in range(framesPerSequence):
+        canvas = np.empty((canvasHeight, canvasWidth, 3), dtype=np.uint8)
+        canvas[:] = image[0, 0]
+        x = (canvasWidth - picture.shape[1]) // 2 - framesPerSequence * driftPixels // 2 + i * driftPixels
+        y = (canvasHeight - picture.shape[0]) // 2
+        canvas[y:y + picture.shape[0], x:x + picture.shape[1]] = picture
+        frames.append(cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return frames
+
+def main():
+    import cv2
+    from utils.frameDecode import decodeFrame
+    from utils.mediapipePool import createHandsGraph, detectHand
+    from controllers.lettersControllerS import loadLettersClassifier, labelEncoder
+    from landmarks.conversion import letter_features
+
+    hands = createHandsGraph()
+    predictLetters = loadLettersClassifier()[0]
+
+    def fullDecode(frame):
+        return cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+
+    modes = {
+        'full decode': fullDecode,
+        'reduced decode': decodeFrame,
+    }
+
+    sequences = {}
+    for name in sorted(os.listdir(imageDir)):
+        image = cv2.imread(os.path.join(imageDir, name))
+        if image is None:
+            continue
+        for heightFraction in imageHeightFractions:
+            frames = makeSequence(cv2, image, heightFraction)
+            if detectHand(hands, fullDecode(frames[0])) is not None:
+                sequences[os.path.splitext(name)[0]] = frames
+                break
+    sample = next(iter(sequences.values()))[0]
+    print(f"{len(sequences)} sequences of {framesPerSequence} {canvasWidth}x{canvasHeight} JPEG frames "
+          f"({len(sample) // 1024} KiB each)\n")
+
+    def run(decode, frames):
+        decodeMs, extractMs, hands_ = [], [], []
+        for frame in frames:
+            started = time.perf_counter()
+            image = decode(frame)
+            decoded = time.perf_counter()
+            landmarks = detectHand(hands, image)
+            decodeMs.append((decoded - started) * 1000)
+            extractMs.append((time.perf_counter() - decoded) * 1000)
+            hands_.append(landmarks)
+        return decodeMs, extractMs, hands_
+
+    def letter(landmarks):
+        prediction = predictLetters(letter_features(landmarks).reshape(1, 42, 1).astype(np.float32))
+        return labelEncoder.inverse_transform([int(np.argmax(prediction))])[0]
+
+    results = {}
+    # Two rounds; the first warms up MediaPipe and the decoder for every mode.
+    for _ in range(2):
+        for mode, decode in modes.items():
+            results[mode] = {name: run(decode, frames) for name, frames in sequences.items()}
+
+    baseline = results['full decode']
+    print(f"{'mode':<16} {'decode ms':>9} {'mediapipe ms':>12} {'hands':>6} {'same letter':>11}")
+    for mode, perSequence in results.items():
+        decodeMs = [ms for sequence in perSequence.values() for ms in sequence[0]]
+        extractMs = [ms for sequence in perSequence.values() for ms in sequence[1]]
+        found = same = compared = 0
+        for name, (_, _, handsFound) in perSequence.items():
+            for landmarks, reference in zip(handsFound, baseline[name][2]):
+                found += landmarks is not None
+                if landmarks is not None and reference is not None:
+                    compared += 1
+                    same += letter(landmarks) == letter(reference)
+        print(f"{mode:<16} {statistics.mean(decodeMs):>9.2f} {statistics.mean(extractMs):>12.2f} {found:>6} "
+              f"{same:>5}/{compared:<5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Per-request cost of forwarding frames to the hosted models: runs a local stand-in
+# for the /detect-letters endpoint and posts the same 20 frames with a fresh client
+# per request (the old sendToHF), with the pooled ForwardingClient, and as a retry
+# answered from the response cache. The stand-in serves HTTPS with a throwaway
+# self-signed certificate when openssl is available (FORWARD_BENCH_TLS=0 for plain
+# HTTP); it runs on loopback, so network round trips come on top of these figures.
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+
+requestCount = int(os.getenv('FORWARD_BENCH_REQUESTS', 100))
+warmUpRequests = 10
+frameCount = int(os.getenv('FORWARD_BENCH_FRAMES', 20))
+frameBytes = int(os.getenv('FORWARD_BENCH_FRAME_BYTES', 30 * 1024))
+useTls = os.getenv('FORWARD_BENCH_TLS', '1') != '0' and shutil.which('openssl') is not None
+
+def selfSignedCertificate(directory):
+    keyFile, certFile = os.path.join(directory, 'key.pem'), os.path.join(directory, 'cert.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', keyFile, '-out', certFile],
+                   check=True, capture_output=True)
+    # httpx trusts SSL_CERT_FILE, so both clients verify the stand-in like a real host.
+    os.environ['SSL_CERT_FILE'] = certFile
+    return keyFile, certFile
+
+def runStandIn(port, keyFile=None, certFile=None):
+    import uvicorn
+    from fastapi import FastAPI, Request
+
+    standIn = FastAPI()
+
+    # Only drains the upload: parsing it would time the stand-in, not the forwarding.
+    @standIn.post("/detect-letters")
+    async def detectLetters(request: Request):
+        received = len(await request.body())
+        return {"letter": "A", "confidence": 1.0, "bytes": received}
+
+    uvicorn.run(standIn, host='127.0.0.1', port=port, log_level='warning', ssl_keyfile=keyFile, ssl_certfile=certFile)
+
+def startStandIn(tlsFiles=None):
+    # A separate process, so the stand-in does not compete with the clients for the GIL.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--stand-in', str(port), *(tlsFiles or ())])
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("Stand-in server failed to start")
+            time.sleep(0.1)
+    return process, f"{'https' if tlsFiles else 'http'}://127.0.0.1:{port}"
+
+def makeFrames(seed):
+    from starlette.datastructures import Headers, UploadFile
+
+    frames = []
+    for i in range(frameCount):
+        file = tempfile.SpooledTemporaryFile()
+        file.write(bytes([seed % 256, i % 256]) + os.urandom(frameBytes - 2))
+        file.seek(0)
+        frames.append(UploadFile(file, filename=f"frame{i}.jpg", headers=Headers({'content-type': 'image/jpeg'})))
+    return frames
+
+async def freshClientPost(url, frames):
+    import httpx
+
+    files = []
+    for frame in frames:
+        await frame.seek(0)
+        files.append(('frames', (frame.filename, await frame.read(), frame.content_type)))
+    async with httpx.AsyncClient(timeout=300) as client:
+        response = await client.post(url, files=files)
+        response.raise_for_status()
+        return response.json()
+
+async def timedMs(request):
+    started = time.perf_counter()
+    await request
+    return (time.perf_counter() - started) * 1000
+
+async def main():
+    from utils.forwardingClient import ForwardingClient
+
+    certificateDir = tempfile.TemporaryDirectory()
+    server, baseUrl = startStandIn(selfSignedCertificate(certificateDir.name) if useTls else None)
+    distinctFrames = [makeFrames(seed) for seed in range(warmUpRequests + requestCount)]
+    print(f"{requestCount} requests of {frameCount} x {frameBytes // 1024} KiB frames to a loopback stand-in at {baseUrl}\n")
+
+    pooled = ForwardingClient(baseUrl=baseUrl, cacheSize=0)
+    cached = ForwardingClient(baseUrl=baseUrl)
+    await pooled.start()
+    await cached.start()
+    await cached.postFrames('/detect-letters', distinctFrames[0])
+
+    modes = {
+        'fresh client per request': lambda frames: freshClientPost(f"{baseUrl}/detect-letters", frames),
+        'pooled client': lambda frames: pooled.postFrames('/detect-letters', frames),
+        'pooled client, cached retry': lambda frames: cached.postFrames('/detect-letters', distinctFrames[0]),
+    }
+    results = {}
+    # Each mode runs on its own, so the teardown of one mode's connections is not
+    # billed to another. The first round and the first requests of every block only
+    # warm up both ends.
+    for _ in range(2):
+        for mode, post in modes.items():
+            latencies = [await timedMs(post(frames)) for frames in distinctFrames]
+            results[mode] = latencies[warmUpRequests:]
+    await pooled.close()
+    await cached.close()
+    server.terminate()
+    server.wait()
+    certificateDir.cleanup()
+
+    baseline = statistics.mean(results['fresh client per request'])
+    print(f"{'mode':<30} {'mean ms':>8} {'p50 ms':>8} {'saved ms':>9}")
+    for mode, latencies in results.items():
+        mean = statistics.mean(latencies)
+        print(f"{mode:<30} {mean:>8.2f} {statistics.median(latencies):>8.2f} {baseline - mean:>9.2f}")
+    print(f"\nHTTP/2: {'on' if pooled.http2 else 'off (h2 not installed)'}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--stand-in']:
+        runStandIn(int(sys.argv[2]), *sys.argv[3:5])
+    else:
+        asyncio.run(main())
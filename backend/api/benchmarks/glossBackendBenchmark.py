@@ -0,0 +1,107 @@
+import gc
+import math
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+# Gloss translation backends on CPU: translates every gloss in the test set one at a
+# time with the fp32 torch model and each candidate backend, and reports latency per
+# sentence plus exact-match rate and corpus BLEU of each candidate against the fp32
+# output. Exits non-zero when a candidate's BLEU falls below GLOSS_BENCH_MIN_BLEU.
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+
+testSetPath = os.getenv('GLOSS_BENCH_SET', os.path.join(apiDir, 'benchmarks', 'glossTestSet.txt'))
+candidateBackends = [b.strip() for b in os.getenv('GLOSS_BENCH_BACKENDS', 'int8,onnx').split(',') if b.strip()]
+repeats = int(os.getenv('GLOSS_BENCH_REPEATS', 3))
+minBleu = float(os.getenv('GLOSS_BENCH_MIN_BLEU', 90))
+
+def ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+def corpusBleu(hypotheses, references, maxN=4):
+    matches = [0] * maxN
+    totals = [0] * maxN
+    hypLength = refLength = 0
+    for hypothesis, reference in zip(hypotheses, references):
+        hyp, ref = hypothesis.split(), reference.split()
+        hypLength += len(hyp)
+        refLength += len(ref)
+        for n in range(1, maxN + 1):
+            matches[n - 1] += sum((ngrams(hyp, n) & ngrams(ref, n)).values())
+            totals[n - 1] += max(len(hyp) - n + 1, 0)
+
+    if hypLength == 0 or matches[0] == 0:
+        return 100.0 if hypLength == refLength == 0 else 0.0
+    # Add-one smoothing above unigrams, so short sentences without 4-gram matches do
+    # not zero the whole score.
+    logPrecision = sum(math.log((matches[n] + (n > 0)) / (totals[n] + (n > 0))) for n in range(maxN)) / maxN
+    brevity = min(1.0, math.exp(1 - refLength / hypLength))
+    return 100 * brevity * math.exp(logPrecision)
+
+def timeBackend(glossModel, glosses):
+    from controllers.glossController import runTranslation
+
+    runTranslation(glossModel, glosses[:1])
+    outputs = []
+    latencies = []
+    for gloss in glosses:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            output = runTranslation(glossModel, [gloss])[0]
+            latencies.append((time.perf_counter() - started) * 1000)
+        outputs.append(output)
+    return outputs, latencies
+
+def main():
+    import torch
+
+    from controllers.glossController import MODEL_ID, glossThreads, loadGlossModel
+
+    with open(testSetPath) as f:
+        glosses = [line.strip() for line in f if line.strip()]
+
+    if glossThreads > 0:
+        torch.set_num_threads(glossThreads)
+    print(f"{MODEL_ID}: {len(glosses)} glosses x {repeats}, {torch.get_num_threads()} torch threads\n")
+
+    results = {}
+    for backend in ['torch'] + candidateBackends:
+        try:
+            glossModel = loadGlossModel(backend)
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}")
+            continue
+        results[backend] = timeBackend(glossModel, glosses)
+        del glossModel
+        gc.collect()
+
+    reference, referenceLatencies = results['torch']
+    referenceMean = statistics.mean(referenceLatencies)
+    print(f"\n{'backend':<8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'exact %':>8} {'BLEU':>7}")
+    failed = []
+    for backend, (outputs, latencies) in results.items():
+        mean = statistics.mean(latencies)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        exact = 100 * sum(o == r for o, r in zip(outputs, reference)) / len(reference)
+        bleu = corpusBleu(outputs, reference)
+        print(f"{backend:<8} {mean:>8.1f} {statistics.median(latencies):>8.1f} {p95:>8.1f} "
+              f"{referenceMean / mean:>7.2f}x {exact:>8.1f} {bleu:>7.1f}")
+        if bleu < minBleu:
+            failed.append(backend)
+
+    for backend, (outputs, _) in results.items():
+        differing = [(g, r, o) for g, r, o in zip(glosses, reference, outputs) if o != r]
+        for gloss, ref, out in differing[:5]:
+            print(f"\n[{backend}] {gloss}\n  fp32: {ref}\n  {backend}: {out}")
+
+    if failed:
+        print(f"\nBLEU against fp32 below {minBleu:.0f} for: {', '.join(failed)}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
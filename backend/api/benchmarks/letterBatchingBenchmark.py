@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# Letters per second against the number of concurrent sessions. Every simulated
+# session sends client-extracted hand landmarks (so MediaPipe is out of the way)
+# and runs the server's two-frame letters/numbers classification in a loop, the
+# way /ws_translate does. Modes: the micro-batcher awaited on the event loop, the
+# micro-batcher waited on from an inference executor thread, and no batching.
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+sessionCounts = [int(n) for n in os.getenv('LETTER_BENCH_SESSIONS', '1,2,4,8,16,32,64').split(',')]
+secondsPerRun = float(os.getenv('LETTER_BENCH_SECONDS', 3))
+
+
+async def runSessions(detectLetters, frames, sessions):
+    stopAt = time.perf_counter() + secondsPerRun
+    letters = 0
+
+    async def session(sessionId):
+        nonlocal letters
+        while time.perf_counter() < stopAt:
+            await detectLetters(frames, isDynamic=False, sessionId=sessionId, model='num')
+            letters += 1
+
+    await asyncio.gather(*(session(f"bench{i}") for i in range(sessions)))
+    return letters / secondsPerRun
+
+
+async def main():
+    from controllers import lettersControllerS as letters
+    from landmarks.payload import LandmarkFrame, SCHEMA_HAND, PRESENT_HAND
+    from utils.inferenceExecutor import inferenceExecutor
+    from utils.microBatcher import MicroBatcher
+    from utils.modelRegistry import modelRegistry
+
+    modelRegistry.startLoading()
+    await modelRegistry.waitFor('lettersClassifier')
+    rng = np.random.default_rng(0)
+    frames = [LandmarkFrame(SCHEMA_HAND, PRESENT_HAND, i, rng.random((21, 3), dtype=np.float32)) for i in range(2)]
+
+    awaited = MicroBatcher.predict
+
+    async def executorWait(self, item):
+        # The previous behaviour: an executor thread blocks until the batch flushes.
+        future = self.submit(item)
+        return await asyncio.get_running_loop().run_in_executor(inferenceExecutor.pool, future.result)
+
+    batcher = letters.lettersNumbersBatcher
+    maxBatchSize = batcher.maxBatchSize
+    modes = {
+        'batched, awaited': (awaited, maxBatchSize),
+        'batched, executor wait': (executorWait, maxBatchSize),
+        'unbatched': (awaited, 1),
+    }
+    await runSessions(letters.detectFromImageBytes, frames, 1)
+
+    print(f"letters/s over {secondsPerRun:.0f}s per run, INFERENCE_WORKERS={inferenceExecutor.maxWorkers}, "
+          f"BATCH_MAX_SIZE={maxBatchSize}, BATCH_MAX_DELAY_MS={batcher.maxDelay * 1000:g}\n")
+    print(f"{'sessions':>8} " + ' '.join(f"{name:>24}" for name in modes))
+    for sessions in sessionCounts:
+        rates = []
+        for predict, size in modes.values():
+            MicroBatcher.predict = predict
+            batcher.maxBatchSize = size
+            rates.append(await runSessions(letters.detectFromImageBytes, frames, sessions))
+        print(f"{sessions:>8} " + ' '.join(f"{rate:>24.0f}" for rate in rates))
+    MicroBatcher.predict = awaited
+    batcher.maxBatchSize = maxBatchSize
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
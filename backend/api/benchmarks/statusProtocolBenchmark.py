@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+# Server-side cost of the replies /ws_translate sends per frame: a stand-in server
+# replays the message pattern of a letters session and of a streaming glosses
+# session, with the old per-message send_json replies ('legacy'), the JSON protocol
+# and the compact binary protocol. It reports messages and bytes sent per frame and
+# the server's CPU time per frame. Frames are tiny, so receiving them costs little
+# next to the replies; a real deployment adds network writes on top.
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+
+frameCount = int(os.getenv('PROTOCOL_BENCH_FRAMES', 3000))
+modes = ('legacy', 'json', 'compact')
+models = ('alpha', 'glosses')
+letterResult = {'letter': 'B', 'confidenceLetter': 0.9956415891647339, 'number': '', 'confidenceNumber': 0.0}
+wordResult = {'word': 'hello', 'confidence': 0.9312345027923584}
+
+def replyScript(model, frameIdx):
+    # The replies websocketEndpoint sends for one frame.
+    if model == 'glosses':
+        # Streaming words: a word every 15 frames, 'collecting' otherwise.
+        return [('result', wordResult)] if frameIdx % 15 == 14 else [('status', 'collecting')]
+    # Letters: collecting/processing/ready, processing/result/ready, then a cooldown of 6 frames.
+    position = frameIdx % 8
+    if position == 0:
+        return [('status', 'collecting'), ('status', 'processing'), ('status', 'ready')]
+    if position == 1:
+        return [('status', 'processing'), ('result', letterResult), ('status', 'ready')]
+    return []
+
+def runStandIn(port):
+    import uvicorn
+    from fastapi import FastAPI, WebSocket
+    from utils.wsProtocol import SessionChannel
+
+    standIn = FastAPI()
+
+    @standIn.websocket("/replay")
+    async def replay(websocket: WebSocket):
+        await websocket.accept()
+        start = json.loads(await websocket.receive_text())
+        channel = SessionChannel(websocket)
+        channel.negotiate('json' if start['protocol'] == 'legacy' else start['protocol'])
+        if start['protocol'] == 'legacy':
+            send = {'status': lambda status: websocket.send_json({'status': status}), 'result': websocket.send_json}
+        else:
+            send = {'status': channel.status, 'result': channel.result}
+
+        cpuStarted = time.process_time()
+        for frameIdx in range(start['frames']):
+            await websocket.receive_bytes()
+            for kind, payload in replyScript(start['model'], frameIdx):
+                await send[kind](payload)
+        await websocket.send_text(json.dumps({'cpuSeconds': time.process_time() - cpuStarted}))
+
+    uvicorn.run(standIn, host='127.0.0.1', port=port, log_level='warning')
+
+def startStandIn():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--stand-in', str(port)])
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("Stand-in server failed to start")
+            time.sleep(0.1)
+    return process, f"ws://127.0.0.1:{port}/replay"
+
+async def runSession(url, mode, model):
+    import websockets
+
+    messages = sentBytes = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({'protocol': mode, 'model': model, 'frames': frameCount}))
+        for frameIdx in range(frameCount):
+            await ws.send(frameIdx.to_bytes(16, 'little'))
+        while True:
+            message = await ws.recv()
+            if isinstance(message, str) and message.startswith('{"cpuSeconds"'):
+                return messages, sentBytes, json.loads(message)['cpuSeconds']
+            messages += 1
+            sentBytes += len(message.encode() if isinstance(message, str) else message)
+
+async def main():
+    from utils.wsProtocol import orjson
+
+    server, url = startStandIn()
+    results = {}
+    # The first round only warms up both ends.
+    for _ in range(2):
+        for model in models:
+            for mode in modes:
+                results[model, mode] = await runSession(url, mode, model)
+    server.terminate()
+    server.wait()
+
+    print(f"{frameCount} frames per session, serializer: {'orjson' if orjson is not None else 'json'}\n")
+    print(f"{'session':<10} {'protocol':<9} {'msgs/frame':>10} {'bytes/frame':>11} {'server CPU us/frame':>20}")
+    for (model, mode), (messages, sentBytes, cpuSeconds) in results.items():
+        print(f"{model:<10} {mode:<9} {messages / frameCount:>10.2f} {sentBytes / frameCount:>11.1f} "
+              f"{cpuSeconds / frameCount * 1e6:>20.1f}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--stand-in']:
+        runStandIn(int(sys.argv[2]))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,110 @@
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Per-frame MediaPipe time of the shared static-image graphs against a session's
+# tracking graph (utils/trackingGraphs.py), on the signing videos of the web client.
+# Every video frame is JPEG-encoded and goes through the server's decode and
+# extraction code, once per graph, in order. Landmark agreement is measured against
+# the static graphs: how many frames each one finds a hand (or pose, hands and face)
+# in, the mean distance between the landmarks where both find them, and, for hands,
+# how often the letters model gives the same answer from both (a letter at 0.6
+# confidence or more, as sessions use it, or none).
+
+apiDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(apiDir)
+sys.path.insert(0, apiDir)
+
+videoDir = os.getenv('TRACKING_BENCH_VIDEOS', '../../frontend/src/videos')
+
+
+def readFrames(cv2, path):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, image = capture.read()
+        if not ok:
+            return frames
+        frames.append(cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+
+
+def main():
+    import cv2
+    from utils.frameDecode import decodeFrame
+    from utils.mediapipePool import createHandsGraph, createHolisticGraph, detectHand, warmUpGraph
+    from controllers.lettersControllerS import loadLettersClassifier, labelEncoder
+    from landmarks.conversion import holistic_to_array, letter_features
+    from landmarks.payload import PRESENT_POSE, PRESENT_LEFT_HAND, PRESENT_RIGHT_HAND, PRESENT_FACE, holistic_presence
+
+    predictLetters = loadLettersClassifier()[0]
+    videos = {os.path.splitext(name)[0]: readFrames(cv2, os.path.join(videoDir, name))
+              for name in sorted(os.listdir(videoDir)) if name.endswith('.mp4')}
+    print(f"{len(videos)} videos, {sum(map(len, videos.values()))} frames: "
+          + ', '.join(f"{name} ({len(frames)})" for name, frames in videos.items()) + "\n")
+
+    def extractHands(graph, image):
+        return detectHand(graph, image)
+
+    def extractHolistic(graph, image):
+        return holistic_to_array(graph.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+
+    kinds = {'hands': (createHandsGraph, extractHands), 'holistic': (createHolisticGraph, extractHolistic)}
+
+    def run(factory, extract, staticImageMode, frames):
+        # A fresh graph per video, as a new session would get.
+        graph = warmUpGraph(factory(staticImageMode=staticImageMode))
+        extractMs, landmarks = [], []
+        for frame in frames:
+            image = decodeFrame(frame)
+            started = time.perf_counter()
+            landmarks.append(extract(graph, image))
+            extractMs.append((time.perf_counter() - started) * 1000)
+        graph.close()
+        return extractMs, landmarks
+
+    def letter(hand):
+        prediction = predictLetters(letter_features(hand).reshape(1, 42, 1).astype(np.float32))
+        if np.max(prediction) < 0.6:
+            return ''
+        return labelEncoder.inverse_transform([int(np.argmax(prediction))])[0]
+
+    results = {}
+    # Two rounds; the first warms up MediaPipe for every graph.
+    for _ in range(2):
+        for kind, (factory, extract) in kinds.items():
+            for mode, staticImageMode in (('static', True), ('tracking', False)):
+                results[kind, mode] = {name: run(factory, extract, staticImageMode, frames)
+                                       for name, frames in videos.items()}
+
+    parts = (PRESENT_POSE, PRESENT_LEFT_HAND, PRESENT_RIGHT_HAND, PRESENT_FACE)
+    print(f"{'graph':<20} {'mediapipe ms':>12} {'found':>7} {'distance':>9} {'same letter':>11}")
+    for (kind, mode), perVideo in results.items():
+        extractMs = [ms for extractMs, _ in perVideo.values() for ms in extractMs]
+        found, distances, same, compared = 0, [], 0, 0
+        for name, (_, landmarks) in perVideo.items():
+            for current, reference in zip(landmarks, results[kind, 'static'][name][1]):
+                if kind == 'hands':
+                    found += current is not None
+                    if current is not None and reference is not None:
+                        distances.append(np.abs(current[:, :2] - reference[:, :2]).mean())
+                        compared += 1
+                        same += letter(current) == letter(reference)
+                    continue
+                # Holistic: found counts body parts; distances cover parts both graphs found.
+                presence = holistic_presence(current)
+                found += sum(bool(presence & bit) for bit in parts)
+                bothFound = (current != 0) & (reference != 0)
+                if bothFound.any():
+                    distances.append(np.abs(current - reference)[bothFound].mean())
+        sameLetter = f"{same}/{compared}" if kind == 'hands' else '-'
+        print(f"{kind + ' ' + mode:<20} {statistics.mean(extractMs):>12.2f} {found:>7} "
+              f"{statistics.mean(distances):>9.4f} {sameLetter:>11}")
+    print("\nfound: frames with a hand (hands), or body parts found over all frames (holistic: pose, hands, face)")
+    print("distance: mean landmark difference from the static graph where both found them (hands: x, y only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,185 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch 
+import asyncio
+import functools
+import os
+import threading
+from collections import OrderedDict
 
-MODEL_ID = "rrrr66254/Glossa-BART"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, trust_remote_code=True)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_ID, trust_remote_code=True)
-model.eval()
-if torch.cuda.is_available():
-    model = model.to("cuda").half()  
+from utils.microBatcher import MicroBatcher
+from utils.modelRegistry import modelRegistry
+from utils.metrics import glossGenerateSeconds
 
-def translateGloss(gloss: str) -> str:
-    inputs = tokenizer(gloss, return_tensors="pt", padding=True, truncation=True)
-    if torch.cuda.is_available():
-        inputs = {k: v.to("cuda") for k,v in inputs.items()}
-    with torch.no_grad():
+MODEL_ID = os.getenv('GLOSS_MODEL_ID', "rrrr66254/Glossa-BART")
+cacheSize = int(os.getenv('GLOSS_CACHE_SIZE', 1024))
+# torch (fp32, fp16 on CUDA), int8 (dynamically quantized Linear layers, CPU) or
+# onnx (ONNX Runtime, needs optimum[onnxruntime]).
+glossBackend = os.getenv('GLOSS_BACKEND', 'torch').lower()
+glossThreads = int(os.getenv('GLOSS_THREADS', 0))
+
+# torch and transformers take seconds to import, so they are only imported by the
+# background loader, never on the request path.
+def loadGlossModel(backend=None):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    backend = backend or glossBackend
+    if glossThreads > 0:
+        torch.set_num_threads(glossThreads)
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, trust_remote_code=True)
+    if backend == 'onnx':
+        return tokenizer, loadOnnxModel()
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_ID, trust_remote_code=True)
+    model.eval()
+    if backend == 'int8':
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend != 'torch':
+        raise ValueError(f"Unknown GLOSS_BACKEND '{backend}', expected torch, int8 or onnx")
+    elif torch.cuda.is_available():
+        model = model.to("cuda").half()
+    return tokenizer, model
+
+def loadOnnxModel():
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("GLOSS_BACKEND=onnx needs optimum[onnxruntime] (pip install 'optimum[onnxruntime]')") from e
+
+    options = onnxruntime.SessionOptions()
+    if glossThreads > 0:
+        options.intra_op_num_threads = glossThreads
+    # export=True converts the PyTorch checkpoint to ONNX graphs when it ships none.
+    return ORTModelForSeq2SeqLM.from_pretrained(MODEL_ID, export=True, session_options=options)
+
+def modelInputs(glossModel, glosses):
+    tokenizer, model = glossModel
+    return tokenizer(glosses, return_tensors="pt", padding=True, truncation=True).to(model.device)
+
+def runTranslation(glossModel, glosses):
+    import torch
+
+    tokenizer, model = glossModel
+    inputs = modelInputs(glossModel, glosses)
+    with torch.no_grad(), glossGenerateSeconds.time(mode='batch'):
         outputs = model.generate(**inputs, max_new_tokens=50, num_beams=1, do_sample=False)
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
\ No newline at end of file
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+# Optional for /ready: the model may have to be downloaded, and only gloss translation needs it.
+modelRegistry.register('glossTranslator', loadGlossModel, lambda glossModel: runTranslation(glossModel, ["HELLO"]),
+                       required=False)
+
+# Concurrent /sentence requests are translated by one generate call per batch.
+glossBatcher = MicroBatcher(lambda glosses: runTranslation(modelRegistry.get('glossTranslator'), glosses),
+                            maxBatchSize=int(os.getenv('GLOSS_BATCH_MAX_SIZE', 16)),
+                            maxDelayMs=float(os.getenv('GLOSS_BATCH_MAX_DELAY_MS', 10)),
+                            name='glossBatcher', collate=list, split=lambda outputs, i: outputs[i])
+
+class TranslationCache:
+    # Bounded LRU of gloss -> sentence. Requests for a gloss that is already being
+    # translated share its future instead of queueing a second generation.
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.inFlight = {}
+        # Reentrant: a translation that finishes before add_done_callback runs its
+        # callback on the thread that still holds the lock.
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, gloss):
+        with self.lock:
+            if gloss not in self.entries:
+                return None
+            self.entries.move_to_end(gloss)
+            self.hits += 1
+            return self.entries[gloss]
+
+    def put(self, gloss, sentence):
+        with self.lock:
+            if self.maxSize <= 0:
+                return
+            self.entries[gloss] = sentence
+            self.entries.move_to_end(gloss)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    def lookup(self, gloss):
+        with self.lock:
+            cached = self.get(gloss)
+            if cached is not None:
+                return cached, None
+            self.misses += 1
+            future = self.inFlight.get(gloss)
+            if future is None:
+                future = glossBatcher.submit(gloss)
+                self.inFlight[gloss] = future
+                future.add_done_callback(lambda done: self._store(gloss, done))
+            return None, future
+
+    def _store(self, gloss, future):
+        with self.lock:
+            self.inFlight.pop(gloss, None)
+            if future.exception() is None:
+                self.put(gloss, future.result())
+
+translationCache = TranslationCache(cacheSize)
+
+def normalizeGloss(gloss):
+    return ' '.join(gloss.split())
+
+async def translateGlossAsync(gloss: str) -> str:
+    cached, future = translationCache.lookup(normalizeGloss(gloss))
+    if future is None:
+        return cached
+    return await asyncio.wrap_future(future)
+
+def translateGloss(gloss: str) -> str:
+    cached, future = translationCache.lookup(normalizeGloss(gloss))
+    return cached if future is None else future.result()
+
+def generateInto(glossModel, gloss, streamer):
+    import torch
+
+    model = glossModel[1]
+    inputs = modelInputs(glossModel, [gloss])
+    try:
+        with torch.no_grad(), glossGenerateSeconds.time(mode='stream'):
+            model.generate(**inputs, max_new_tokens=50, num_beams=1, do_sample=False, streamer=streamer)
+    except Exception:
+        # Unblocks the reader; the error is re-raised when the generation is awaited.
+        streamer.end()
+        raise
+
+async def streamGlossTranslation(gloss: str):
+    # Yields the sentence piece by piece as the decoder produces tokens. Cached
+    # translations are yielded whole straight away.
+    gloss = normalizeGloss(gloss)
+    cached = translationCache.get(gloss)
+    if cached is not None:
+        yield cached
+        return
+
+    glossModel = await modelRegistry.waitFor('glossTranslator')
+    # Only after the model is loaded: the loader thread has imported transformers by
+    # then, so this import is a lookup rather than seconds on the event loop.
+    from transformers import TextIteratorStreamer
+
+    streamer = TextIteratorStreamer(glossModel[0], skip_prompt=True, skip_special_tokens=True)
+    loop = asyncio.get_running_loop()
+    generation = loop.run_in_executor(None, functools.partial(generateInto, glossModel, gloss, streamer))
+
+    pieces = []
+    try:
+        while True:
+            # The streamer blocks until the next token is decoded, so it is read off the loop.
+            piece = await loop.run_in_executor(None, next, streamer, None)
+            if piece is None:
+                break
+            if piece:
+                pieces.append(piece)
+                yield piece
+    finally:
+        await generation
+    translationCache.put(gloss, ''.join(pieces).strip())
@@ -1,136 +1,223 @@
-import cv2
+import asyncio
+import os
 import numpy as np
 import pickle
 import tensorflow as tf
-import mediapipe as mp
 from fastapi import WebSocket
+# First, so ai_model/ is on sys.path before anything imports the landmarks package.
+from utils.aiModelPath import AI_MODEL_DIR
+from utils.inferenceExecutor import inferenceExecutor
+from utils.microBatcher import MicroBatcher
+from utils.modelRegistry import modelRegistry
+from utils.metrics import jpegDecodeSeconds, landmarkExtractionSeconds, normalizationSeconds, modelPredictSeconds
+from utils.mediapipePool import MediaPipePool, createHandsGraph, detectHand
+from utils.processWorkers import extractionWorkers
+from utils.frameDecode import decodeFrame
+from utils.eventLog import EventLog
+from landmarks.conversion import letter_features, sequence_features, LEFT_HAND_SLICE, RIGHT_HAND_SLICE
+from landmarks.payload import LandmarkFrame, SCHEMA_HAND, PRESENT_HAND, PRESENT_LEFT_HAND, PRESENT_RIGHT_HAND
+from landmarks.interpolation import interpolate_missing_frames
 
-lettersModel = tf.keras.models.load_model('../../ai_model/models/detectLettersModel.keras')
-with open('../../ai_model/models/labelEncoder.pickle', 'rb') as f:
+modelsDir = os.path.join(AI_MODEL_DIR, 'models')
+jzModelDir = os.path.join(AI_MODEL_DIR, 'jz_model')
+fusedModelPath = os.path.join(modelsDir, 'detectFusedModel.keras')
+jzModelPath = os.path.join(jzModelDir, 'JZModel.keras')
+jzSequenceLength = 10
+log = EventLog('letters')
+
+# The fused model is saved with its own encoders, so its class order never has to
+# match the separate letters and numbers models.
+useFusedModel = os.path.exists(fusedModelPath)
+if useFusedModel:
+    labelEncoderPath = os.path.join(modelsDir, 'detectFusedLabelEncoder.pickle')
+    numLabelEncoderPath = os.path.join(modelsDir, 'detectFusedNumLabelEncoder.pickle')
+else:
+    labelEncoderPath = os.path.join(modelsDir, 'labelEncoder.pickle')
+    numLabelEncoderPath = os.path.join(modelsDir, 'numLabelEncoder.pickle')
+
+with open(labelEncoderPath, 'rb') as f:
     labelEncoder = pickle.load(f)
 
-lettersModel2 = tf.keras.models.load_model('../../ai_model/jz_model/JZModel.keras')
-with open('../../ai_model/jz_model/labelEncoder.pickle', 'rb') as f:
+with open(os.path.join(jzModelDir, 'labelEncoder.pickle'), 'rb') as f:
     labelEncoder2 = pickle.load(f)
 
-numbersModel = tf.keras.models.load_model('../../ai_model/models/detectNumbersModel.keras')
-with open('../../ai_model/models/numLabelEncoder.pickle', 'rb') as f:
+with open(numLabelEncoderPath, 'rb') as f:
     numLabelEncoder = pickle.load(f)
 
-hands = mp.solutions.hands.Hands(static_image_mode=True)
+def loadLettersClassifier():
+    # Returns (predict letters, predict letters and numbers).
+    if useFusedModel:
+        # One shared trunk, two heads: 'alpha' sessions only evaluate the letters head.
+        fusedModel = tf.keras.models.load_model(fusedModelPath)
+        lettersHeadModel = tf.keras.Model(fusedModel.input, fusedModel.get_layer('letters').output)
+        return lettersHeadModel.predict_on_batch, fusedModel.predict_on_batch
 
-async def detectFromImageBytes(sequenceBytesList, websocket: WebSocket = None, isDynamic=False):
-    numFrames = len(sequenceBytesList)
-    if numFrames == 0:
-        return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
+    lettersModel = tf.keras.models.load_model(os.path.join(modelsDir, 'detectLettersModel.keras'))
+    numbersModel = tf.keras.models.load_model(os.path.join(modelsDir, 'detectNumbersModel.keras'))
+    return (lettersModel.predict_on_batch,
+            lambda batch: [lettersModel.predict_on_batch(batch), numbersModel.predict_on_batch(batch)])
 
-    def processSingleFrame(imageBytes):
-        nparr = np.frombuffer(imageBytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if image is None:
-            return None, None, None, None
+def warmUpLettersClassifier(predictFns):
+    dummy = np.zeros((1, 42, 1), dtype=np.float32)
+    for predict in predictFns:
+        predict(dummy)
 
-        imgRGB = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = hands.process(imgRGB)
-        if not results.multi_hand_landmarks:
-            return None, None, None, None
+modelRegistry.register('lettersClassifier', loadLettersClassifier, warmUpLettersClassifier)
+modelRegistry.register('jzClassifier', lambda: tf.keras.models.load_model(jzModelPath),
+                       lambda jzModel: jzModel.predict(np.zeros((1, 10, 63), dtype=np.float32), verbose=0))
 
-        handLandmarks = results.multi_hand_landmarks[0]
-        xList, yList = [], []
-        dataAux = []
+def predictLetters(batch):
+    with modelPredictSeconds.time(model='letters'):
+        return modelRegistry.get('lettersClassifier')[0](batch)
 
-        for lm in handLandmarks.landmark:
-            xList.append(lm.x)
-            yList.append(lm.y)
+def predictLettersAndNumbers(batch):
+    with modelPredictSeconds.time(model='lettersNumbers'):
+        return modelRegistry.get('lettersClassifier')[1](batch)
 
-        for lm in handLandmarks.landmark:
-            dataAux.append(lm.x - min(xList))
-            dataAux.append(lm.y - min(yList))
+lettersBatcher = MicroBatcher(predictLetters, name='lettersBatcher')
+lettersNumbersBatcher = MicroBatcher(predictLettersAndNumbers, name='lettersNumbersBatcher')
 
-        inputData = np.array(dataAux, dtype=np.float32).reshape(1, 42, 1)
+# Extraction runs in the worker processes when they are enabled, so no graphs are needed here.
+handsPool = None if extractionWorkers.enabled else MediaPipePool(createHandsGraph, name='hands')
+if handsPool is not None:
+    modelRegistry.register('handsGraphs', handsPool.fill)
 
-        prediction1 = lettersModel.predict(inputData, verbose=0)
-        index1 = np.argmax(prediction1, axis=1)[0]
-        confidence1 = float(np.max(prediction1))
-        label1 = labelEncoder.inverse_transform([index1])[0] if confidence1 >= 0.6 else ''
+class LandmarkCache:
+    # A session's landmarks by frame index; frames go through the session's tracking
+    # graph (utils/trackingGraphs.py) when it has one.
+    def __init__(self, tracking=None):
+        self.entries = {}
+        self.tracking = tracking
 
-        prediction3 = numbersModel.predict(inputData, verbose=0)
-        index3 = np.argmax(prediction3, axis=1)[0]
-        confidence3 = float(np.max(prediction3))
-        label3 = numLabelEncoder.inverse_transform([index3])[0] if confidence3 >= 0.6 else ''
-
-        print(f'Letters Model 1: {label1 or "None"} at {confidence1}')
-        print(f'Numbers Model: {label3 or "None"} at {confidence3}')
-
-        return label1, confidence1, label3, confidence3
-
-    def processSequence(frames):
-        processedSequence = []
-        for imageBytes in frames:
-            nparr = np.frombuffer(imageBytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if image is None:
-                processedSequence.append(None)
-                continue
-
-            imgRGB = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = hands.process(imgRGB)
-            if not results.multi_hand_landmarks:
-                processedSequence.append(None)
-                continue
-
-            handLandmarks = results.multi_hand_landmarks[0]
-            xList, yList = [], []
-            dataAux2 = []
-
-            for lm in handLandmarks.landmark:
-                xList.append(lm.x)
-                yList.append(lm.y)
-
-            for lm in handLandmarks.landmark:
-                dataAux2.append(lm.x - min(xList))
-                dataAux2.append(lm.y - min(yList))
-                dataAux2.append(0)
-
-            processedSequence.append(dataAux2)
-
-        for i in range(len(processedSequence)):
-            if processedSequence[i] is None:
-                prevIdx, nextIdx = -1, -1
-                for j in range(i - 1, -1, -1):
-                    if processedSequence[j] is not None:
-                        prevIdx = j
-                        break
-                for j in range(i + 1, len(processedSequence)):
-                    if processedSequence[j] is not None:
-                        nextIdx = j
-                        break
-                if prevIdx != -1 and nextIdx != -1:
-                    prevData = np.array(processedSequence[prevIdx])
-                    nextData = np.array(processedSequence[nextIdx])
-                    t = (i - prevIdx) / (nextIdx - prevIdx)
-                    interpolatedData = prevData + (nextData - prevData) * t
-                    processedSequence[i] = interpolatedData.tolist()
-                elif prevIdx != -1:
-                    processedSequence[i] = processedSequence[prevIdx]
-                elif nextIdx != -1:
-                    processedSequence[i] = processedSequence[nextIdx]
-
-        if None in processedSequence:
-            print("Incomplete sequence after interpolation")
+    def get(self, frameIndex, frame):
+        if frameIndex not in self.entries:
+            self.entries[frameIndex] = extractHandLandmarks(frame, self.tracking)
+        return self.entries[frameIndex]
+
+    def discardBefore(self, frameIndex):
+        for cachedIndex in [i for i in self.entries if i < frameIndex]:
+            del self.entries[cachedIndex]
+
+    def clear(self):
+        self.entries.clear()
+
+def handFromLandmarkFrame(frame):
+    if frame.schema == SCHEMA_HAND:
+        return frame.landmarks if frame.presence & PRESENT_HAND else None
+    for flag, partSlice in ((PRESENT_RIGHT_HAND, RIGHT_HAND_SLICE), (PRESENT_LEFT_HAND, LEFT_HAND_SLICE)):
+        if frame.presence & flag:
+            return frame.landmarks[partSlice].reshape(-1, 3)
+    return None
+
+def extractHandLandmarks(frame, tracking=None):
+    # Frames are either JPEG bytes or landmarks the client already extracted.
+    if isinstance(frame, LandmarkFrame):
+        return handFromLandmarkFrame(frame)
+    if extractionWorkers.enabled:
+        graphKey = tracking.graphKey if tracking is not None else None
+        _, landmarks = extractionWorkers.submitFrame('hands', frame, graphKey).result()
+        return landmarks
+
+    with jpegDecodeSeconds.time(kind='hands'):
+        image = decodeFrame(frame)
+    if image is None:
+        return None
+    graphs = tracking if tracking is not None else handsPool
+    with graphs.checkout() as hands, landmarkExtractionSeconds.time(kind='hands'):
+        return detectHand(hands, image)
+
+async def extractHandLandmarksAsync(frame):
+    if extractionWorkers.enabled and not isinstance(frame, LandmarkFrame):
+        # submitFrame blocks while every slot of the workers is taken, so it is called off the loop.
+        future = await asyncio.to_thread(extractionWorkers.submitFrame, 'hands', frame)
+        _, landmarks = await asyncio.wrap_future(future)
+        return landmarks
+    return await inferenceExecutor.submit(None, extractHandLandmarks, frame)
+
+def classifyDynamicLetter(hands):
+    # J/Z model over a sequence of hands; frames without a hand are interpolated.
+    processedSequence = np.zeros((len(hands), 63), dtype=np.float32)
+    detected = np.zeros(len(hands), dtype=bool)
+    with normalizationSeconds.time(model='jz'):
+        for i, handLandmarks in enumerate(hands):
+            if handLandmarks is not None:
+                processedSequence[i] = sequence_features(handLandmarks)
+                detected[i] = True
+
+        if not detected.any():
+            log.sampled('noHandInSequence', frames=len(hands))
             return None, None
+        processedSequence = interpolate_missing_frames(processedSequence, detected)
 
-        inputData2 = np.array(processedSequence, dtype=np.float32).reshape(1, len(frames), 63)
-        prediction2 = lettersModel2.predict(inputData2, verbose=0)
-        index2 = np.argmax(prediction2, axis=1)[0]
-        confidence2 = float(np.max(prediction2))
-        label2 = labelEncoder2.inverse_transform([index2])[0] if confidence2 >= 0.6 else ''
-        print(f'Letters Model 2: {label2 or "None"} at {confidence2}')
+    inputData2 = processedSequence.reshape(1, len(hands), 63)
+    with modelPredictSeconds.time(model='jz'):
+        prediction2 = modelRegistry.get('jzClassifier').predict(inputData2, verbose=0)
+    index2 = np.argmax(prediction2, axis=1)[0]
+    confidence2 = float(np.max(prediction2))
+    label2 = labelEncoder2.inverse_transform([index2])[0] if confidence2 >= 0.6 else ''
+    log.sampled('jzPrediction', letter=label2, confidence=confidence2)
 
-        return label2, confidence2
+    return label2, confidence2
+
+async def detectFromUploadedFrames(frames):
+    # Local /processLetters: all frames are decoded and run through MediaPipe in
+    # parallel, then the classifiers run once over the whole batch.
+    hands = await asyncio.gather(*(extractHandLandmarksAsync(frame) for frame in frames))
+    return await inferenceExecutor.submit(None, classifyLetterBatch, hands)
+
+def classifyLetterBatch(hands):
+    detectedHands = [hand for hand in hands if hand is not None]
+    if not detectedHands:
+        return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
+
+    with normalizationSeconds.time(model='letters'):
+        batch = np.stack([letter_features(hand).reshape(42, 1) for hand in detectedHands])
+    lettersPrediction, numbersPrediction = predictLettersAndNumbers(batch)
+
+    # Per-frame probabilities are averaged over every frame with a hand.
+    results = {}
+    for key, prediction, encoder in (('Letter', lettersPrediction, labelEncoder),
+                                     ('Number', numbersPrediction, numLabelEncoder)):
+        meanPrediction = np.asarray(prediction).mean(axis=0)
+        index = int(np.argmax(meanPrediction))
+        confidence = float(meanPrediction[index])
+        results[key.lower()] = encoder.inverse_transform([index])[0] if confidence >= 0.6 else ''
+        results[f'confidence{key}'] = confidence
+
+    # J and Z are moving signs: I (J starts from it), J and Z go to the J/Z model,
+    # which sees jzSequenceLength frames spread over the capture.
+    if results['letter'] in ['I', 'J', 'Z'] and len(hands) >= jzSequenceLength:
+        positions = np.linspace(0, len(hands) - 1, jzSequenceLength).round().astype(int)
+        label2, confidence2 = classifyDynamicLetter([hands[position] for position in positions])
+        if label2 and (results['letter'] != 'I' or label2 == 'J'):
+            results['letter'], results['confidenceLetter'] = label2, confidence2
+
+    log.sampled('batchPrediction', frames=len(hands), framesWithHand=len(detectedHands), **results)
+    return results
+
+async def detectFromImageBytes(sequenceBytesList, websocket: WebSocket = None, isDynamic=False, sessionId=None, model=None,
+                               firstFrameIndex=0, landmarkCache=None):
+    numFrames = len(sequenceBytesList)
+    if numFrames == 0:
+        return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
+
+    if numFrames in [1, 2]:
+        framePositions, sequencePositions = list(range(numFrames)), []
+    elif numFrames >= 10 and isDynamic:
+        framePositions, sequencePositions = [0, numFrames - 1], list(range(10))
+    else:
+        return None
+
+    # Landmarks and the J/Z model run on the inference executor; the letters model
+    # calls are awaited here, so no executor thread waits for the micro-batcher and a
+    # batch can hold frames from every session.
+    features, dynamicResult = await inferenceExecutor.submit(sessionId, extractLetterFeatures, sequenceBytesList,
+                                                             framePositions, sequencePositions, firstFrameIndex,
+                                                             landmarkCache)
+    predictions = await asyncio.gather(*(classifyLetterFeatures(inputData, model) for inputData in features))
 
     if numFrames == 1:
-        label1, confidence1, label3, confidence3 = processSingleFrame(sequenceBytesList[0])
+        label1, confidence1, label3, confidence3 = predictions[0]
         if label1 is None:
             return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
         if label1 in ['J', 'Z']:
@@ -138,8 +225,8 @@ async def detectFromImageBytes(sequenceBytesList, websocket: WebSocket = None, i
         return {'status': 'waitMore'}
 
     elif numFrames == 2:
-        label1First, _, _, _ = processSingleFrame(sequenceBytesList[0])
-        label1Second, confidence1, label3, confidence3 = processSingleFrame(sequenceBytesList[1])
+        label1First, _, _, _ = predictions[0]
+        label1Second, confidence1, label3, confidence3 = predictions[1]
         if label1First is None or label1Second is None:
             return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
         if label1First == label1Second and label1First not in ['J', 'Z'] and confidence1 >= 0.6:
@@ -150,20 +237,69 @@ async def detectFromImageBytes(sequenceBytesList, websocket: WebSocket = None, i
         else:
             return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
 
-    elif numFrames >= 10 and isDynamic:
-        label1, confidence1, _, _ = processSingleFrame(sequenceBytesList[0]) 
-        label2, confidence2 = processSequence(sequenceBytesList[:10])
-        if label2 is None:
-            return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
-        _, _, label3, confidence3 = processSingleFrame(sequenceBytesList[-1])
-        if confidence2 >= 0.6:
-            if label1 == 'I':
-                if label2 == 'J':
-                    return {'letter': label2, 'confidenceLetter': confidence2,
-                            'number': label3, 'confidenceNumber': confidence3}
-                else:
-                    return {'letter': label1, 'confidenceLetter': confidence1,
-                            'number': label3, 'confidenceNumber': confidence3}
-            return {'letter': label1, 'confidenceLetter': confidence1,
-                    'number': label3, 'confidenceNumber': confidence3}
-        return {'letter': '', 'confidenceLetter': 0.0, 'number': label3, 'confidenceNumber': confidence3}
\ No newline at end of file
+    label1, confidence1, _, _ = predictions[0]
+    label2, confidence2 = dynamicResult
+    if label2 is None:
+        return {'letter': '', 'confidenceLetter': 0.0, 'number': '', 'confidenceNumber': 0.0}
+    _, _, label3, confidence3 = predictions[1]
+    if confidence2 >= 0.6:
+        if label1 == 'I':
+            if label2 == 'J':
+                return {'letter': label2, 'confidenceLetter': confidence2,
+                        'number': label3, 'confidenceNumber': confidence3}
+            else:
+                return {'letter': label1, 'confidenceLetter': confidence1,
+                        'number': label3, 'confidenceNumber': confidence3}
+        return {'letter': label1, 'confidenceLetter': confidence1,
+                'number': label3, 'confidenceNumber': confidence3}
+    return {'letter': '', 'confidenceLetter': 0.0, 'number': label3, 'confidenceNumber': confidence3}
+
+def extractLetterFeatures(sequenceBytesList, framePositions, sequencePositions, firstFrameIndex=0, landmarkCache=None):
+    # Returns the letters model input for each of framePositions (None without a
+    # hand) and the J/Z result over sequencePositions.
+    # Frames keep their session-wide index across calls, so a frame that was
+    # already run through MediaPipe in an earlier call is never extracted again.
+    if landmarkCache is None:
+        landmarkCache = LandmarkCache()
+    landmarkCache.discardBefore(firstFrameIndex)
+
+    # Extracted in frame order, as a tracking graph expects them.
+    hands = {position: landmarkCache.get(firstFrameIndex + position, sequenceBytesList[position])
+             for position in sorted({*framePositions, *sequencePositions})}
+
+    features = []
+    for position in framePositions:
+        if hands[position] is None:
+            features.append(None)
+            continue
+        with normalizationSeconds.time(model='letters'):
+            features.append(letter_features(hands[position]).reshape(42, 1))
+
+    dynamicResult = classifyDynamicLetter([hands[position] for position in sequencePositions]) if sequencePositions else None
+    return features, dynamicResult
+
+async def classifyLetterFeatures(inputData, model=None):
+    if inputData is None:
+        return None, None, None, None
+
+    if model == 'alpha':
+        prediction1, prediction3 = await lettersBatcher.predict(inputData), None
+    else:
+        prediction1, prediction3 = await lettersNumbersBatcher.predict(inputData)
+
+    # classes_ lookups rather than inverse_transform: this runs on the event loop.
+    index1 = int(np.argmax(prediction1))
+    confidence1 = float(np.max(prediction1))
+    label1 = labelEncoder.classes_[index1] if confidence1 >= 0.6 else ''
+
+    if prediction3 is None:
+        label3, confidence3 = '', 0.0
+    else:
+        index3 = int(np.argmax(prediction3))
+        confidence3 = float(np.max(prediction3))
+        label3 = numLabelEncoder.classes_[index3] if confidence3 >= 0.6 else ''
+
+    log.sampled('framePrediction', letter=label1, confidenceLetter=confidence1, number=label3,
+                confidenceNumber=confidence3)
+
+    return label1, confidence1, label3, confidence3
@@ -1,78 +1,64 @@
+import asyncio
 import cv2
 import numpy as np
 import pandas as pd
 from tensorflow.keras.models import load_model
-import mediapipe as mp
-
-modelPath = '../../ai_model/words/saved_models/best_sign_classifier_model_40_words_seq90.keras'
-csvPath = '../../ai_model/words/wlasl_40_words_personal_final_processed_data_augmented_seq90.csv'
+import logging
+import os
+from collections import deque
+# First, so ai_model/ is on sys.path before anything imports the landmarks package.
+from utils.aiModelPath import AI_MODEL_DIR
+from utils.inferenceExecutor import inferenceExecutor
+from utils.mediapipePool import MediaPipePool, createHolisticGraph
+from utils.modelRegistry import modelRegistry
+from utils.metrics import jpegDecodeSeconds, landmarkExtractionSeconds, normalizationSeconds, modelPredictSeconds
+from utils.processWorkers import extractionWorkers
+from utils.frameDecode import decodeFrame
+from utils.eventLog import EventLog
+from landmarks.conversion import holistic_to_array
+from landmarks.normalization import normalize_landmarks as normalizeLandmarks
+from landmarks.schema import get_schema
+from landmarks.payload import (LandmarkFrame, SCHEMA_HOLISTIC, PRESENT_POSE, PRESENT_LEFT_HAND, PRESENT_RIGHT_HAND,
+                              PRESENT_FACE, holistic_presence)
+
+wordsFeatureSchema = get_schema()
+wordsDir = os.path.join(AI_MODEL_DIR, 'words')
+# Models trained on another feature schema carry its name: ..._seq90_pose_hands.keras.
+modelPath = wordsFeatureSchema.path(os.path.join(wordsDir, 'saved_models',
+                                                 'best_sign_classifier_model_40_words_seq90.keras'))
+csvPath = os.path.join(wordsDir, 'wlasl_40_words_personal_final_processed_data_augmented_seq90.csv')
 sequenceLength = 30
-expectedCoordsPerFrame = 1662
+expectedCoordsPerFrame = wordsFeatureSchema.coords_per_frame
 confidenceThreshold = 0.7
+streamStride = int(os.getenv('WORDS_STREAM_STRIDE', 5))
+streamAgreement = int(os.getenv('WORDS_STREAM_AGREEMENT', 2))
+schemaParts = [flag for flag, _ in wordsFeatureSchema.presence_parts]
+landmarkParts = tuple((part, bit) for part, bit in (('pose', PRESENT_POSE), ('leftHand', PRESENT_LEFT_HAND),
+                                                    ('rightHand', PRESENT_RIGHT_HAND), ('face', PRESENT_FACE))
+                      if bit in schemaParts)
+log = EventLog('words')
 
-model = load_model(modelPath)
 df = pd.read_csv(csvPath)
 uniqueGlosses = df['gloss'].unique()
 idToGloss = {i: g for i, g in enumerate(uniqueGlosses)}
 
-mpHolistic = mp.solutions.holistic.Holistic(
-    static_image_mode=True,
-    model_complexity=1,
-    min_detection_confidence=0.2,
-    min_tracking_confidence=0.5
-)
-
-numPoseCoordsSingle = 33*4
-numHandCoordsSingle = 21*3
-numFaceCoordsSingle = 468*3
-
-def normalizeLandmarks(landmarksSequence):
-    if landmarksSequence.ndim == 1:
-        landmarksSequence = np.expand_dims(landmarksSequence, axis=0)
-
-    normalizedSequences = []
-    for frameLandmarks in landmarksSequence:
-        if np.all(frameLandmarks == 0):
-            normalizedSequences.append(np.zeros(expectedCoordsPerFrame, dtype=np.float32))
-            continue
-
-        poseCoordsFlat = frameLandmarks[0 : numPoseCoordsSingle]
-        leftHandCoordsFlat = frameLandmarks[numPoseCoordsSingle : numPoseCoordsSingle + numHandCoordsSingle]
-        rightHandCoordsFlat = frameLandmarks[numPoseCoordsSingle + numHandCoordsSingle : numPoseCoordsSingle + numHandCoordsSingle*2]
-        faceCoordsFlat = frameLandmarks[numPoseCoordsSingle + numHandCoordsSingle*2 : ]
-
-        allPartsData = [
-            (poseCoordsFlat, 4, [0.0]*numPoseCoordsSingle),
-            (leftHandCoordsFlat, 3, [0.0]*numHandCoordsSingle),
-            (rightHandCoordsFlat, 3, [0.0]*numHandCoordsSingle),
-            (faceCoordsFlat, 3, [0.0]*numFaceCoordsSingle)
-        ]
-
-        normalizedFrameParts = []
-        for flatLms, coordsPerLm, template in allPartsData:
-            if np.all(flatLms == 0):
-                normalizedFrameParts.append(np.array(template, dtype=np.float32))
-                continue
-
-            lmsArray = flatLms.reshape(-1, coordsPerLm)
-            coordsForMean = lmsArray[:, :3] if coordsPerLm == 4 else lmsArray
-            meanCoords = np.mean(coordsForMean, axis=0)
-            translatedLms = lmsArray.copy()
-            translatedLms[:, :3] -= meanCoords
-            scaleFactor = np.max(np.linalg.norm(translatedLms[:, :3], axis=1))
-            if scaleFactor > 1e-6:
-                translatedLms[:, :3] /= scaleFactor
-            normalizedFrameParts.append(translatedLms.flatten())
-
-        combinedFrame = np.concatenate(normalizedFrameParts).astype(np.float32)
-        if len(combinedFrame) < expectedCoordsPerFrame:
-            combinedFrame = np.pad(combinedFrame, (0, expectedCoordsPerFrame - len(combinedFrame)), 'constant')
-        elif len(combinedFrame) > expectedCoordsPerFrame:
-            combinedFrame = combinedFrame[:expectedCoordsPerFrame]
-
-        normalizedSequences.append(combinedFrame)
-
-    return np.array(normalizedSequences, dtype=np.float32)
+# Extraction runs in the worker processes when they are enabled, so no graphs are needed here.
+holisticPool = None if extractionWorkers.enabled else MediaPipePool(createHolisticGraph, name='holistic')
+if holisticPool is not None:
+    modelRegistry.register('holisticGraphs', holisticPool.fill, required=False)
+
+def loadWordsClassifier():
+    wordsModel = load_model(modelPath)
+    if wordsModel.input_shape[-1] != expectedCoordsPerFrame:
+        raise ValueError(f"{modelPath} expects {wordsModel.input_shape[-1]} values per frame, but the "
+                         f"{wordsFeatureSchema.name} feature schema has {expectedCoordsPerFrame}")
+    return wordsModel
+
+# Optional for /ready: without a words model for the configured schema, letters still serve.
+modelRegistry.register('wordsClassifier', loadWordsClassifier,
+                       lambda wordsModel: wordsModel.predict(np.zeros((1, sequenceLength, expectedCoordsPerFrame),
+                                                                      dtype=np.float32), verbose=0),
+                       required=False)
 
 def padOrTruncateSequence(sequence, targetLength, featureDimension):
     if sequence.shape[0] < targetLength:
@@ -80,67 +66,161 @@ def padOrTruncateSequence(sequence, targetLength, featureDimension):
         return np.vstack((sequence, padding))
     return sequence[:targetLength, :]
 
-def detectFromImageBytes(sequenceBytesList):
-    sequence = []
-
-    for idx, imageBytes in enumerate(sequenceBytesList):
-        nparr = np.frombuffer(imageBytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+async def detectFromImageBytes(sequenceBytesList, sessionId=None, tracking=None):
+    return await inferenceExecutor.submit(sessionId, processWordFrames, sequenceBytesList, tracking)
+
+def submitWordFrame(frame, tracking=None):
+    # With extraction worker processes every frame of a request is handed out at
+    # once, so they are extracted in parallel - or in order on the worker that holds
+    # the session's tracking graph.
+    if extractionWorkers.enabled and not isinstance(frame, LandmarkFrame):
+        return extractionWorkers.submitFrame('holistic', frame, graphKey=tracking.graphKey if tracking else None)
+    return None
+
+def extractWordLandmarks(frame, out, frameIdx=0, pending=None, tracking=None):
+    # Frames are either JPEG bytes or landmarks the client already extracted.
+    if isinstance(frame, LandmarkFrame):
+        if frame.schema != SCHEMA_HOLISTIC:
+            log.sampled('wrongSchema', logging.WARNING, frameIdx=frameIdx, schema=frame.schema)
+            return out
+        out[:] = wordsFeatureSchema.select(frame.landmarks)
+        return out
+
+    if extractionWorkers.enabled:
+        presence, landmarks = (pending or submitWordFrame(frame, tracking)).result()
+        if presence is None:
+            log.sampled('decodeFailed', logging.WARNING, frameIdx=frameIdx)
+            return out
+        # Nothing detected comes back as no landmarks; the row stays zero.
+        if landmarks is not None:
+            out[:] = landmarks
+    else:
+        with jpegDecodeSeconds.time(kind='holistic'):
+            img = decodeFrame(frame)
         if img is None:
-            print(f"Warning: Could not decode image bytes at index {idx}")
-            sequence.append(np.zeros(expectedCoordsPerFrame, dtype=np.float32))
-            continue
+            log.sampled('decodeFailed', logging.WARNING, frameIdx=frameIdx)
+            return out
 
         imgRgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        mpResults = mpHolistic.process(imgRgb)
-
-        frameLms = np.zeros(expectedCoordsPerFrame, dtype=np.float32)
-        currentIdx = 0
-
-        if mpResults.pose_landmarks:
-            poseFlat = [coord for lm in mpResults.pose_landmarks.landmark for coord in [lm.x, lm.y, lm.z, lm.visibility]]
-            frameLms[currentIdx:currentIdx + len(poseFlat)] = poseFlat
-        else:
-            print(f"Warning: No pose landmarks detected in frame {idx}")
-        currentIdx += numPoseCoordsSingle
-
-
-        if mpResults.left_hand_landmarks:
-            lhFlat = [coord for lm in mpResults.left_hand_landmarks.landmark for coord in [lm.x, lm.y, lm.z]]
-            frameLms[currentIdx:currentIdx + len(lhFlat)] = lhFlat
-        else:
-            print(f"Warning: No left hand landmarks detected in frame {idx}")
-        currentIdx += numHandCoordsSingle
-
-        if mpResults.right_hand_landmarks:
-            rhFlat = [coord for lm in mpResults.right_hand_landmarks.landmark for coord in [lm.x, lm.y, lm.z]]
-            frameLms[currentIdx:currentIdx + len(rhFlat)] = rhFlat
-        else:
-            print(f"Warning: No right hand landmarks detected in frame {idx}")
-        currentIdx += numHandCoordsSingle
-
-        if mpResults.face_landmarks:
-            faceFlat = [coord for lm in mpResults.face_landmarks.landmark for coord in [lm.x, lm.y, lm.z]]
-            frameLms[currentIdx:currentIdx + len(faceFlat)] = faceFlat
-        else:
-            print(f"Warning: No face landmarks detected in frame {idx}")
-
-        sequence.append(frameLms)
-
-    if not sequence:
-        return {"word": "", "confidence": 0.0}
-
-    sequence = normalizeLandmarks(np.array(sequence, dtype=np.float32))
-    sequence = padOrTruncateSequence(sequence, sequenceLength, expectedCoordsPerFrame)
+        graphs = tracking if tracking is not None else holisticPool
+        with graphs.checkout() as holistic, landmarkExtractionSeconds.time(kind='holistic'):
+            mpResults = holistic.process(imgRgb)
+        holistic_to_array(mpResults, out=out, face_landmarks=wordsFeatureSchema.face_landmarks)
+        presence = holistic_presence(out, wordsFeatureSchema.presence_parts)
+
+    missing = [part for part, bit in landmarkParts if not presence & bit]
+    if missing:
+        log.sampled('missingLandmarks', frameIdx=frameIdx, missing=missing)
+    return out
+
+def classifyWordSequence(normalizedSequence):
+    sequence = padOrTruncateSequence(normalizedSequence, sequenceLength, expectedCoordsPerFrame)
     sequence = np.expand_dims(sequence, axis=0)
 
-    preds = model.predict(sequence, verbose=0)
+    with modelPredictSeconds.time(model='words'):
+        preds = modelRegistry.get('wordsClassifier').predict(sequence, verbose=0)
     predictedId = int(np.argmax(preds))
     confidence = float(np.max(preds))
     predictedWord = idToGloss.get(predictedId, "Unknown")
 
-    result = {"word": predictedWord if confidence >= confidenceThreshold else "",
-              "confidence": confidence}
+    return {"word": predictedWord if confidence >= confidenceThreshold else "",
+            "confidence": confidence}
+
+def normalizeWordLandmarks(landmarks):
+    with normalizationSeconds.time(model='words'):
+        return normalizeLandmarks(landmarks, wordsFeatureSchema.frame_parts, expectedCoordsPerFrame)
+
+def processWordFrames(sequenceBytesList, tracking=None):
+    if not sequenceBytesList:
+        return {"word": "", "confidence": 0.0}
 
-    print(f"Prediction result: {result}")
-    return result
\ No newline at end of file
+    sequence = np.zeros((len(sequenceBytesList), expectedCoordsPerFrame), dtype=np.float32)
+    pending = [submitWordFrame(frame, tracking) for frame in sequenceBytesList]
+    for idx, frame in enumerate(sequenceBytesList):
+        extractWordLandmarks(frame, sequence[idx], idx, pending[idx], tracking)
+
+    result = classifyWordSequence(normalizeWordLandmarks(sequence))
+    log.sampled('prediction', **result)
+    return result
+
+async def detectFromUploadedFrames(frames):
+    # Local /processWords: the classifier only sees the first sequenceLength frames
+    # and landmarks are normalized per frame, so only those frames are extracted,
+    # all of them in parallel, before one classification.
+    frames = frames[:sequenceLength]
+    sequence = np.zeros((len(frames), expectedCoordsPerFrame), dtype=np.float32)
+    # submitWordFrame blocks while every slot of the workers is taken, so it is called off the loop.
+    pending = await asyncio.to_thread(lambda: [submitWordFrame(frame) for frame in frames])
+    await asyncio.gather(*(inferenceExecutor.submit(None, extractWordLandmarks, frame, sequence[idx], idx, pending[idx])
+                           for idx, frame in enumerate(frames)))
+    result = await inferenceExecutor.submit(None, lambda: classifyWordSequence(normalizeWordLandmarks(sequence)))
+    log.sampled('prediction', **result)
+    return result
+
+class WordStream:
+    # Rolling window of normalized per-frame landmarks for one websocket session.
+    # Normalization is per frame, so every frame is extracted and normalized once
+    # and reused by all the windows it falls into.
+    def __init__(self, windowSize=None, stride=None, agreement=None, tracking=None):
+        # The classifier reads sequenceLength frames, so a longer window would only
+        # classify its oldest frames; sequenceNum above that is clamped.
+        self.windowSize = min(windowSize or sequenceLength, sequenceLength)
+        self.stride = max(1, stride or streamStride)
+        self.agreement = max(1, agreement or streamAgreement)
+        self.frames = deque(maxlen=self.windowSize)
+        self.recentWords = deque(maxlen=self.agreement)
+        self.framesSinceWindow = 0
+        self.lastEmitted = ''
+        self.frameIdx = 0
+        self.tracking = tracking
+
+    def reset(self):
+        self.frames.clear()
+        self.recentWords.clear()
+        self.framesSinceWindow = 0
+        self.lastEmitted = ''
+
+    def addFrame(self, frame):
+        row = extractWordLandmarks(frame, np.zeros(expectedCoordsPerFrame, dtype=np.float32), self.frameIdx,
+                                   tracking=self.tracking)
+        self.frameIdx += 1
+        self.frames.append(normalizeWordLandmarks(row))
+        self.framesSinceWindow += 1
+
+        if len(self.frames) < self.windowSize or self.framesSinceWindow < self.stride:
+            return None
+        self.framesSinceWindow = 0
+        return self._classifyWindow()
+
+    def flush(self):
+        # Classifies whatever is buffered, e.g. when the client stops mid-window.
+        if not self.frames:
+            return None
+        result = classifyWordSequence(np.stack(self.frames))
+        if not result['word'] or result['word'] == self.lastEmitted:
+            return None
+        self.lastEmitted = result['word']
+        return result
+
+    def _classifyWindow(self):
+        result = classifyWordSequence(np.stack(self.frames))
+        self.recentWords.append(result['word'])
+
+        # A word is emitted once the last `agreement` windows all predict it, and
+        # only once per run so overlapping windows do not repeat it.
+        word = result['word']
+        agreed = len(self.recentWords) == self.agreement and all(w == word for w in self.recentWords)
+        if not word:
+            self.lastEmitted = ''
+        if not agreed or not word or word == self.lastEmitted:
+            return None
+
+        self.lastEmitted = word
+        log.sampled('streamPrediction', **result)
+        return result
+
+async def addStreamFrame(stream, frame, sessionId=None):
+    return await inferenceExecutor.submit(sessionId, stream.addFrame, frame)
+
+async def flushStream(stream, sessionId=None):
+    return await inferenceExecutor.submit(sessionId, stream.flush)
@@ -1,9 +1,28 @@
+from dotenv import load_dotenv
+# Settings in api/.env apply to everything below, including the forked workers.
+load_dotenv()
+
+# Puts ai_model/ on sys.path for the landmarks package shared with training.
+import utils.aiModelPath
+from utils.processWorkers import extractionWorkers
+# Fork the extraction workers before the routes import TensorFlow and MediaPipe.
+extractionWorkers.start()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routes.apiRoutes import router as sign_router
+from routes.adminRoutes import router as admin_router
+from utils.inferenceExecutor import inferenceExecutor
+from utils.mediapipePool import closeMediapipePools
+from utils.processMemory import servingMemory
+from utils.modelRegistry import modelRegistry
+from utils.forwardingClient import forwardingClient
+from utils.metrics import metrics
 
 app = FastAPI()
 app.include_router(sign_router)
+app.include_router(admin_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,6 +32,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def loadModels():
+    # Returns straight away; models load and warm up on background threads.
+    modelRegistry.startLoading()
+
+@app.on_event("startup")
+async def startForwardingClient():
+    await forwardingClient.start()
+
+@app.get("/ready")
+def ready():
+    status = modelRegistry.status()
+    return JSONResponse(content=status, status_code=200 if status['ready'] else 503)
+
+@app.get("/memory")
+def memory():
+    return servingMemory()
+
+@app.get("/metrics")
+def prometheusMetrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+def shutdownInference():
+    inferenceExecutor.shutdown()
+    closeMediapipePools()
+    extractionWorkers.shutdown()
+
+@app.on_event("shutdown")
+async def closeForwardingClient():
+    await forwardingClient.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=5000, )
\ No newline at end of file
@@ -0,0 +1,150 @@
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from utils.processMemory import formatMemoryTable, servingMemory
+
+load_dotenv()
+
+# Pre-fork serving: the master imports every heavy library once, binds the port and
+# forks the workers, which share those pages copy-on-write. TensorFlow cannot be
+# initialised before a fork (children hang on its thread pools), so each worker
+# loads and warms its own models right after forking. For the same reason each
+# worker spawns, rather than forks, its INFERENCE_PROCESSES extraction workers, so a
+# master runs PREFORK_WORKERS x (1 + INFERENCE_PROCESSES) processes.
+
+host = os.getenv('PREFORK_HOST', '127.0.0.1')
+port = int(os.getenv('PREFORK_PORT', 5000))
+workerCount = int(os.getenv('PREFORK_WORKERS', os.cpu_count() or 1))
+readyTimeout = float(os.getenv('PREFORK_READY_TIMEOUT', 300))
+startupRetries = int(os.getenv('PREFORK_STARTUP_RETRIES', 3))
+
+def preloadLibraries():
+    import numpy
+    import pandas
+    import cv2
+    import sklearn.preprocessing
+    import mediapipe
+    import tensorflow
+    import fastapi
+    import uvicorn
+
+def runWorker(sock, readyFd):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    import uvicorn
+    from handsUP import app
+    from utils.modelRegistry import modelRegistry
+
+    modelRegistry.onReady(lambda: os.write(readyFd, b'1'))
+    server = uvicorn.Server(uvicorn.Config(app, log_level='info'))
+    server.run(sockets=[sock])
+
+def forkWorker(sock, readyFd):
+    pid = os.fork()
+    if pid == 0:
+        exitCode = 0
+        try:
+            runWorker(sock, readyFd)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            exitCode = 1
+        finally:
+            os._exit(exitCode)
+    return pid
+
+def waitUntilReady(readFd, workers, onExit):
+    ready = 0
+    deadline = time.monotonic() + readyTimeout
+    while workers and ready < len(workers) and time.monotonic() < deadline:
+        readable, _, _ = select.select([readFd], [], [], 1.0)
+        if readable:
+            ready += len(os.read(readFd, len(workers)))
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            onExit(pid, status, startup=True)
+    return ready
+
+def main():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    started = time.perf_counter()
+    preloadLibraries()
+    # Moves everything imported so far out of the collector's reach, so collections in
+    # the workers do not touch (and copy) the shared pages.
+    gc.freeze()
+    print(f"Preloaded libraries in {time.perf_counter() - started:.1f}s, forking {workerCount} workers")
+
+    os.environ['PREFORK_MASTER_PID'] = str(os.getpid())
+    readFd, readyFd = os.pipe()
+    workers = {forkWorker(sock, readyFd) for _ in range(workerCount)}
+
+    stopping = False
+    restartsLeft = startupRetries
+
+    def replace(pid, status, startup=False):
+        # Workers that die during startup are replaced too, but only startupRetries
+        # times, so a broken deployment does not fork forever.
+        nonlocal restartsLeft
+        workers.discard(pid)
+        if stopping:
+            return
+        if startup:
+            if not restartsLeft:
+                print(f"Worker {pid} exited during startup with status {status}, no restarts left")
+                return
+            restartsLeft -= 1
+        print(f"Worker {pid} exited with status {status}, starting a replacement")
+        workers.add(forkWorker(sock, readyFd))
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    ready = waitUntilReady(readFd, workers, replace)
+    if not ready and not stopping:
+        print("No worker became ready, stopping")
+        stop(None, None)
+        for pid in workers:
+            os.waitpid(pid, 0)
+        sock.close()
+        return 1
+    print(f"{ready}/{workerCount} workers ready after {time.perf_counter() - started:.1f}s on http://{host}:{port}")
+    print(formatMemoryTable(servingMemory()))
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        replace(pid, status)
+
+    sock.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
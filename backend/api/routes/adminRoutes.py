@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from utils.samplingProfiler import samplingProfiler, maxProfileSeconds
+import asyncio
+import hmac
+import os
+import time
+
+router = APIRouter(prefix="/admin")
+
+adminToken = os.getenv('ADMIN_TOKEN', '')
+
+def authorize(request: Request):
+    # With ADMIN_TOKEN set the X-Admin-Token header must match it; without it only
+    # clients on this machine may use the admin endpoints.
+    if adminToken:
+        if not hmac.compare_digest(request.headers.get('x-admin-token', ''), adminToken):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in ['127.0.0.1', '::1']:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to use admin endpoints remotely")
+
+@router.post("/profile")
+async def profile(request: Request, seconds: float = 30, session: str | None = None):
+    # Samples every thread for `seconds`, or with `session` (a sessionId, or 'next'
+    # for the next websocket session to start) only that session's work until it
+    # ends or `seconds` pass. Answers with the collapsed stacks once done.
+    authorize(request)
+    seconds = max(0.0, min(seconds, maxProfileSeconds))
+    try:
+        samplingProfiler.start(session)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        if session is None:
+            await asyncio.sleep(seconds)
+        else:
+            await asyncio.to_thread(samplingProfiler.sessionDone.wait, seconds)
+    finally:
+        result = samplingProfiler.stop()
+
+    fileName = f"handsup-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return PlainTextResponse(result['collapsed'], headers={
+        'Content-Disposition': f'attachment; filename="{fileName}"',
+        'X-Profile-Samples': str(result['samples']),
+        'X-Profile-Seconds': str(result['seconds']),
+        'X-Profile-Session': result['session'] or '',
+    })
@@ -1,14 +1,39 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
 import json
-from fastapi.responses import JSONResponse
-from controllers.lettersControllerS import detectFromImageBytes as detectLetters
-from controllers.wordsControllerS import detectFromImageBytes as detectWords
+from fastapi.responses import JSONResponse, StreamingResponse
+from controllers.lettersControllerS import (detectFromImageBytes as detectLetters, LandmarkCache,
+                                           detectFromUploadedFrames as detectLettersLocally)
+from controllers.wordsControllerS import (detectFromImageBytes as detectWords, WordStream, addStreamFrame, flushStream,
+                                         detectFromUploadedFrames as detectWordsLocally)
+from controllers.glossController import translateGlossAsync, streamGlossTranslation
+from utils.forwardingClient import forwardingClient
+from utils.metrics import metrics, websocketRoundTripSeconds
+from utils.eventLog import EventLog
+from utils.samplingProfiler import samplingProfiler
+from utils.frameQueue import FrameQueue
+from utils.wsProtocol import SessionChannel
+from utils.trackingGraphs import openTrackingGraph, closeTrackingGraph
+from landmarks.payload import decode_landmark_frame
 from typing import List
-from dotenv import load_dotenv
+import asyncio
 import httpx
+import logging
 import os
+import time
+import uuid
 
 router = APIRouter(prefix="/handsUPApi")
+log = EventLog('routes')
+
+# local runs /processLetters and /processWords on this node's models, remote forwards
+# them to HUGGINGFACE_BASE_URL; auto forwards only when that URL is set.
+restInference = os.getenv('REST_INFERENCE', 'auto').lower()
+
+def runRestLocally():
+    return restInference == 'local' or (restInference == 'auto' and not forwardingClient.baseUrl)
+
+# The MediaPipe graph a session's JPEG frames go through, per model.
+trackingKinds = {'alpha': 'hands', 'num': 'hands', 'glosses': 'holistic'}
 
 class ConnectionManager:
     def __init__(self):
@@ -22,116 +47,193 @@ class ConnectionManager:
         if websocket in self.activeConnections:
             self.activeConnections.remove(websocket)
 
-    async def sendJson(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
+    async def sendStatus(self, status: str, channel: SessionChannel):
+        await channel.status(status)
+
+    async def sendError(self, message: str, channel: SessionChannel):
+        await channel.error(message)
+
+    async def sendResult(self, result: dict, channel: SessionChannel, model, receivedAt):
+        await channel.result(result)
+        websocketRoundTripSeconds.observe(time.perf_counter() - receivedAt, model=model)
 
 manager = ConnectionManager()
+metrics.gauge('handsup_active_connections', 'Open translation websockets', lambda: len(manager.activeConnections))
+
+async def receiveMessages(websocket: WebSocket, inbox: FrameQueue, sessionId):
+    # Keeps reading the socket while the session loop runs inference, so frames are
+    # queued (or skipped by the policy) instead of waiting unread in the socket.
+    try:
+        while True:
+            data = await websocket.receive()
+            data['receivedAt'] = time.perf_counter()
+            inbox.put(data)
+            if data['type'] == 'websocket.disconnect':
+                return
+    except Exception as e:
+        inbox.put({'type': 'websocket.disconnect', 'code': 1006, 'receivedAt': time.perf_counter(), 'error': str(e)})
 
 @router.websocket("/ws_translate")
 async def websocketEndpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    sessionId = uuid.uuid4().hex
+    samplingProfiler.sessionStarted(sessionId)
+    landmarkCache = LandmarkCache()
+    frameCounter = 0
     currentFrames = []
     model = None
     sequenceNum = None
-    isProcessing = False
     isDynamic = False
     ignoreCount = 0
-    stopped = False  
+    wordStream = None
+    inputFormat = 'jpeg'
+    tracking = None
+    inbox = FrameQueue()
+    channel = SessionChannel(websocket)
+    receiver = asyncio.create_task(receiveMessages(websocket, inbox, sessionId))
+    endReason = 'disconnect'
 
     try:
         while True:
-            data = await websocket.receive()
+            data = await inbox.get()
+            receivedAt = data['receivedAt']
+            if data['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(data.get('code', 1000))
 
             if 'text' in data:
                 msg = json.loads(data['text'])
 
                 if msg['type'] == 'start':
-                    if isProcessing:
-                        await manager.sendJson({'error': 'Processing in progress'}, websocket)
-                        continue
                     currentFrames = []
+                    landmarkCache.clear()
                     model = msg['model']
                     sequenceNum = msg['sequenceNum']
                     isDynamic = False
                     ignoreCount = 0
-                    stopped = False
-                    print(f"Started: model={model}, sequenceNum={sequenceNum}")
+                    wordStream = None
+                    inputFormat = msg.get('inputFormat', 'jpeg')
+                    if inputFormat not in ['jpeg', 'landmarks']:
+                        await manager.sendError(f'Invalid input format: {inputFormat}', channel)
+                        inputFormat = 'jpeg'
+                    if not channel.negotiate(msg.get('protocol', 'json')):
+                        await manager.sendError(f"Invalid protocol: {msg.get('protocol')}", channel)
+                    # The session keeps its tracking graph across starts unless it needs another kind.
+                    trackingKind = trackingKinds.get(model) if inputFormat == 'jpeg' else None
+                    if tracking is not None and tracking.kind != trackingKind:
+                        await closeTrackingGraph(tracking, sessionId)
+                        tracking = None
+                    if tracking is None and trackingKind is not None:
+                        tracking = await openTrackingGraph(trackingKind, sessionId)
+                        inbox.excludeFromCost()
+                    landmarkCache.tracking = tracking
+                    if model == 'glosses' and msg.get('streaming'):
+                        wordStream = WordStream(sequenceNum, msg.get('stride'), msg.get('agreement'), tracking)
+                    log.event('start', sessionId=sessionId, model=model, sequenceNum=sequenceNum,
+                              streaming=wordStream is not None, inputFormat=inputFormat, protocol=channel.protocol,
+                              tracking=tracking is not None)
 
                 elif msg['type'] == 'process':
-                    if isProcessing:
-                        await manager.sendJson({'error': 'Processing in progress'}, websocket)
+                    if wordStream is not None:
+                        result = await flushStream(wordStream, sessionId)
+                        await manager.sendResult(result or {'word': '', 'confidence': 0.0}, channel, model, receivedAt)
+                        await manager.sendStatus('ready', channel)
                         continue
 
                     if model in ['alpha', 'num'] and len(currentFrames) not in [1, 2, 10]:
-                        await manager.sendJson({'error': f'Invalid frame count: {len(currentFrames)}'}, websocket)
+                        await manager.sendError(f'Invalid frame count: {len(currentFrames)}', channel)
+                        inbox.drop('invalidSequence', len(currentFrames))
                         currentFrames = []
                         continue
                     if model == 'glosses' and len(currentFrames) < sequenceNum:
-                        await manager.sendJson({'error': f'Incomplete sequence: expected {sequenceNum}, got {len(currentFrames)}'}, websocket)
+                        await manager.sendError(f'Incomplete sequence: expected {sequenceNum}, got {len(currentFrames)}', channel)
+                        inbox.drop('invalidSequence', len(currentFrames))
                         currentFrames = []
                         continue
 
-                    isProcessing = True
-                    print(f"Processing {len(currentFrames)} frames, model: {model}, isDynamic: {isDynamic}")
-                    await manager.sendJson({'status': 'processing'}, websocket)
+                    log.sampled('processing', sessionId=sessionId, frames=len(currentFrames), model=model, isDynamic=isDynamic)
+                    await manager.sendStatus('processing', channel)
 
                     if model in ['alpha', 'num']:
-                        result = await detectLetters(currentFrames, websocket, isDynamic)
+                        result = await detectLetters(currentFrames, websocket, isDynamic, sessionId, model,
+                                                     frameCounter - len(currentFrames), landmarkCache)
                         if result.get('status') == 'waitMoreDynamic':
                             isDynamic = True
                         if result.get('status') not in ['waitMore', 'waitMoreDynamic']:
-                            await manager.sendJson(result, websocket)
+                            await manager.sendResult(result, channel, model, receivedAt)
                             currentFrames = []
                             isDynamic = False
                             ignoreCount = 10 if result.get('letter') in ['J', 'Z'] else 6
-                        await manager.sendJson({'status': 'ready'}, websocket)
+                        await manager.sendStatus('ready', channel)
 
                     elif model == 'glosses':
-                        result = detectWords(currentFrames)
-                        await manager.sendJson(result, websocket)
+                        result = await detectWords(currentFrames, sessionId, tracking)
+                        await manager.sendResult(result, channel, model, receivedAt)
                         currentFrames = []
                         ignoreCount = 10
-                        await manager.sendJson({'status': 'ready'}, websocket)
+                        await manager.sendStatus('ready', channel)
 
                     else:
-                        await manager.sendJson({'error': 'Invalid model'}, websocket)
-
-                    isProcessing = False
+                        await manager.sendError('Invalid model', channel)
 
                 elif msg['type'] == 'stop':
-                    stopped = True
-                    if isProcessing:
-                        await manager.sendJson({'error': 'Processing in progress'}, websocket)
-                        continue
+                    endReason = 'stopped'
+                    if wordStream is not None:
+                        result = await flushStream(wordStream, sessionId)
+                        if result:
+                            await manager.sendResult(result, channel, model, receivedAt)
+                        wordStream = None
                     if currentFrames:
-                        isProcessing = True
-                        print(f"Processing {len(currentFrames)} frames on stop, model: {model}, isDynamic: {isDynamic}")
-                        await manager.sendJson({'status': 'processing'}, websocket)
+                        log.sampled('processing', sessionId=sessionId, frames=len(currentFrames), model=model,
+                                    isDynamic=isDynamic, onStop=True)
+                        await manager.sendStatus('processing', channel)
 
                         if model in ['alpha', 'num']:
-                            result = await detectLetters(currentFrames, websocket, isDynamic)
+                            result = await detectLetters(currentFrames, websocket, isDynamic, sessionId, model,
+                                                         frameCounter - len(currentFrames), landmarkCache)
                             if result.get('status') not in ['waitMore', 'waitMoreDynamic']:
-                                await manager.sendJson(result, websocket)
+                                await manager.sendResult(result, channel, model, receivedAt)
                         elif model == 'glosses':
-                            result = detectWords(currentFrames)
-                            await manager.sendJson(result, websocket)
+                            result = await detectWords(currentFrames, sessionId, tracking)
+                            await manager.sendResult(result, channel, model, receivedAt)
 
                         currentFrames = []
                         isDynamic = False
                         ignoreCount = 0
-                        isProcessing = False
 
-                    break  
+                    break
+
+            elif data.get('bytes') is not None:
+                frame = data['bytes']
+                if inputFormat == 'landmarks':
+                    # Client-side MediaPipe: no JPEG decode or landmark extraction on the server.
+                    try:
+                        frame = decode_landmark_frame(frame)
+                    except ValueError as e:
+                        await manager.sendError(f'Invalid landmark payload: {e}', channel)
+                        inbox.drop('invalidPayload')
+                        continue
+
+                if wordStream is not None:
+                    # Streaming words: every frame extends the rolling window and
+                    # a word is sent as soon as consecutive windows agree on it.
+                    result = await addStreamFrame(wordStream, frame, sessionId)
+                    frameCounter += 1
+                    if result:
+                        await manager.sendResult(result, channel, model, receivedAt)
+                    else:
+                        await manager.sendStatus('collecting', channel)
+                    continue
 
-            elif 'bytes' in data and not isProcessing and not stopped:
                 if ignoreCount > 0:
                     ignoreCount -= 1
+                    inbox.drop('cooldown')
                     continue
 
-                imageBytes = data['bytes']
-                currentFrames.append(imageBytes)
+                currentFrames.append(frame)
+                frameCounter += 1
 
                 if model is not None and sequenceNum is not None and len(currentFrames) > sequenceNum:
+                    inbox.drop('overflow', len(currentFrames) - sequenceNum)
                     currentFrames = currentFrames[-sequenceNum:]
 
                 is_about_to_process = False
@@ -142,64 +244,66 @@ async def websocketEndpoint(websocket: WebSocket):
                     is_about_to_process = True
 
                 if not is_about_to_process:
-                    await manager.sendJson({'status': 'collecting'}, websocket)
+                    await manager.sendStatus('collecting', channel)
 
                 if model in ['alpha', 'num']:
                     if len(currentFrames) in [1, 2] or (len(currentFrames) == 10 and isDynamic):
-                        isProcessing = True
-                        print(f"Processing {len(currentFrames)} frames, model: {model}, isDynamic: {isDynamic}")
-                        await manager.sendJson({'status': 'processing'}, websocket)
+                        log.sampled('processing', sessionId=sessionId, frames=len(currentFrames), model=model, isDynamic=isDynamic)
+                        await manager.sendStatus('processing', channel)
 
-                        result = await detectLetters(currentFrames, websocket, isDynamic)
+                        result = await detectLetters(currentFrames, websocket, isDynamic, sessionId, model,
+                                                     frameCounter - len(currentFrames), landmarkCache)
                         if result.get('status') == 'waitMoreDynamic':
                             isDynamic = True
                         if result.get('status') not in ['waitMore', 'waitMoreDynamic']:
-                            await manager.sendJson(result, websocket)
+                            await manager.sendResult(result, channel, model, receivedAt)
                             currentFrames = []
                             isDynamic = False
                             ignoreCount = 10 if result.get('letter') in ['J', 'Z'] else 6
 
-                        isProcessing = False
-                        await manager.sendJson({'status': 'ready'}, websocket)
+                        await manager.sendStatus('ready', channel)
 
                 elif model == 'glosses' and len(currentFrames) >= sequenceNum:
-                    isProcessing = True
-                    print(f"Processing {len(currentFrames)} frames, model: {model}, isDynamic: {isDynamic}")
-                    await manager.sendJson({'status': 'processing'}, websocket)
+                    log.sampled('processing', sessionId=sessionId, frames=len(currentFrames), model=model, isDynamic=isDynamic)
+                    await manager.sendStatus('processing', channel)
 
-                    result = detectWords(currentFrames)
-                    await manager.sendJson(result, websocket)
+                    result = await detectWords(currentFrames, sessionId, tracking)
+                    await manager.sendResult(result, channel, model, receivedAt)
 
                     currentFrames = []
                     ignoreCount = 10
-                    isProcessing = False
-                    await manager.sendJson({'status': 'ready'}, websocket)
+                    await manager.sendStatus('ready', channel)
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        inbox.drop('disconnect', len(currentFrames))
+        landmarkCache.clear()
         currentFrames = []
-        isProcessing = False
         isDynamic = False
         ignoreCount = 0
-        stopped = True
-
-async def sendToHF(url: str, frames: List[UploadFile]):
-    files_to_send = [
-        ('frames', (frame.filename, await frame.read(), frame.content_type))
-        for frame in frames
-    ]
-
-    async with httpx.AsyncClient(timeout=300) as client:
-        try:
-            response = await client.post(url, files=files_to_send)
-            response.raise_for_status()
-            return response.json()
-        except httpx.RequestError as e:
-            print(f"Request error: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
-        except httpx.HTTPStatusError as e:
-            print(f"HTTP error: {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+        wordStream = None
+    finally:
+        # A session that ends with 'stop' leaves the loop without a disconnect.
+        receiver.cancel()
+        inbox.discard(endReason)
+        if tracking is not None:
+            await closeTrackingGraph(tracking, sessionId)
+        manager.disconnect(websocket)
+        samplingProfiler.sessionEnded(sessionId)
+        log.event('sessionEnded', sessionId=sessionId, reason=endReason, frames=frameCounter,
+                  keepEvery=inbox.policy.keepEvery, dropped=dict(inbox.dropped))
+
+async def sendToHF(path: str, frames: List[UploadFile]):
+    if not forwardingClient.baseUrl:
+        raise HTTPException(status_code=503, detail="HUGGINGFACE_BASE_URL is not configured")
+
+    try:
+        return await forwardingClient.postFrames(path, frames)
+    except httpx.RequestError as e:
+        log.event('forwardFailed', logging.WARNING, path=path, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    except httpx.HTTPStatusError as e:
+        log.event('forwardFailed', logging.WARNING, path=path, status=e.response.status_code, error=e.response.text)
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
 
 
 @router.post("/processLetters")
@@ -208,10 +312,11 @@ async def process_letters(frames: List[UploadFile] = File(...)):
     if len(frames) != sequence_num:
         raise HTTPException(status_code=400, detail=f"Exactly {sequence_num} frames required")
 
-    url = f"{HUGGINGFACE_BASE_URL}/detect-letters"
-
-    result = await sendToHF(url, frames)
-    print(f"Received result: {result}")
+    if runRestLocally():
+        result = await detectLettersLocally([await frame.read() for frame in frames])
+    else:
+        result = await sendToHF("/detect-letters", frames)
+    log.sampled('restResult', path='/processLetters', result=result)
     return JSONResponse(content=result)
 
 
@@ -221,9 +326,10 @@ async def process_words(frames: List[UploadFile] = File(...)):
     if len(frames) != sequence_num:
         raise HTTPException(status_code=400, detail=f"Exactly {sequence_num} frames required")
 
-    url = f"{HUGGINGFACE_BASE_URL}/detect-words"
-
-    result = await sendToHF(url, frames)
+    if runRestLocally():
+        result = await detectWordsLocally([await frame.read() for frame in frames])
+    else:
+        result = await sendToHF("/detect-words", frames)
     return JSONResponse(content=result)
 
 
@@ -233,6 +339,23 @@ async def sign_sentence(data: dict):
     if not gloss_input:
         raise HTTPException(status_code=400, detail="No gloss provided")
 
-    from controllers.glossController import translateGloss
-    translation = translateGloss(gloss_input)
-    return {"translation": translation}
\ No newline at end of file
+    # Cached, batched with concurrent requests and generated off the event loop.
+    translation = await translateGlossAsync(gloss_input)
+    return {"translation": translation}
+
+
+@router.post("/sentence/stream")
+async def sign_sentence_stream(data: dict):
+    gloss_input = data.get("gloss")
+    if not gloss_input:
+        raise HTTPException(status_code=400, detail="No gloss provided")
+
+    # Server-sent events: one {"token"} event per decoded piece, then {"done", "translation"}.
+    async def events():
+        pieces = []
+        async for piece in streamGlossTranslation(gloss_input):
+            pieces.append(piece)
+            yield f"data: {json.dumps({'token': piece})}\n\n"
+        yield f"data: {json.dumps({'done': True, 'translation': ''.join(pieces).strip()})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+AI_MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../ai_model'))
+
+if AI_MODEL_DIR not in sys.path:
+    sys.path.append(AI_MODEL_DIR)
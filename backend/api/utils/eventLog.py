@@ -0,0 +1,34 @@
+import json
+import logging
+import os
+import random
+
+# Structured (one JSON object per line) logging for the serving path. Per-frame and
+# per-prediction events are sampled: at 30 fps per user, formatting and writing every
+# one of them costs real CPU, so only LOG_SAMPLE_RATE of them are kept. Events that
+# happen once per session or signal a failure are always logged.
+
+logSampleRate = float(os.getenv('LOG_SAMPLE_RATE', 0.01))
+
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+rootLogger = logging.getLogger('handsup')
+rootLogger.addHandler(handler)
+rootLogger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+rootLogger.propagate = False
+
+
+class EventLog:
+    def __init__(self, name, sampleRate=None):
+        self.logger = rootLogger.getChild(name)
+        self.sampleRate = logSampleRate if sampleRate is None else sampleRate
+
+    def event(self, event, level=logging.INFO, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, json.dumps({'event': event, **fields}, default=str))
+
+    def sampled(self, event, level=logging.INFO, **fields):
+        # The random draw comes first, so a skipped event costs no formatting at all.
+        if self.sampleRate < 1 and random.random() >= self.sampleRate:
+            return
+        self.event(event, level, sampleRate=self.sampleRate, **fields)
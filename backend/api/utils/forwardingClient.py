@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import importlib.util
+import os
+from collections import OrderedDict
+
+import httpx
+
+hashChunkBytes = 64 * 1024
+
+
+class UploadStream:
+    # A spooled upload as httpx reads it. It has no fileno(): httpx calls that to
+    # size a file, and it would move an in-memory SpooledTemporaryFile to disk.
+    def __init__(self, file):
+        self.read = file.read
+        self.seek = file.seek
+        self.tell = file.tell
+
+
+class ForwardingClient:
+    # One long-lived client for the endpoints that forward uploaded frames to the
+    # hosted models: connections are kept alive and reused (HTTP/2 when h2 is
+    # installed), uploads are streamed from the spooled upload files, and responses
+    # are cached by a SHA-256 of the frames so a retried request is answered locally.
+    def __init__(self, baseUrl=None, maxConnections=None, cacheSize=None, timeout=None, http2=None):
+        self.baseUrl = (baseUrl if baseUrl is not None else os.getenv('HUGGINGFACE_BASE_URL', '')).rstrip('/')
+        self.maxConnections = maxConnections or int(os.getenv('FORWARD_MAX_CONNECTIONS', 20))
+        self.cacheSize = cacheSize if cacheSize is not None else int(os.getenv('FORWARD_CACHE_SIZE', 256))
+        self.timeout = timeout or float(os.getenv('FORWARD_TIMEOUT_S', 300))
+        if http2 is None:
+            http2 = os.getenv('FORWARD_HTTP2', '1') != '0'
+        self.http2 = http2 and importlib.util.find_spec('h2') is not None
+        self.client = None
+        self.responses = OrderedDict()
+        self.inFlight = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.maxConnections,
+                                    max_keepalive_connections=self.maxConnections))
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def contentKey(self, path, frames):
+        # Runs on a worker thread; the spooled files are hashed in chunks, not read into memory.
+        digest = hashlib.sha256(path.encode())
+        for frame in frames:
+            frame.file.seek(0)
+            size = 0
+            for chunk in iter(lambda: frame.file.read(hashChunkBytes), b''):
+                digest.update(chunk)
+                size += len(chunk)
+            # Frame sizes keep frame boundaries part of the key.
+            digest.update(size.to_bytes(8, 'little'))
+        return digest.hexdigest()
+
+    async def postFrames(self, path, frames):
+        # Raises httpx.RequestError / httpx.HTTPStatusError like a plain post would.
+        key = await asyncio.to_thread(self.contentKey, path, frames)
+        if key in self.responses:
+            self.responses.move_to_end(key)
+            self.hits += 1
+            return self.responses[key]
+        self.misses += 1
+
+        # Identical requests already on the wire (a client retrying before the first
+        # answer arrived) wait for that answer instead of posting the frames again.
+        task = self.inFlight.get(key)
+        if task is not None:
+            try:
+                return await asyncio.shield(task)
+            except ValueError:
+                # That upload streams the first request's files, which were closed
+                # under it (a cancelled request); this request posts its own.
+                pass
+        task = asyncio.ensure_future(self._post(path, frames))
+        self.inFlight[key] = task
+        task.add_done_callback(lambda done: self._store(key, done))
+        return await asyncio.shield(task)
+
+    async def _post(self, path, frames):
+        await self.start()
+        files = [('frames', (frame.filename, UploadStream(frame.file), frame.content_type)) for frame in frames]
+        response = await self.client.post(f"{self.baseUrl}{path}", files=files)
+        response.raise_for_status()
+        return response.json()
+
+    def _store(self, key, task):
+        if self.inFlight.get(key) is task:
+            del self.inFlight[key]
+        if task.cancelled() or task.exception() is not None or self.cacheSize <= 0:
+            return
+        self.responses[key] = task.result()
+        while len(self.responses) > self.cacheSize:
+            self.responses.popitem(last=False)
+
+
+forwardingClient = ForwardingClient()
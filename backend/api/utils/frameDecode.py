@@ -0,0 +1,51 @@
+import os
+
+import cv2
+import numpy as np
+
+# Frames larger than MediaPipe needs are decoded at 1/2, 1/4 or 1/8 scale straight
+# from the JPEG's DCT coefficients (IMREAD_REDUCED_*), which is far cheaper than a
+# full decode followed by a resize. The largest reduction that keeps the long side at
+# DECODE_TARGET_SIDE pixels or more is used; 0 turns reduced decoding off.
+
+decodeTargetSide = int(os.getenv('DECODE_TARGET_SIDE', 640))
+REDUCED_MODES = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpegSize(data):
+    # (width, height) from the JPEG's frame header, or None if data is not a JPEG.
+    view = memoryview(data).cast('B')
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(view):
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC), carry the frame size.
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return (view[i + 7] << 8) | view[i + 8], (view[i + 5] << 8) | view[i + 6]
+        i += 2 + ((view[i + 2] << 8) | view[i + 3])
+    return None
+
+
+def decodeFlag(size):
+    if size is None or decodeTargetSide <= 0:
+        return cv2.IMREAD_COLOR
+    for factor, flag in REDUCED_MODES:
+        if max(size) // factor >= decodeTargetSide:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decodeFrame(frame):
+    # BGR image, possibly at a reduced scale, or None if the frame does not decode.
+    # Landmarks are normalized to the image, so the scale does not change them.
+    buffer = frame if isinstance(frame, np.ndarray) else np.frombuffer(frame, np.uint8)
+    return cv2.imdecode(buffer, decodeFlag(jpegSize(buffer)))
@@ -0,0 +1,110 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter, deque
+
+from utils.metrics import droppedFrames
+
+# Per-session inbox for the translation websocket. A receiver task reads the socket
+# continuously and puts messages here while the session loop works through them, so
+# frames that arrive during inference are queued instead of being discarded. When the
+# session cannot keep up, FramePolicy thins the incoming frames evenly (every k-th
+# frame) rather than letting a full queue cut random holes into a sequence.
+
+frameQueueSize = int(os.getenv('FRAME_QUEUE_SIZE', 32))
+maxKeepEvery = int(os.getenv('FRAME_KEEP_EVERY_MAX', 3))
+
+
+class FramePolicy:
+    # keepEvery is chosen so the measured processing cost per kept frame fits into
+    # the time it takes keepEvery frames to arrive. Both figures are moving averages,
+    # so short spikes (a window being classified) are spread over the frames around them.
+    def __init__(self, maxKeep=None, decay=0.95, smoothing=0.1):
+        self.maxKeep = maxKeep or maxKeepEvery
+        self.decay = decay
+        self.smoothing = smoothing
+        self.busySeconds = 0.0
+        self.framesHandled = 0.0
+        self.arrivalInterval = None
+        self.lastArrival = None
+        self.keepEvery = 1
+        self.sinceKept = 0
+
+    def admit(self, now):
+        if self.lastArrival is not None:
+            gap = now - self.lastArrival
+            self.arrivalInterval = gap if self.arrivalInterval is None else \
+                self.arrivalInterval + self.smoothing * (gap - self.arrivalInterval)
+        self.lastArrival = now
+        self.sinceKept += 1
+        if self.sinceKept < self.keepEvery:
+            return False
+        self.sinceKept = 0
+        return True
+
+    def processed(self, seconds, frame=True):
+        self.busySeconds = self.busySeconds * self.decay + seconds
+        if frame:
+            self.framesHandled = self.framesHandled * self.decay + 1
+        if not self.arrivalInterval or self.framesHandled < 1:
+            return
+        costPerFrame = self.busySeconds / self.framesHandled
+        self.keepEvery = min(self.maxKeep, max(1, math.ceil(costPerFrame / self.arrivalInterval)))
+
+
+class FrameQueue:
+    def __init__(self, maxFrames=None, policy=None):
+        self.maxFrames = maxFrames or frameQueueSize
+        self.policy = policy or FramePolicy()
+        self.messages = deque()
+        self.frames = 0
+        self.available = asyncio.Event()
+        self.dropped = Counter()
+        self.handedOut = None
+
+    def put(self, message):
+        # Control messages are always queued; frames go through the policy and the bound.
+        if message.get('bytes') is not None:
+            if not self.policy.admit(message['receivedAt']):
+                self.drop('skipped')
+                return
+            if self.frames >= self.maxFrames:
+                self.drop('queueFull')
+                return
+            self.frames += 1
+        self.messages.append(message)
+        self.available.set()
+
+    async def get(self):
+        # The session loop calls get() as soon as it is done with the previous
+        # message, so the time in between is what that message cost to process.
+        if self.handedOut is not None:
+            started, isFrame = self.handedOut
+            self.policy.processed(time.perf_counter() - started, isFrame)
+            self.handedOut = None
+        while not self.messages:
+            self.available.clear()
+            await self.available.wait()
+        message = self.messages.popleft()
+        isFrame = message.get('bytes') is not None
+        if isFrame:
+            self.frames -= 1
+        self.handedOut = (time.perf_counter(), isFrame)
+        return message
+
+    def excludeFromCost(self):
+        # The message being handled does one-off work (building a session's graphs on
+        # start) that says nothing about what the next frames will cost.
+        self.handedOut = None
+
+    def drop(self, reason, count=1):
+        if count:
+            self.dropped[reason] += count
+            droppedFrames.inc(count, reason=reason)
+
+    def discard(self, reason):
+        # Frames still queued when the session ends.
+        self.drop(reason, self.frames)
+        self.messages.clear()
+        self.frames = 0
@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import metrics
+from utils.samplingProfiler import samplingProfiler
+
+
+class InferenceExecutor:
+    def __init__(self, maxWorkers=None, maxPending=None):
+        self.maxWorkers = maxWorkers or int(os.getenv('INFERENCE_WORKERS', min(4, os.cpu_count() or 1)))
+        self.maxPending = maxPending or int(os.getenv('INFERENCE_MAX_PENDING', self.maxWorkers * 4))
+        self.pool = ThreadPoolExecutor(max_workers=self.maxWorkers, thread_name_prefix='inference')
+        self.pendingSlots = None
+        self.sessionTails = {}
+        self.inFlight = 0
+
+    async def submit(self, sessionId, fn, *args, **kwargs):
+        # Work for the same session runs strictly in submission order; work for
+        # different sessions shares the bounded pool.
+        loop = asyncio.get_running_loop()
+        if self.pendingSlots is None:
+            self.pendingSlots = asyncio.Semaphore(self.maxPending)
+
+        previous = self.sessionTails.get(sessionId) if sessionId is not None else None
+        done = loop.create_future()
+        if sessionId is not None:
+            self.sessionTails[sessionId] = done
+
+        tail = previous
+        self.inFlight += 1
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            async with self.pendingSlots:
+                call = functools.partial(fn, *args, **kwargs)
+                if samplingProfiler.sessionScoped and sessionId is not None:
+                    call = functools.partial(samplingProfiler.runForSession, sessionId, call)
+                tail = loop.run_in_executor(self.pool, call)
+                return await asyncio.shield(tail)
+        finally:
+            self.inFlight -= 1
+            self._releaseAfter(sessionId, done, tail)
+
+    def _releaseAfter(self, sessionId, done, tail):
+        def release(_=None):
+            if not done.done():
+                done.set_result(None)
+            if self.sessionTails.get(sessionId) is done:
+                del self.sessionTails[sessionId]
+
+        if tail is None or tail.done():
+            release()
+        else:
+            tail.add_done_callback(release)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+inferenceExecutor = InferenceExecutor()
+metrics.gauge('handsup_inflight_inferences', 'Inference jobs queued or running on the executor',
+              lambda: inferenceExecutor.inFlight)
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.inferenceExecutor import inferenceExecutor
+
+mediapipePools = []
+WARM_UP_FRAME_SIZE = 64
+
+
+# mediapipe is imported inside the factories so extraction worker processes can be
+# forked before it is loaded. staticImageMode=False builds a tracking graph for one
+# session's video (utils/trackingGraphs.py).
+def createHandsGraph(staticImageMode=True):
+    import mediapipe as mp
+    if staticImageMode:
+        return mp.solutions.hands.Hands(static_image_mode=True)
+    # Only the first hand is used. With fewer hands in view than max_num_hands, the
+    # palm detector would run on every frame anyway.
+    return mp.solutions.hands.Hands(static_image_mode=False, max_num_hands=1)
+
+
+def createHolisticGraph(staticImageMode=True):
+    import mediapipe as mp
+    return mp.solutions.holistic.Holistic(
+        static_image_mode=staticImageMode,
+        model_complexity=1,
+        min_detection_confidence=0.2,
+        min_tracking_confidence=0.5
+    )
+
+
+def detectHand(hands, imageBgr):
+    # (21, 3) landmarks of the first hand, normalized to the image, or None.
+    import cv2
+    from landmarks.conversion import hand_to_array
+    results = hands.process(cv2.cvtColor(imageBgr, cv2.COLOR_BGR2RGB))
+    if not results.multi_hand_landmarks:
+        return None
+    return hand_to_array(results.multi_hand_landmarks[0])
+
+
+def warmUpGraph(graph):
+    # The first process() call initialises the graph's delegates; pay it here.
+    graph.process(np.zeros((WARM_UP_FRAME_SIZE, WARM_UP_FRAME_SIZE, 3), dtype=np.uint8))
+    return graph
+
+
+class MediaPipePool:
+    # MediaPipe graphs are not safe to call from several threads at once, so each
+    # extraction borrows a whole graph instead of sharing one behind a lock. Graphs are
+    # created on first use, or all at once by fill() when the model registry warms up.
+    def __init__(self, factory, size=None, name='mediapipePool'):
+        self.factory = factory
+        self.size = size or int(os.getenv('MEDIAPIPE_POOL_SIZE', inferenceExecutor.maxWorkers))
+        self.name = name
+        # LIFO hands back the most recently used graph, whose buffers are still warm.
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.createLock = threading.Lock()
+        mediapipePools.append(self)
+
+    def _reserve(self):
+        with self.createLock:
+            if self.created >= self.size:
+                return False
+            self.created += 1
+            return True
+
+    def _create(self):
+        try:
+            return warmUpGraph(self.factory())
+        except Exception:
+            with self.createLock:
+                self.created -= 1
+            raise
+
+    def fill(self):
+        while self._reserve():
+            self.idle.put(self._create())
+        return self
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        try:
+            graph = self.idle.get_nowait()
+        except queue.Empty:
+            graph = self._create() if self._reserve() else self.idle.get(timeout=timeout)
+        try:
+            yield graph
+        finally:
+            self.idle.put(graph)
+
+    def close(self):
+        while True:
+            try:
+                graph = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            graph.close()
+
+
+def closeMediapipePools():
+    for pool in mediapipePools:
+        pool.close()
+    mediapipePools.clear()
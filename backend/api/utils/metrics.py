@@ -0,0 +1,153 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format (0.0.4) metrics, served by GET /metrics. Every
+# metric is thread-safe: they are updated from the event loop, the inference
+# executor, the micro-batcher threads and the extraction result thread.
+
+latencyBuckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def formatLabels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def formatValue(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    def __init__(self, name, documentation, labelNames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelNames = tuple(labelNames)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelNames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        return self.header() + [f'{self.name}{formatLabels(list(zip(self.labelNames, key)))} {formatValue(value)}'
+                                for key, value in series]
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    # valueFn reads the current value when the metrics are scraped, for state that
+    # already lives elsewhere (open connections, queued jobs).
+    def __init__(self, name, documentation, valueFn=None):
+        super().__init__(name, documentation)
+        self.valueFn = valueFn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.valueFn() if self.valueFn is not None else self.value
+        return self.header() + [f'{self.name} {formatValue(value)}']
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelNames=(), buckets=latencyBuckets):
+        super().__init__(name, documentation, labelNames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Per-bucket counts (made cumulative when rendered), sum, count.
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self.lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.series.items())
+        lines = self.header()
+        for key, (counts, total, count) in series:
+            labelPairs = list(zip(self.labelNames, key))
+            cumulative = 0
+            for bound, bucketCount in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucketCount
+                lines.append(f'{self.name}_bucket{formatLabels(labelPairs + [("le", formatValue(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{formatLabels(labelPairs)} {formatValue(total)}')
+            lines.append(f'{self.name}_count{formatLabels(labelPairs)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, labelNames=(), buckets=latencyBuckets):
+        return self.register(Histogram(name, documentation, labelNames, buckets))
+
+    def counter(self, name, documentation, labelNames=()):
+        return self.register(Counter(name, documentation, labelNames))
+
+    def gauge(self, name, documentation, valueFn=None):
+        return self.register(Gauge(name, documentation, valueFn))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+jpegDecodeSeconds = metrics.histogram('handsup_jpeg_decode_seconds', 'JPEG frame decode time', ['kind'])
+landmarkExtractionSeconds = metrics.histogram('handsup_landmark_extraction_seconds',
+                                              'MediaPipe landmark extraction time per frame', ['kind'])
+normalizationSeconds = metrics.histogram('handsup_normalization_seconds',
+                                         'Landmark normalization and feature building time', ['model'])
+modelPredictSeconds = metrics.histogram('handsup_model_predict_seconds', 'Classifier predict time per call', ['model'])
+glossGenerateSeconds = metrics.histogram('handsup_gloss_generate_seconds', 'Gloss translation generate time', ['mode'])
+websocketRoundTripSeconds = metrics.histogram('handsup_websocket_round_trip_seconds',
+                                              'Time from the websocket message that triggers a prediction to '
+                                              'the result being sent', ['model'])
+droppedFrames = metrics.counter('handsup_dropped_frames_total', 'Websocket frames received but never classified',
+                                ['reason'])
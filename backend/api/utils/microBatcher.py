@@ -0,0 +1,79 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def stackRows(rows):
+    return np.stack([np.asarray(row, dtype=np.float32) for row in rows])
+
+
+def splitRows(outputs, i):
+    if isinstance(outputs, (list, tuple)):
+        return [np.asarray(output[i]) for output in outputs]
+    return np.asarray(outputs[i])
+
+
+class MicroBatcher:
+    # collate turns the queued items into one model input and split picks item i's
+    # result out of the model output; the defaults handle float32 feature rows.
+    def __init__(self, predictFn, maxBatchSize=None, maxDelayMs=None, name='microBatcher', collate=stackRows,
+                 split=splitRows):
+        self.predictFn = predictFn
+        self.collate = collate
+        self.split = split
+        self.maxBatchSize = maxBatchSize or int(os.getenv('BATCH_MAX_SIZE', 32))
+        if maxDelayMs is None:
+            maxDelayMs = float(os.getenv('BATCH_MAX_DELAY_MS', 2))
+        self.maxDelay = maxDelayMs / 1000
+        self.name = name
+        self.pending = queue.Queue()
+        self.worker = None
+        self.workerLock = threading.Lock()
+
+    def submit(self, item):
+        future = Future()
+        self._ensureWorker()
+        self.pending.put((item, future))
+        return future
+
+    async def predict(self, item):
+        # Awaited on the event loop: no thread waits while the batch fills.
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _ensureWorker(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.workerLock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.maxDelay
+            while len(batch) < self.maxBatchSize:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            outputs = self.predictFn(self.collate([item for item, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(batch):
+            future.set_result(self.split(outputs, i))
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.eventLog import EventLog
+
+log = EventLog('models')
+
+
+class ModelEntry:
+    def __init__(self, name, loader, warmUp=None, required=True):
+        self.name = name
+        self.loader = loader
+        self.warmUp = warmUp
+        self.required = required
+        self.future = Future()
+        self.status = 'pending'
+        self.loadSeconds = None
+        self.warmSeconds = None
+        self.error = None
+
+
+class ModelRegistry:
+    # Models are registered at import time but only loaded once startLoading() runs,
+    # in parallel on background threads, so the app starts serving immediately and
+    # each model becomes usable as soon as it is loaded and warmed. Only required
+    # models count towards isReady(); an optional one that fails to load only
+    # disables the routes that use it.
+    def __init__(self, maxWorkers=None):
+        self.maxWorkers = maxWorkers or int(os.getenv('MODEL_LOAD_WORKERS', 4))
+        self.entries = {}
+        self.startedAt = None
+        self.readyAt = None
+        self.readyCallbacks = []
+        self.lock = threading.Lock()
+
+    def register(self, name, loader, warmUp=None, required=True):
+        self.entries[name] = ModelEntry(name, loader, warmUp, required)
+
+    def startLoading(self):
+        with self.lock:
+            if self.startedAt is not None:
+                return
+            self.startedAt = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.maxWorkers, thread_name_prefix='modelLoader')
+        for entry in self.entries.values():
+            pool.submit(self._load, entry)
+        pool.shutdown(wait=False)
+
+    def _load(self, entry):
+        try:
+            entry.status = 'loading'
+            started = time.perf_counter()
+            model = entry.loader()
+            entry.loadSeconds = round(time.perf_counter() - started, 3)
+
+            if entry.warmUp is not None:
+                entry.status = 'warming'
+                started = time.perf_counter()
+                entry.warmUp(model)
+                entry.warmSeconds = round(time.perf_counter() - started, 3)
+
+            entry.status = 'ready'
+            entry.future.set_result(model)
+            log.event('modelReady', model=entry.name, loadSeconds=entry.loadSeconds, warmSeconds=entry.warmSeconds or 0)
+        except Exception as e:
+            entry.status = 'failed'
+            entry.error = repr(e)
+            entry.future.set_exception(e)
+            log.event('modelFailed', logging.ERROR, model=entry.name, required=entry.required, error=entry.error)
+        self._checkDone()
+
+    def _checkDone(self):
+        with self.lock:
+            if self.readyAt is not None or not all(e.future.done() for e in self.entries.values()):
+                return
+            self.readyAt = time.perf_counter()
+            callbacks = list(self.readyCallbacks)
+        for callback in callbacks:
+            callback()
+
+    def onReady(self, callback):
+        # Runs once every model has finished loading (or failed).
+        with self.lock:
+            if self.readyAt is None:
+                self.readyCallbacks.append(callback)
+                return
+        callback()
+
+    def get(self, name, timeout=None):
+        # Blocks until the model is ready; call from worker threads, not the event loop.
+        self.startLoading()
+        return self.entries[name].future.result(timeout=timeout)
+
+    async def waitFor(self, name):
+        self.startLoading()
+        return await asyncio.wrap_future(self.entries[name].future)
+
+    def isReady(self):
+        return all(entry.status == 'ready' for entry in self.entries.values() if entry.required)
+
+    def status(self):
+        return {
+            'ready': self.isReady(),
+            'secondsToReady': round(self.readyAt - self.startedAt, 3) if self.readyAt is not None else None,
+            'models': {
+                entry.name: {
+                    'status': entry.status,
+                    'required': entry.required,
+                    'loadSeconds': entry.loadSeconds,
+                    'warmSeconds': entry.warmSeconds,
+                    'error': entry.error,
+                }
+                for entry in self.entries.values()
+            },
+        }
+
+
+modelRegistry = ModelRegistry()
@@ -0,0 +1,68 @@
+import os
+
+# Memory figures come from /proc/<pid>/smaps_rollup (Linux only). PSS splits every
+# shared page between the processes mapping it, so summing PSS over the master and
+# its workers gives the real footprint; USS is what a process alone would free.
+
+
+def readMemory(pid):
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+
+    return {
+        'pid': pid,
+        'rssMb': round(fields.get('Rss', 0) / 1024, 1),
+        'pssMb': round(fields.get('Pss', 0) / 1024, 1),
+        'ussMb': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1),
+        'sharedMb': round((fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024, 1),
+    }
+
+
+def childPids(parentPid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so fields are counted after its ')'.
+        if int(stat.rsplit(')', 1)[1].split()[1]) == parentPid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def servingMemory():
+    # Memory of this process, or of the pre-fork master and all of its workers when
+    # running under preforkServer.py.
+    masterPid = os.getenv('PREFORK_MASTER_PID')
+    if masterPid is None:
+        return {'master': None, 'workers': [readMemory(os.getpid())]}
+
+    masterPid = int(masterPid)
+    workers = [memory for memory in map(readMemory, childPids(masterPid)) if memory is not None]
+    return {
+        'master': readMemory(masterPid),
+        'workers': workers,
+        'totalPssMb': round(sum(w['pssMb'] for w in workers) + (readMemory(masterPid) or {}).get('pssMb', 0), 1),
+    }
+
+
+def formatMemoryTable(memory):
+    rows = ([('master', memory['master'])] if memory['master'] else []) + \
+           [(f'worker {i}', worker) for i, worker in enumerate(memory['workers'])]
+    lines = [f"{'process':<10} {'pid':>7} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9} {'shared MB':>10}"]
+    for name, m in rows:
+        lines.append(f"{name:<10} {m['pid']:>7} {m['rssMb']:>9} {m['pssMb']:>9} {m['ussMb']:>9} {m['sharedMb']:>10}")
+    if 'totalPssMb' in memory:
+        lines.append(f"total PSS: {memory['totalPssMb']} MB")
+    return '\n'.join(lines)
@@ -0,0 +1,316 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from utils.eventLog import EventLog
+from utils.mediapipePool import createHandsGraph, createHolisticGraph, detectHand, warmUpGraph
+from utils.metrics import jpegDecodeSeconds, landmarkExtractionSeconds, metrics
+from landmarks.schema import get_schema
+
+# Landmark extraction (JPEG decode + MediaPipe) is the GIL-bound part of serving, so
+# it can run in separate worker processes. Every worker owns two shared-memory rings:
+# the server writes frame bytes into an input slot, the worker writes landmarks into
+# the matching output slot, and only (taskId, kind, slot, length) tuples and a status
+# with stage timings travel through the queues. A session's tracking graph lives in
+# one worker: ('open'/'close', graphKey, kind) tasks create and release it, and that
+# session's frames are all sent to that worker, which handles its tasks in order.
+# A worker that dies (a MediaPipe crash, the OOM killer) is dropped: its pending
+# frames fail and its sessions continue on the other workers' shared graphs. It is
+# not replaced, because a process forked once TensorFlow is running can hang.
+
+OUTPUT_SLOT_VALUES = 1662
+KINDS = ('hands', 'holistic')
+slotWaitSeconds = float(os.getenv('FRAME_SLOT_TIMEOUT', 10))
+workerCheckSeconds = 1.0
+log = EventLog('extraction')
+wordsFeatureSchema = get_schema()
+
+
+def resolveProcessCount():
+    value = os.getenv('INFERENCE_PROCESSES', '0').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(0, int(value))
+
+
+class FrameRing:
+    def __init__(self, slots, slotSize):
+        self.slots = slots
+        self.slotSize = slotSize
+        self.shm = SharedMemory(create=True, size=slots * slotSize)
+
+    def bytesView(self, slot, length):
+        return np.frombuffer(self.shm.buf, dtype=np.uint8, count=length, offset=slot * self.slotSize)
+
+    def floatView(self, slot, count):
+        return np.frombuffer(self.shm.buf, dtype=np.float32, count=count, offset=slot * self.slotSize)
+
+    def write(self, slot, data):
+        offset = slot * self.slotSize
+        self.shm.buf[offset:offset + len(data)] = data
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def workerMain(tasks, results, inputRing, outputRing):
+    import cv2
+    from landmarks.conversion import holistic_to_array
+    from landmarks.payload import PRESENT_HAND, holistic_presence
+    from utils.frameDecode import decodeFrame
+
+    graphs = {}
+    sessionGraphs = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task[0] == 'open':
+            _, graphKey, kind = task
+            try:
+                factory = createHandsGraph if kind == 'hands' else createHolisticGraph
+                sessionGraphs[graphKey] = warmUpGraph(factory(staticImageMode=False))
+            except Exception:
+                # The session's frames then go through the shared static graph.
+                pass
+            continue
+        if task[0] == 'close':
+            graph = sessionGraphs.pop(task[1], None)
+            if graph is not None:
+                graph.close()
+            continue
+        taskId, kind, slot, payload, graphKey = task
+        try:
+            # Frames that did not fit into a slot arrive inline in the task instead.
+            frame = inputRing.bytesView(slot, payload) if isinstance(payload, int) else np.frombuffer(payload, np.uint8)
+            started = time.perf_counter()
+            image = decodeFrame(frame)
+            decoded = time.perf_counter()
+            timings = (decoded - started, None)
+            if image is None:
+                results.put((taskId, None, None, timings))
+                continue
+            graph = sessionGraphs.get(graphKey)
+            if graph is None:
+                if kind not in graphs:
+                    graphs[kind] = createHandsGraph() if kind == 'hands' else createHolisticGraph()
+                graph = graphs[kind]
+            extractStarted = time.perf_counter()
+            if kind == 'hands':
+                hand = detectHand(graph, image)
+            else:
+                mpResults = graph.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            # Stage timings travel back with the result, so they land in the server's /metrics.
+            timings = (decoded - started, time.perf_counter() - extractStarted)
+
+            out = np.ndarray(OUTPUT_SLOT_VALUES, dtype=np.float32, buffer=outputRing.shm.buf,
+                             offset=slot * outputRing.slotSize)
+            if kind == 'hands':
+                if hand is None:
+                    results.put((taskId, 0, None, timings))
+                    continue
+                out[:63] = hand.reshape(-1)
+                results.put((taskId, PRESENT_HAND, None, timings))
+            else:
+                frameValues = out[:wordsFeatureSchema.coords_per_frame]
+                holistic_to_array(mpResults, out=frameValues, face_landmarks=wordsFeatureSchema.face_landmarks)
+                results.put((taskId, holistic_presence(frameValues, wordsFeatureSchema.presence_parts), None, timings))
+        except Exception as e:
+            results.put((taskId, None, repr(e), (None, None)))
+
+    for graph in [*graphs.values(), *sessionGraphs.values()]:
+        graph.close()
+
+
+class WorkerHandle:
+    def __init__(self, context, results, slots, slotSize):
+        self.inputRing = FrameRing(slots, slotSize)
+        self.outputRing = FrameRing(slots, OUTPUT_SLOT_VALUES * 4)
+        self.tasks = context.Queue()
+        self.trackingGraphs = 0
+        self.dead = False
+        self.freeSlots = queue.Queue()
+        for slot in range(slots):
+            self.freeSlots.put(slot)
+        self.process = context.Process(target=workerMain, args=(self.tasks, results, self.inputRing, self.outputRing),
+                                       daemon=True, name='extractionWorker')
+        self.process.start()
+
+    def close(self):
+        self.tasks.put(None)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.inputRing.close()
+        self.outputRing.close()
+
+
+class ExtractionWorkers:
+    def __init__(self, processes=None, slotsPerWorker=None, slotSize=None):
+        self.processes = resolveProcessCount() if processes is None else processes
+        self.slotsPerWorker = slotsPerWorker or int(os.getenv('FRAME_SLOTS_PER_WORKER', 8))
+        self.slotSize = slotSize or int(os.getenv('FRAME_SLOT_BYTES', 512 * 1024))
+        self.enabled = self.processes > 0
+        self.workers = []
+        self.futures = {}
+        self.taskIds = itertools.count()
+        self.graphKeys = itertools.count()
+        self.graphWorkers = {}
+        self.startLock = threading.Lock()
+        self.results = None
+        self.resultThread = None
+        self.deadWorkers = []
+
+    def start(self):
+        # Called from handsUP.py before TensorFlow and MediaPipe are imported, so the
+        # forked workers start from a small, thread-free parent. A preforkServer.py
+        # worker has inherited them from its master, so there they are spawned.
+        if not self.enabled or self.results is not None:
+            return
+        with self.startLock:
+            if self.results is not None:
+                return
+            context = multiprocessing.get_context('spawn' if os.getenv('PREFORK_MASTER_PID') else 'fork')
+            self.results = context.Queue()
+            self.workers = [WorkerHandle(context, self.results, self.slotsPerWorker, self.slotSize)
+                            for _ in range(self.processes)]
+            self.resultThread = threading.Thread(target=self._collectResults, name='extractionResults', daemon=True)
+            self.resultThread.start()
+
+    def openGraph(self, kind):
+        # Creates a tracking graph on the worker with the fewest of them and returns
+        # the key to submit the session's frames with.
+        if kind not in KINDS:
+            raise ValueError(f"Unknown extraction kind {kind}")
+        self.start()
+        with self.startLock:
+            if not self.workers:
+                raise RuntimeError("No extraction workers left")
+            worker = min(self.workers, key=lambda w: w.trackingGraphs)
+            worker.trackingGraphs += 1
+            graphKey = next(self.graphKeys)
+            self.graphWorkers[graphKey] = worker
+        worker.tasks.put(('open', graphKey, kind))
+        return graphKey
+
+    def closeGraph(self, graphKey):
+        # Queued behind the session's frames, so they still see the graph.
+        with self.startLock:
+            worker = self.graphWorkers.pop(graphKey, None)
+            if worker is None:
+                return
+            worker.trackingGraphs -= 1
+        worker.tasks.put(('close', graphKey, None))
+
+    def submitFrame(self, kind, frameBytes, graphKey=None):
+        # Resolves to (presence, landmarks): presence is None for undecodable frames,
+        # landmarks a private copy - (21, 3) for hands, the words feature schema's
+        # frame for holistic ((1662,) with the full schema), or None when nothing was
+        # detected. graphKey is a tracking graph from openGraph().
+        if kind not in KINDS:
+            raise ValueError(f"Unknown extraction kind {kind}")
+        self.start()
+        worker = self.graphWorkers.get(graphKey)
+        if worker is None:
+            if not self.workers:
+                raise RuntimeError("No extraction workers left")
+            worker = max(self.workers, key=lambda w: w.freeSlots.qsize())
+        try:
+            slot = worker.freeSlots.get(timeout=slotWaitSeconds)
+        except queue.Empty:
+            raise RuntimeError(f"No free extraction slot after {slotWaitSeconds}s") from None
+
+        future = Future()
+        taskId = next(self.taskIds)
+        with self.startLock:
+            # A None slot, or the dead flag, means the worker died meanwhile.
+            if slot is None or worker.dead:
+                raise RuntimeError("Extraction worker exited")
+            self.futures[taskId] = (future, worker, slot, kind)
+        if len(frameBytes) <= self.slotSize:
+            worker.inputRing.write(slot, frameBytes)
+            worker.tasks.put((taskId, kind, slot, len(frameBytes), graphKey))
+        else:
+            worker.tasks.put((taskId, kind, slot, bytes(frameBytes), graphKey))
+        return future
+
+    def _collectResults(self):
+        nextCheck = time.monotonic() + workerCheckSeconds
+        while True:
+            # Checked between results too, so a busy worker can't hide a dead one.
+            if time.monotonic() >= nextCheck:
+                self._dropDeadWorkers()
+                nextCheck = time.monotonic() + workerCheckSeconds
+            try:
+                message = self.results.get(timeout=workerCheckSeconds)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            taskId, presence, error, (decodeSeconds, extractSeconds) = message
+            entry = self.futures.pop(taskId, None)
+            if entry is None:
+                # Already failed because its worker died.
+                continue
+            future, worker, slot, kind = entry
+            if decodeSeconds is not None:
+                jpegDecodeSeconds.observe(decodeSeconds, kind=kind)
+            if extractSeconds is not None:
+                landmarkExtractionSeconds.observe(extractSeconds, kind=kind)
+            landmarks = None
+            if presence:
+                # Copied straight away: the slot is reused as soon as it is freed.
+                count = 63 if kind == 'hands' else wordsFeatureSchema.coords_per_frame
+                landmarks = worker.outputRing.floatView(slot, count).copy()
+                if kind == 'hands':
+                    landmarks = landmarks.reshape(21, 3)
+            worker.freeSlots.put(slot)
+            if error is not None:
+                future.set_exception(RuntimeError(f"Extraction worker failed: {error}"))
+            else:
+                future.set_result((presence, landmarks))
+
+    def _dropDeadWorkers(self):
+        for worker in [w for w in self.workers if not w.process.is_alive()]:
+            with self.startLock:
+                worker.dead = True
+                self.workers.remove(worker)
+                # Its sessions lose their tracking graph; their frames go to any worker.
+                for graphKey in [key for key, graphWorker in self.graphWorkers.items() if graphWorker is worker]:
+                    del self.graphWorkers[graphKey]
+                lost = [taskId for taskId, (_, taskWorker, _, _) in self.futures.items() if taskWorker is worker]
+                failed = [self.futures.pop(taskId)[0] for taskId in lost]
+            # The rings stay mapped until shutdown, a submitter may still be writing to them.
+            self.deadWorkers.append(worker)
+            for _ in range(self.slotsPerWorker):
+                worker.freeSlots.put(None)
+            for future in failed:
+                future.set_exception(RuntimeError("Extraction worker exited"))
+            log.event('extractionWorkerExited', logging.ERROR, exitCode=worker.process.exitcode,
+                      failedFrames=len(failed), workersLeft=len(self.workers))
+
+    def shutdown(self):
+        if self.results is not None:
+            self.results.put(None)
+            self.resultThread.join(timeout=5)
+        for worker in self.workers:
+            worker.close()
+        for worker in self.deadWorkers:
+            worker.inputRing.close()
+            worker.outputRing.close()
+        self.workers = []
+        self.deadWorkers = []
+
+
+extractionWorkers = ExtractionWorkers()
+metrics.gauge('handsup_extraction_pending', 'Frames submitted to the extraction worker processes and not yet returned',
+              lambda: len(extractionWorkers.futures))
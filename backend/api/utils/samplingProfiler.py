@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Sampling profiler that can be switched on in a running server (see /admin/profile).
+# While it runs, a background thread reads every thread's current stack with
+# sys._current_frames() and counts identical stacks; the result is the collapsed
+# format that flamegraph.pl, speedscope and inferno read. Nothing is hooked into the
+# interpreter, so when no profile is running the serving path pays nothing but the
+# attribute checks in sessionStarted/sessionEnded and InferenceExecutor.submit.
+
+profileInterval = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+maxProfileSeconds = float(os.getenv('PROFILE_MAX_SECONDS', 300))
+sessionFrameNames = ('websocketEndpoint', 'receiveMessages')
+
+
+def frameLabel(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=None):
+        self.interval = interval or profileInterval
+        self.lock = threading.Lock()
+        self.running = False
+        # None profiles every thread, 'next' waits for the next websocket session,
+        # anything else is the sessionId whose work is kept.
+        self.session = None
+        self.sessionDone = threading.Event()
+        self.threadSessions = {}
+        self.stacks = Counter()
+        self.samples = 0
+        self.startedAt = None
+        self.stopEvent = threading.Event()
+        self.thread = None
+
+    def start(self, session=None):
+        with self.lock:
+            if self.running:
+                raise RuntimeError("A profile is already running")
+            self.running = True
+            self.session = session
+            self.sessionDone.clear()
+            self.stacks = Counter()
+            self.samples = 0
+            self.startedAt = time.perf_counter()
+            self.stopEvent.clear()
+            self.thread = threading.Thread(target=self._run, name='samplingProfiler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return None
+            self.stopEvent.set()
+            self.thread.join()
+            self.running = False
+            session, self.session = self.session, None
+            self.threadSessions.clear()
+            return {'session': session, 'samples': self.samples,
+                    'seconds': round(time.perf_counter() - self.startedAt, 3), 'collapsed': self.collapsed()}
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    # Session-scoped profiles: the websocket endpoint reports where each session
+    # starts and ends, and executor jobs record which session they run for.
+    @property
+    def sessionScoped(self):
+        return self.session is not None
+
+    def sessionStarted(self, sessionId):
+        if self.session == 'next':
+            self.session = sessionId
+
+    def sessionEnded(self, sessionId):
+        if self.session is not None and self.session == sessionId:
+            self.sessionDone.set()
+
+    def runForSession(self, sessionId, call):
+        threadId = threading.get_ident()
+        self.threadSessions[threadId] = sessionId
+        try:
+            return call()
+        finally:
+            self.threadSessions.pop(threadId, None)
+
+    def _run(self):
+        ownId = threading.get_ident()
+        while not self.stopEvent.wait(self.interval):
+            threadNames = {thread.ident: thread.name for thread in threading.enumerate()}
+            for threadId, frame in sys._current_frames().items():
+                if threadId == ownId or not self._keep(threadId, frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frameLabel(frame))
+                    frame = frame.f_back
+                stack.append(threadNames.get(threadId, str(threadId)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _keep(self, threadId, frame):
+        session = self.session
+        if session is None:
+            return True
+        if session == 'next':
+            return False
+        if self.threadSessions.get(threadId) == session:
+            return True
+        # On the event loop thread only the coroutine running right now is on the
+        # stack; it belongs to the session if its websocketEndpoint or
+        # receiveMessages frame does.
+        while frame is not None:
+            if frame.f_code.co_name in sessionFrameNames:
+                return frame.f_locals.get('sessionId') == session
+            frame = frame.f_back
+        return False
+
+
+samplingProfiler = SamplingProfiler()
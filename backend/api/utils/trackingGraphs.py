@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from utils.inferenceExecutor import inferenceExecutor
+from utils.mediapipePool import createHandsGraph, createHolisticGraph, warmUpGraph
+from utils.processWorkers import extractionWorkers
+from utils.metrics import metrics
+from utils.eventLog import EventLog
+
+# Per-session tracking-mode MediaPipe graphs (static_image_mode=False). A /ws_translate
+# session streams one user's video, so its own graph can follow the hand or body from
+# frame to frame and only run palm/pose detection when tracking is lost. The shared
+# static-image graphs run detection on every frame. A tracking graph keeps state
+# between frames, so it must see its session's frames in order and from one thread
+# at a time; the session's work on the inference executor already runs that way.
+# Graphs are created on 'start' and closed when the session ends. Sessions beyond
+# MEDIAPIPE_TRACKING_SESSIONS live graphs, or all of them with MEDIAPIPE_TRACKING=0,
+# use the shared static graphs.
+
+trackingEnabled = os.getenv('MEDIAPIPE_TRACKING', '1') == '1'
+maxTrackingGraphs = int(os.getenv('MEDIAPIPE_TRACKING_SESSIONS', 16))
+log = EventLog('tracking')
+
+
+class TrackingGraph:
+    def __init__(self, kind):
+        self.kind = kind
+        self.graph = None
+        # With extraction worker processes the graph lives in a worker; frames are
+        # submitted with this key instead.
+        self.graphKey = None
+        if extractionWorkers.enabled:
+            self.graphKey = extractionWorkers.openGraph(kind)
+        else:
+            factory = createHandsGraph if kind == 'hands' else createHolisticGraph
+            self.graph = warmUpGraph(factory(staticImageMode=False))
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        # Same interface as MediaPipePool, so extraction code takes either.
+        yield self.graph
+
+    def close(self):
+        if self.graphKey is not None:
+            extractionWorkers.closeGraph(self.graphKey)
+        elif self.graph is not None:
+            self.graph.close()
+        self.graph = self.graphKey = None
+
+
+class TrackingGraphs:
+    def __init__(self, limit=None):
+        self.limit = maxTrackingGraphs if limit is None else limit
+        self.live = 0
+        self.lock = threading.Lock()
+
+    def open(self, kind):
+        # None when tracking is off, the limit is reached or the graph cannot be built.
+        with self.lock:
+            if not trackingEnabled or self.live >= self.limit:
+                return None
+            self.live += 1
+        try:
+            return TrackingGraph(kind)
+        except Exception as e:
+            with self.lock:
+                self.live -= 1
+            log.event('trackingGraphFailed', logging.WARNING, kind=kind, error=str(e))
+            return None
+
+    def close(self, graph):
+        graph.close()
+        with self.lock:
+            self.live -= 1
+
+
+trackingGraphs = TrackingGraphs()
+metrics.gauge('handsup_tracking_graphs', 'Per-session tracking-mode MediaPipe graphs',
+              lambda: trackingGraphs.live)
+
+
+# Both run after the session's queued work, so a graph is never closed mid-frame.
+async def openTrackingGraph(kind, sessionId):
+    return await inferenceExecutor.submit(sessionId, trackingGraphs.open, kind)
+
+
+async def closeTrackingGraph(graph, sessionId):
+    await inferenceExecutor.submit(sessionId, trackingGraphs.close, graph)
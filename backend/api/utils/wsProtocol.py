@@ -0,0 +1,65 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Server -> client messages on /ws_translate. The default 'json' protocol sends every
+# status, result and error as a JSON text message. A client that sends
+# "protocol": "compact" in its start message gets binary messages instead:
+#   one byte              status (STATUS_CODES), only sent when the status changes
+#   RESULT + JSON bytes   a prediction result
+#   ERROR + JSON bytes    {"error": "..."}
+# so the per-frame 'collecting' replies shrink to a byte, or to nothing while the
+# session stays in the same state.
+
+PROTOCOLS = ('json', 'compact')
+STATUS_CODES = {'collecting': 1, 'processing': 2, 'ready': 3}
+RESULT = 0x10
+ERROR = 0x11
+
+
+def dumps(message):
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(message, separators=(',', ':')).encode()
+
+
+class SessionChannel:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.protocol = 'json'
+        self.lastStatus = None
+
+    def negotiate(self, protocol):
+        # Returns False for an unknown protocol, which leaves the session on JSON.
+        self.lastStatus = None
+        if protocol not in PROTOCOLS:
+            self.protocol = 'json'
+            return False
+        self.protocol = protocol
+        return True
+
+    async def status(self, status):
+        if self.protocol == 'json':
+            await self.websocket.send_text(dumps({'status': status}).decode())
+            return
+        if status == self.lastStatus:
+            return
+        self.lastStatus = status
+        await self.websocket.send_bytes(bytes((STATUS_CODES[status],)))
+
+    async def result(self, result):
+        if self.protocol == 'json':
+            await self.websocket.send_text(dumps(result).decode())
+        else:
+            await self.websocket.send_bytes(bytes((RESULT,)) + dumps(result))
+
+    async def error(self, message):
+        if self.protocol == 'json':
+            await self.websocket.send_text(dumps({'error': message}).decode())
+            return
+        # Clients fall back to collecting after an error, so the next status is always sent.
+        self.lastStatus = None
+        await self.websocket.send_bytes(bytes((ERROR,)) + dumps({'error': message}))
@@ -1,6 +1,22 @@
 import { useRef, useState, useCallback } from 'react';
 import {produceSentence} from '../utils/apiCalls'
 
+// Binary messages of the compact /ws_translate protocol: one status byte, or a
+// result/error type byte followed by JSON.
+const compactStatuses = { 1: 'collecting', 2: 'processing', 3: 'ready' };
+const compactResult = 0x10;
+const compactError = 0x11;
+const textDecoder = new TextDecoder();
+
+function decodeMessage(payload) {
+    if (typeof payload === 'string') return JSON.parse(payload);
+    const bytes = new Uint8Array(payload);
+    if (bytes[0] === compactResult || bytes[0] === compactError) {
+        return JSON.parse(textDecoder.decode(bytes.subarray(1)));
+    }
+    return { status: compactStatuses[bytes[0]] };
+}
+
 export function useTranslationSocket(dexterity = 'right') {
     const wsRef = useRef(null);
     const processingRef = useRef(false);
@@ -28,17 +44,18 @@ export function useTranslationSocket(dexterity = 'right') {
         if (wsRef.current) return;
 
         const ws = new WebSocket(`${socketBaseURL}/ws_translate`);
+        ws.binaryType = 'arraybuffer';
         wsRef.current = ws;
         sentFramesRef.current = 0;
 
         ws.onopen = () => {
-            ws.send(JSON.stringify({ type: 'start', model, sequenceNum }));
+            ws.send(JSON.stringify({ type: 'start', model, sequenceNum, protocol: 'compact' }));
             setWsStatus('collecting');
             console.log('WebSocket connected');
         };
 
         ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
+            const data = decodeMessage(event.data);
 
             if (data.error) {
                 setResult(prev => prev + ' [Error]');